@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+import asyncio
+import json
+import re
+import sqlite3
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import config
+from database import (Database, CONNECTION_PROFILES, DEFAULT_PROFILE, DEFAULT_APPOINTMENT_MINUTES,
+                      MAX_APPOINTMENT_MINUTES, is_busy_error)
+from models import AppointmentManager
+
+Response = Tuple[int, Any]
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def require(data: Dict[str, Any], *names: str):
+    missing = [name for name in names if not data.get(name)]
+    if missing:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"حقول مطلوبة: {', '.join(missing)}")
+
+def to_int(value: Any, name: str, default: Optional[int] = None) -> int:
+    if value in (None, ''):
+        if default is None:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"حقل مطلوب: {name}")
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"قيمة غير صالحة: {name}")
+
+def to_limit(value: Any, default: int, maximum: int) -> int:
+    limit = to_int(value, 'limit', default)
+    if limit < 1:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "قيمة غير صالحة: limit")
+    return min(limit, maximum)
+
+class ApiServer:
+    def __init__(self, db: Database, workers: int = config.API_WORKERS):
+        self.db = db
+        self.manager = AppointmentManager(db)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api-db')
+        self.last_change_id = db.get_last_change_id()
+        self.routes: List[Tuple[str, re.Pattern, Callable[..., Response]]] = [
+            ('GET', re.compile(r'/health'), self.health),
+            ('GET', re.compile(r'/clients'), self.search_clients),
+            ('POST', re.compile(r'/clients'), self.add_client),
+            ('GET', re.compile(r'/clients/(\d+)'), self.get_client),
+            ('GET', re.compile(r'/availability'), self.get_availability),
+            ('GET', re.compile(r'/availability/slots'), self.find_free_slots),
+            ('GET', re.compile(r'/appointments'), self.get_appointments),
+            ('POST', re.compile(r'/appointments'), self.book_appointment),
+            ('GET', re.compile(r'/appointments/(\d+)'), self.get_appointment),
+        ]
+
+    def health(self, query: Dict[str, str], body: Dict[str, Any]) -> Response:
+        return HTTPStatus.OK, {'status': 'ok', 'version': config.APP_VERSION}
+
+    def search_clients(self, query: Dict[str, str], body: Dict[str, Any]) -> Response:
+        require(query, 'q')
+        limit = to_limit(query.get('limit'), config.CLIENT_SEARCH_LIMIT, 100)
+        return HTTPStatus.OK, self.db.search_clients(query['q'], limit)
+
+    def get_client(self, query: Dict[str, str], body: Dict[str, Any], client_id: str) -> Response:
+        client = self.db.get_client_by_id(int(client_id))
+        if client is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, "العميل غير موجود")
+        return HTTPStatus.OK, client
+
+    def add_client(self, query: Dict[str, str], body: Dict[str, Any]) -> Response:
+        require(body, 'name', 'phone')
+        phone = str(body['phone']).strip()
+        if self.db.get_client_ids_by_phone([phone]):
+            raise ApiError(HTTPStatus.CONFLICT, "رقم الهاتف موجود بالفعل")
+        client_id = self.db.add_client(str(body['name']).strip(), phone, str(body.get('email') or '').strip())
+        return HTTPStatus.CREATED, self.db.get_client_by_id(client_id)
+
+    def get_availability(self, query: Dict[str, str], body: Dict[str, Any]) -> Response:
+        require(query, 'date')
+        interval = to_int(query.get('interval'), 'interval', DEFAULT_APPOINTMENT_MINUTES)
+        return HTTPStatus.OK, {
+            'date': query['date'],
+            'times': self.manager.get_available_times(query['date'], interval)
+        }
+
+    def find_free_slots(self, query: Dict[str, str], body: Dict[str, Any]) -> Response:
+        require(query, 'start')
+        return HTTPStatus.OK, self.manager.find_free_slots(
+            query['start'],
+            min(to_int(query.get('days'), 'days', 7), 31),
+            to_int(query.get('duration'), 'duration', 0) or None,
+            query.get('service'),
+            to_limit(query.get('limit'), 10, 100)
+        )
+
+    def get_appointments(self, query: Dict[str, str], body: Dict[str, Any]) -> Response:
+        require(query, 'start', 'end')
+        limit = to_limit(query.get('limit'), config.API_APPOINTMENTS_LIMIT, config.API_MAX_APPOINTMENTS)
+        return HTTPStatus.OK, self.db.get_appointments_between(query['start'], query['end'],
+                                                               query.get('status'), limit)
+
+    def get_appointment(self, query: Dict[str, str], body: Dict[str, Any], appointment_id: str) -> Response:
+        appointment = self.db.get_appointment_by_id(int(appointment_id))
+        if appointment is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, "الموعد غير موجود")
+        return HTTPStatus.OK, appointment
+
+    def book_appointment(self, query: Dict[str, str], body: Dict[str, Any]) -> Response:
+        require(body, 'client_id', 'date', 'time')
+        duration = to_int(body.get('duration'), 'duration',
+                          config.SERVICE_DURATIONS.get(body.get('service'), DEFAULT_APPOINTMENT_MINUTES))
+        if not 0 < duration <= MAX_APPOINTMENT_MINUTES:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "مدة الموعد غير صالحة")
+
+        client_id = to_int(body['client_id'], 'client_id')
+        if self.db.get_client_by_id(client_id) is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, "العميل غير موجود")
+
+        appointment_id, conflicts = self.db.book_appointment(
+            client_id, body['date'], body['time'],
+            body.get('service') or "", body.get('notes') or "", duration
+        )
+        if conflicts:
+            apt = conflicts[0]
+            raise ApiError(HTTPStatus.CONFLICT,
+                           f"هذا الوقت محجوز بالفعل: موعد في {apt['appointment_time']} لمدة {apt['duration']} دقيقة")
+        return HTTPStatus.CREATED, self.db.get_appointment_by_id(appointment_id)
+
+    def dispatch(self, method: str, path: str, query: Dict[str, str], body: Dict[str, Any]) -> Response:
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.fullmatch(path.rstrip('/') or '/')
+            if not match:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            try:
+                return handler(query, body, *match.groups())
+            except ApiError as e:
+                return e.status, {'error': str(e)}
+            except sqlite3.IntegrityError as e:
+                return HTTPStatus.CONFLICT, {'error': str(e).replace("خطأ: ", "")}
+            except sqlite3.OperationalError as e:
+                if is_busy_error(e):
+                    return HTTPStatus.SERVICE_UNAVAILABLE, {'error': "قاعدة البيانات مشغولة، حاول مرة أخرى"}
+                traceback.print_exc()
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "خطأ داخلي في الخادم"}
+            except (TypeError, ValueError) as e:
+                return HTTPStatus.BAD_REQUEST, {'error': f"بيانات غير صالحة: {str(e)}"}
+            except Exception:
+                traceback.print_exc()
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "خطأ داخلي في الخادم"}
+
+        if allowed:
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'error': "الطريقة غير مدعومة"}
+        return HTTPStatus.NOT_FOUND, {'error': "المسار غير موجود"}
+
+    async def handle(self, method: str, target: str, body: bytes) -> Response:
+        url = urlsplit(target)
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {'error': "JSON غير صالح"}
+        if not isinstance(data, dict):
+            return HTTPStatus.BAD_REQUEST, {'error': "يجب أن يكون جسم الطلب كائن JSON"}
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.dispatch, method, url.path,
+                                          dict(parse_qsl(url.query)), data)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, payload = await self.handle(method, target, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self.write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except ApiError as e:
+            await self.write_response(writer, e.status, {'error': str(e)}, False)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_line(self, reader: asyncio.StreamReader) -> bytes:
+        try:
+            return await asyncio.wait_for(reader.readline(), config.API_IDLE_TIMEOUT)
+        except (ValueError, asyncio.LimitOverrunError):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "سطر الطلب طويل جداً")
+
+    async def read_request(self, reader: asyncio.StreamReader):
+        line = await self.read_line(reader)
+        if not line:
+            return None
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "طلب غير صالح")
+        method, target, _ = parts
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = await self.read_line(reader)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = headers.get('content-length') or '0'
+        if not (length.isascii() and length.isdigit()):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "قيمة Content-Length غير صالحة")
+        length = int(length)
+        if length > config.API_MAX_BODY_BYTES:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "حجم الطلب كبير جداً")
+        body = await asyncio.wait_for(reader.readexactly(length), config.API_IDLE_TIMEOUT) if length else b''
+        return method.upper(), target, headers, body
+
+    async def write_response(self, writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        status = HTTPStatus(status)
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+
+    def read_changes(self):
+        changes = self.db.get_changes(self.last_change_id, config.CHANGE_FEED_BATCH + 1)
+        if len(changes) > config.CHANGE_FEED_BATCH:
+            self.last_change_id = self.db.get_last_change_id()
+            self.db.publish_changes(None)
+        elif changes:
+            self.last_change_id = changes[-1]['id']
+            self.db.publish_changes(changes)
+
+    async def follow_changes(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(config.CHANGE_POLL_INTERVAL_MS / 1000)
+            try:
+                await loop.run_in_executor(self.executor, self.read_changes)
+            except Exception as e:
+                print(f"خطأ في متابعة تغييرات قاعدة البيانات: {str(e)}")
+
+    async def serve(self, host: str = config.API_HOST, port: int = config.API_PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        watcher = asyncio.create_task(self.follow_changes())
+        print(f"الخادم يعمل على http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.db.close()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="واجهة HTTP/JSON لنظام حجز المواعيد")
+    parser.add_argument('--host', default=config.API_HOST)
+    parser.add_argument('--port', type=int, default=config.API_PORT)
+    parser.add_argument('--workers', type=int, default=config.API_WORKERS, help="عدد خيوط قاعدة البيانات")
+    parser.add_argument('--db', default=config.DB_NAME, help="مسار قاعدة البيانات")
+    parser.add_argument('--profile', choices=sorted(CONNECTION_PROFILES), default=DEFAULT_PROFILE,
+                        help="إعدادات الاتصال بقاعدة البيانات")
+    args = parser.parse_args(argv)
+
+    server = ApiServer(Database(args.db, args.profile), args.workers)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,17 +1,18 @@
+from startup_timer import STARTUP
 import sys
 from PyQt5.QtWidgets import QApplication
-from PyQt5.QtCore import QTimer, Qt
-from PyQt5.QtGui import QFont
 from main_window import MainWindow
-from database import Database
 import config
 
 def main():
+    STARTUP.configure(config.STARTUP_REPORT)
+    STARTUP.mark('imports')
     app = QApplication(sys.argv)
     
     app.setStyle('Fusion')
     
     window = MainWindow()
+    STARTUP.mark('window')
     window.show()
     
     sys.exit(app.exec_())
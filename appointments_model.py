@@ -0,0 +1,192 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant, pyqtSignal
+from typing import List, Dict, Any, Optional, Set, Tuple
+import config
+from database import Database, APPOINTMENT_SORT_KEYS
+from db_worker import DatabaseWorker
+
+class AppointmentsTableModel(QAbstractTableModel):
+    COLUMNS = [
+        ("رقم", 'id', 'id'),
+        ("العميل", 'name', 'name'),
+        ("التاريخ", 'appointment_date', 'date'),
+        ("الوقت", 'appointment_time', 'time'),
+        ("الخدمة", 'service', 'service'),
+        ("الحالة", 'status', 'status'),
+        ("ملاحظات", 'notes', 'notes'),
+    ]
+
+    loading_changed = pyqtSignal(bool)
+    load_failed = pyqtSignal(str)
+
+    def __init__(self, db: Database, page_size: int = 200,
+                 worker: Optional[DatabaseWorker] = None, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker or DatabaseWorker(db, parent=self)
+        self.task_key = f"appointments_page:{id(self)}"
+        self.page_size = page_size
+        self.sort_key = 'date'
+        self.descending = True
+        self.search = ""
+        self.status = None
+        self._rows: List[Dict[str, Any]] = []
+        self._has_more = True
+        self._loading = False
+        self._changed_ids: Set[int] = set()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return QVariant()
+
+        apt = self._rows[index.row()]
+        key = self.COLUMNS[index.column()][1]
+        value = apt.get(key)
+        if key == 'status':
+            status = value or 'scheduled'
+            return config.APPOINTMENT_STATUS_AR.get(status, status)
+        return "" if value is None else str(value)
+
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section][0]
+        return QVariant()
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and self._has_more and not self._loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self._has_more or self._loading:
+            return
+
+        self._set_loading(True)
+        self.worker.submit(
+            self.task_key, self.db.get_appointments_page,
+            self.sort_key, self.descending, self.search, self.status,
+            after=self._rows[-1] if self._rows else None,
+            limit=self.page_size,
+            on_result=self._append_page,
+            on_error=self._on_load_failed
+        )
+
+    def _append_page(self, page: List[Dict[str, Any]]):
+        self._set_loading(False)
+        self._has_more = len(page) == self.page_size
+        if not page:
+            return
+
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self._rows.extend(page)
+        self.endInsertRows()
+
+    def sort(self, column: int, order=Qt.AscendingOrder):
+        self.sort_key = self.COLUMNS[column][2]
+        self.descending = order == Qt.DescendingOrder
+        self.reload()
+
+    def set_filter(self, search: str = "", status: Optional[str] = None):
+        self.search = search
+        self.status = status
+        self.reload()
+
+    def _on_load_failed(self, message: str):
+        self._has_more = False
+        self._set_loading(False)
+        self.load_failed.emit(message)
+
+    def _set_loading(self, loading: bool):
+        if loading != self._loading:
+            self._loading = loading
+            self.loading_changed.emit(loading)
+
+    def apply_changes(self, changes: List[Dict[str, Any]]):
+        client_ids = {change['row_id'] for change in changes if change['table_name'] == 'clients'}
+        self._changed_ids.update(change['row_id'] for change in changes
+                                 if change['table_name'] == 'appointments')
+        self._changed_ids.update(apt['id'] for apt in self._rows if apt['client_id'] in client_ids)
+        if not self._changed_ids:
+            return
+
+        ids = sorted(self._changed_ids)
+        self.worker.submit(
+            f"{self.task_key}:changes", self.db.get_appointments_page,
+            self.sort_key, self.descending, self.search, self.status,
+            limit=len(ids), ids=ids,
+            on_result=lambda rows: self._merge_rows(ids, rows),
+            on_error=self.load_failed.emit
+        )
+
+    def _merge_rows(self, ids: List[int], rows: List[Dict[str, Any]]):
+        self._changed_ids.difference_update(ids)
+        fresh = {apt['id']: apt for apt in rows}
+
+        for appointment_id in ids:
+            apt = fresh.get(appointment_id)
+            row = self._row_of(appointment_id)
+            if row >= 0:
+                if apt is not None and self._fits(row, apt):
+                    self._rows[row] = apt
+                    self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.COLUMNS) - 1))
+                    continue
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._rows[row]
+                self.endRemoveRows()
+            if apt is not None:
+                self._insert_sorted(apt)
+
+    def _row_of(self, appointment_id: int) -> int:
+        for row, apt in enumerate(self._rows):
+            if apt['id'] == appointment_id:
+                return row
+        return -1
+
+    def _sort_values(self, apt: Dict[str, Any]) -> Tuple:
+        return tuple(apt['id'] if key == 'id' else apt.get(key) or ''
+                     for _, key in APPOINTMENT_SORT_KEYS[self.sort_key])
+
+    def _precedes(self, first: Dict[str, Any], second: Dict[str, Any]) -> bool:
+        if self.descending:
+            return self._sort_values(first) > self._sort_values(second)
+        return self._sort_values(first) < self._sort_values(second)
+
+    def _fits(self, row: int, apt: Dict[str, Any]) -> bool:
+        if row > 0 and not self._precedes(self._rows[row - 1], apt):
+            return False
+        if row < len(self._rows) - 1:
+            return self._precedes(apt, self._rows[row + 1])
+        return not self._has_more
+
+    def _insert_sorted(self, apt: Dict[str, Any]):
+        low, high = 0, len(self._rows)
+        while low < high:
+            middle = (low + high) // 2
+            if self._precedes(self._rows[middle], apt):
+                low = middle + 1
+            else:
+                high = middle
+
+        if low == len(self._rows) and self._has_more:
+            return
+        self.beginInsertRows(QModelIndex(), low, low)
+        self._rows.insert(low, apt)
+        self.endInsertRows()
+
+    def reload(self):
+        self.worker.cancel(self.task_key)
+        self.worker.cancel(f"{self.task_key}:changes")
+        self._changed_ids = set()
+        self.beginResetModel()
+        self._rows = []
+        self._has_more = True
+        self._set_loading(False)
+        self.endResetModel()
+        self.fetchMore()
+
+    def appointment_id(self, row: int) -> int:
+        return self._rows[row]['id']
@@ -1,20 +1,30 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, 
                              QLineEdit, QComboBox, QDateEdit, QTimeEdit, QTextEdit, 
-                             QMessageBox, QSpinBox)
-from PyQt5.QtCore import Qt, QDate, QTime
+                             QMessageBox, QSpinBox, QCompleter)
+from PyQt5.QtCore import Qt, QDate, QTime, QTimer, QModelIndex
 from PyQt5.QtGui import QFont
+from typing import Optional, Tuple
 import config
 from database import Database
-from models import AppointmentManager
+from db_worker import DatabaseWorker
+from models import AppointmentManager, ClientCache
+from clients_model import ClientSearchModel, client_label
 
 class AppointmentsWindow(QDialog):
-    def __init__(self, db: Database, parent=None):
+    def __init__(self, db: Database, parent=None, worker: Optional[DatabaseWorker] = None,
+                 client_cache: Optional[ClientCache] = None):
         super().__init__(parent)
         self.db = db
+        self.worker = worker or DatabaseWorker(db, parent=self)
+        self.client_cache = client_cache or ClientCache.for_database(db)
+        self.client_search_model = ClientSearchModel(self.client_cache, parent=self)
+        self.task_key = f"appointments_window:{id(self)}"
         self.appointment_manager = AppointmentManager(db)
         self.current_appointment_id = None
+        self.selected_client_id = None
+        self.current_series = None
+        self.current_occurrence_date = None
         self.init_ui()
-        self.load_clients()
 
     def init_ui(self):
         self.setWindowTitle("حجز موعد جديد")
@@ -28,9 +38,20 @@ class AppointmentsWindow(QDialog):
         main_layout.addWidget(title)
 
         main_layout.addWidget(QLabel("اختر العميل:"))
-        self.client_combo = QComboBox()
-        self.client_combo.currentIndexChanged.connect(self.on_client_changed)
-        main_layout.addWidget(self.client_combo)
+        self.client_search = QLineEdit()
+        self.client_search.setPlaceholderText("ابحث بالاسم أو رقم الهاتف أو البريد...")
+        self.client_search.textEdited.connect(self.on_client_search_edited)
+        
+        self.client_completer = QCompleter(self.client_search_model, self)
+        self.client_completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.client_completer.activated[QModelIndex].connect(self.on_client_completed)
+        self.client_search.setCompleter(self.client_completer)
+        main_layout.addWidget(self.client_search)
+        
+        self.client_search_timer = QTimer(self)
+        self.client_search_timer.setSingleShot(True)
+        self.client_search_timer.setInterval(config.CLIENT_SEARCH_DELAY_MS)
+        self.client_search_timer.timeout.connect(self.search_clients)
 
         btn_add_client = QPushButton("+ إضافة عميل جديد")
         btn_add_client.clicked.connect(self.open_quick_add_client)
@@ -54,6 +75,10 @@ class AppointmentsWindow(QDialog):
         btn_available_times.clicked.connect(self.show_available_times)
         time_layout.addWidget(btn_available_times)
         
+        btn_first_free = QPushButton("أقرب وقت متاح")
+        btn_first_free.clicked.connect(self.show_free_slots)
+        time_layout.addWidget(btn_first_free)
+        
         main_layout.addLayout(time_layout)
 
         main_layout.addWidget(QLabel("الخدمة:"))
@@ -69,6 +94,27 @@ class AppointmentsWindow(QDialog):
         self.duration_spin.setSuffix(" دقيقة")
         main_layout.addWidget(self.duration_spin)
 
+        main_layout.addWidget(QLabel("التكرار:"))
+        repeat_layout = QHBoxLayout()
+        
+        self.repeat_combo = QComboBox()
+        self.repeat_combo.addItem("بدون تكرار", None)
+        for frequency, label in config.RECURRENCE_FREQUENCIES_AR.items():
+            self.repeat_combo.addItem(label, frequency)
+        self.repeat_combo.currentIndexChanged.connect(self.on_repeat_changed)
+        repeat_layout.addWidget(self.repeat_combo)
+        
+        self.repeat_count_spin = QSpinBox()
+        self.repeat_count_spin.setMinimum(0)
+        self.repeat_count_spin.setMaximum(520)
+        self.repeat_count_spin.setValue(10)
+        self.repeat_count_spin.setSpecialValueText("بدون نهاية")
+        self.repeat_count_spin.setSuffix(" مرة")
+        self.repeat_count_spin.setEnabled(False)
+        repeat_layout.addWidget(self.repeat_count_spin)
+        
+        main_layout.addLayout(repeat_layout)
+
         main_layout.addWidget(QLabel("ملاحظات:"))
         self.notes_edit = QTextEdit()
         self.notes_edit.setMaximumHeight(100)
@@ -80,44 +126,127 @@ class AppointmentsWindow(QDialog):
         btn_save.clicked.connect(self.save_appointment)
         buttons_layout.addWidget(btn_save)
         
+        self.btn_cancel_series = QPushButton("إلغاء من السلسلة")
+        self.btn_cancel_series.clicked.connect(self.cancel_series_appointment)
+        self.btn_cancel_series.setVisible(False)
+        buttons_layout.addWidget(self.btn_cancel_series)
+        
         btn_cancel = QPushButton("إلغاء")
         btn_cancel.clicked.connect(self.close)
         buttons_layout.addWidget(btn_cancel)
         
         main_layout.addLayout(buttons_layout)
+        
+        self.loading_label = QLabel("جارٍ التحميل...")
+        self.loading_label.setVisible(False)
+        main_layout.addWidget(self.loading_label)
         main_layout.addStretch()
 
         self.setLayout(main_layout)
 
-    def load_clients(self):
-        self.client_combo.clear()
-        clients = self.db.get_all_clients()
+    def on_client_search_edited(self, text: str):
+        self.selected_client_id = None
+        self.client_search_timer.start()
+
+    def search_clients(self):
+        text = self.client_search.text().strip()
+        if not text:
+            self.worker.cancel(f"{self.task_key}:client_search")
+            self.client_search_model.set_clients([])
+            return
         
-        self.clients_dict = {}
-        for client in clients:
-            self.client_combo.addItem(f"{client['name']} ({client['phone']})", client['id'])
-            self.clients_dict[client['id']] = client
+        self.worker.submit(f"{self.task_key}:client_search", self.db.search_clients,
+                           text, config.CLIENT_SEARCH_LIMIT,
+                           on_result=self.show_client_matches, on_error=self.show_error)
+
+    def show_client_matches(self, clients):
+        self.client_search_model.set_clients(clients)
+        if clients and self.client_search.hasFocus():
+            self.client_completer.complete()
+
+    def on_client_completed(self, index: QModelIndex):
+        self.selected_client_id = index.data(Qt.UserRole)
+        self.on_client_changed()
+
+    def select_client(self, client_id: int, name: str, phone: str):
+        self.client_search_timer.stop()
+        self.selected_client_id = client_id
+        self.client_search.setText(client_label({'name': name, 'phone': phone}))
+        self.on_client_changed()
 
     def on_client_changed(self):
         pass
 
+    def closeEvent(self, event):
+        self.client_search_model.detach()
+        super().closeEvent(event)
+
     def on_date_changed(self):
         pass
 
+    def on_repeat_changed(self):
+        self.repeat_count_spin.setEnabled(self.repeat_combo.currentData() is not None)
+
+    def run_task(self, name: str, func, *args, on_result=None, **kwargs):
+        def on_done(result):
+            self.set_busy(False)
+            on_result(result)
+
+        def on_error(message: str):
+            self.set_busy(False)
+            self.show_error(message)
+
+        self.set_busy(True)
+        self.worker.submit(f"{self.task_key}:{name}", func, *args,
+                           on_result=on_done, on_error=on_error, **kwargs)
+
+    def set_busy(self, busy: bool):
+        self.loading_label.setVisible(busy)
+        for button in self.findChildren(QPushButton):
+            button.setEnabled(not busy)
+
+    def show_error(self, message: str):
+        QMessageBox.critical(self, "خطأ", message)
+
     def show_available_times(self):
         date_str = self.date_edit.date().toString(config.DATE_FORMAT)
-        available_times = self.appointment_manager.get_available_times(date_str)
         
-        if available_times:
-            times_str = "\n".join(available_times)
-            QMessageBox.information(self, "الأوقات المتاحة", 
-                                   f"الأوقات المتاحة في {date_str}:\n\n{times_str}")
-        else:
-            QMessageBox.warning(self, "لا توجد أوقات", 
-                               f"لا توجد أوقات متاحة في {date_str}")
+        def on_result(available_times):
+            if available_times:
+                times_str = "\n".join(available_times)
+                QMessageBox.information(self, "الأوقات المتاحة", 
+                                       f"الأوقات المتاحة في {date_str}:\n\n{times_str}")
+            else:
+                QMessageBox.warning(self, "لا توجد أوقات", 
+                                   f"لا توجد أوقات متاحة في {date_str}")
+        
+        self.run_task('availability', self.appointment_manager.get_available_times, date_str,
+                      on_result=on_result)
+
+    def show_free_slots(self):
+        date_str = self.date_edit.date().toString(config.DATE_FORMAT)
+        
+        def on_result(slots):
+            if not slots:
+                QMessageBox.warning(self, "لا توجد أوقات", 
+                                   f"لا توجد أوقات متاحة خلال الأسبوع بدءاً من {date_str}")
+                return
+            
+            first = slots[0]
+            self.date_edit.setDate(QDate.fromString(first['appointment_date'], config.DATE_FORMAT))
+            self.time_edit.setTime(QTime.fromString(first['appointment_time'], config.TIME_FORMAT))
+            
+            slots_str = "\n".join(f"{slot['appointment_date']} {slot['appointment_time']}" for slot in slots)
+            QMessageBox.information(self, "أقرب الأوقات المتاحة", 
+                                   f"تم اختيار أقرب وقت متاح. الأوقات المتاحة:\n\n{slots_str}")
+        
+        self.run_task('availability', self.appointment_manager.find_free_slots, date_str,
+                      duration=self.duration_spin.value(),
+                      service=self.service_combo.currentText() or None,
+                      on_result=on_result)
 
     def save_appointment(self):
-        client_id = self.client_combo.currentData()
+        client_id = self.selected_client_id
         
         if not client_id:
             QMessageBox.warning(self, "خطأ", "يجب اختيار عميل")
@@ -127,41 +256,125 @@ class AppointmentsWindow(QDialog):
         appointment_time = self.time_edit.time().toString(config.TIME_FORMAT)
         service = self.service_combo.currentText()
         notes = self.notes_edit.toPlainText()
+        duration = self.duration_spin.value()
+
+        scope = None
+        if self.current_series:
+            scope = self.ask_series_scope("تعديل موعد متكرر", "هل تريد تطبيق التعديل على:")
+            if scope is None:
+                return
+
+        self.run_task('save', self.write_appointment, client_id, appointment_date, appointment_time,
+                      service, notes, duration, scope, self.repeat_combo.currentData(),
+                      self.repeat_count_spin.value() or None,
+                      on_result=self.on_appointment_saved)
 
+    def write_appointment(self, client_id: int, appointment_date: str, appointment_time: str,
+                          service: str, notes: str, duration: int, scope: Optional[str],
+                          frequency: Optional[str], count: Optional[int]) -> Tuple[bool, str]:
+        return self.db.run_in_transaction(self.check_and_write_appointment, client_id, appointment_date,
+                                          appointment_time, service, notes, duration, scope, frequency, count)
+
+    def check_and_write_appointment(self, client_id: int, appointment_date: str, appointment_time: str,
+                                    service: str, notes: str, duration: int, scope: Optional[str],
+                                    frequency: Optional[str], count: Optional[int]) -> Tuple[bool, str]:
         is_valid, message = self.appointment_manager.validate_appointment(
-            client_id, appointment_date, appointment_time
+            client_id, appointment_date, appointment_time, duration,
+            exclude_id=self.current_appointment_id
         )
 
         if not is_valid:
+            return False, message
+
+        if scope == 'this':
+            self.db.detach_series_occurrence(
+                self.current_series['id'], self.current_occurrence_date,
+                appointment_date, appointment_time, service, notes, duration
+            )
+            return True, "تم تحديث الموعد بنجاح"
+        if scope == 'following':
+            self.db.update_series_from(
+                self.current_series['id'], self.current_occurrence_date,
+                appointment_date, appointment_time, service, notes, duration
+            )
+            return True, "تم تحديث الموعد بنجاح"
+        if self.current_appointment_id:
+            self.db.update_appointment(
+                self.current_appointment_id, 
+                appointment_date, 
+                appointment_time, 
+                service, 
+                notes,
+                duration=duration
+            )
+            return True, "تم تحديث الموعد بنجاح"
+        if frequency:
+            self.db.add_recurring_appointment(
+                client_id, 
+                appointment_date, 
+                appointment_time, 
+                service, 
+                notes,
+                duration,
+                frequency=frequency,
+                count=count
+            )
+            return True, "تم حجز المواعيد المتكررة بنجاح"
+
+        self.db.add_appointment(
+            client_id, 
+            appointment_date, 
+            appointment_time, 
+            service, 
+            notes,
+            duration
+        )
+        return True, "تم حجز الموعد بنجاح"
+
+    def on_appointment_saved(self, result: Tuple[bool, str]):
+        saved, message = result
+        if not saved:
             QMessageBox.warning(self, "خطأ", message)
             return
 
-        try:
-            if self.current_appointment_id:
-                self.db.update_appointment(
-                    self.current_appointment_id, 
-                    appointment_date, 
-                    appointment_time, 
-                    service, 
-                    notes
-                )
-                QMessageBox.information(self, "نجاح", "تم تحديث الموعد بنجاح")
-            else:
-                self.db.add_appointment(
-                    client_id, 
-                    appointment_date, 
-                    appointment_time, 
-                    service, 
-                    notes
-                )
-                QMessageBox.information(self, "نجاح", "تم حجز الموعد بنجاح")
-            
+        QMessageBox.information(self, "نجاح", message)
+        self.close()
+        
+        if self.parent():
+            self.parent().refresh_all_data()
+
+    def ask_series_scope(self, title: str, question: str) -> Optional[str]:
+        msg_box = QMessageBox(self)
+        msg_box.setWindowTitle(title)
+        msg_box.setText(question)
+        btn_this = None
+        if self.current_occurrence_date != self.current_series['appointment_date']:
+            btn_this = msg_box.addButton("هذا الموعد فقط", QMessageBox.AcceptRole)
+        btn_following = msg_box.addButton("هذا والمواعيد التالية", QMessageBox.AcceptRole)
+        msg_box.addButton("تراجع", QMessageBox.RejectRole)
+        msg_box.exec_()
+        
+        if msg_box.clickedButton() == btn_following:
+            return 'following'
+        if btn_this is not None and msg_box.clickedButton() == btn_this:
+            return 'this'
+        return None
+
+    def cancel_series_appointment(self):
+        scope = self.ask_series_scope("إلغاء موعد متكرر", "هل تريد إلغاء:")
+        if scope is None:
+            return
+        
+        def on_result(result):
+            QMessageBox.information(self, "نجاح", "تم إلغاء المواعيد بنجاح")
             self.close()
             
             if self.parent():
                 self.parent().refresh_all_data()
-        except Exception as e:
-            QMessageBox.critical(self, "خطأ", str(e))
+        
+        cancel = self.db.cancel_series_occurrence if scope == 'this' else self.db.cancel_series_from
+        self.run_task('save', cancel, self.current_series['id'], self.current_occurrence_date,
+                      on_result=on_result)
 
     def open_quick_add_client(self):
         dialog = QDialog(self)
@@ -184,6 +397,11 @@ class AppointmentsWindow(QDialog):
         
         buttons_layout = QHBoxLayout()
         
+        def on_client_added(client_id):
+            self.select_client(client_id, name_input.text().strip(), phone_input.text().strip())
+            dialog.close()
+            QMessageBox.information(self, "نجاح", "تم إضافة العميل بنجاح")
+        
         def add_quick_client():
             name = name_input.text().strip()
             phone = phone_input.text().strip()
@@ -193,13 +411,8 @@ class AppointmentsWindow(QDialog):
                 QMessageBox.warning(dialog, "خطأ", "يجب إدخال الاسم ورقم الهاتف")
                 return
             
-            try:
-                self.db.add_client(name, phone, email)
-                self.load_clients()
-                dialog.close()
-                QMessageBox.information(self, "نجاح", "تم إضافة العميل بنجاح")
-            except Exception as e:
-                QMessageBox.critical(self, "خطأ", str(e))
+            self.run_task('quick_add_client', self.db.add_client, name, phone, email,
+                          on_result=on_client_added)
         
         btn_add = QPushButton("إضافة")
         btn_add.clicked.connect(add_quick_client)
@@ -213,16 +426,32 @@ class AppointmentsWindow(QDialog):
         dialog.setLayout(layout)
         dialog.exec_()
 
-    def load_appointment(self, appointment_id: int):
-        appointment = self.db.get_appointment_by_id(appointment_id)
+    def load_appointment(self, appointment_id: int, occurrence_date: Optional[str] = None):
+        self.run_task('appointment', self.read_appointment, appointment_id,
+                      on_result=lambda result: self.show_appointment(result, occurrence_date))
+
+    def read_appointment(self, appointment_id: int):
+        return self.db.get_appointment_by_id(appointment_id), self.db.get_series(appointment_id)
+
+    def show_appointment(self, result, occurrence_date: Optional[str] = None):
+        appointment, series = result
         
         if appointment:
-            self.current_appointment_id = appointment_id
+            self.current_appointment_id = appointment['id']
             self.setWindowTitle("تعديل الموعد")
             
-            client_index = self.client_combo.findData(appointment['client_id'])
-            if client_index >= 0:
-                self.client_combo.setCurrentIndex(client_index)
+            self.current_series = series
+            if self.current_series:
+                self.current_series['appointment_date'] = appointment['appointment_date']
+                self.current_occurrence_date = occurrence_date or appointment['appointment_date']
+                appointment['appointment_date'] = self.current_occurrence_date
+                self.repeat_combo.setCurrentIndex(self.repeat_combo.findData(self.current_series['frequency']))
+                self.repeat_count_spin.setValue(self.current_series['count'] or 0)
+            self.repeat_combo.setEnabled(False)
+            self.repeat_count_spin.setEnabled(False)
+            self.btn_cancel_series.setVisible(self.current_series is not None)
+            
+            self.select_client(appointment['client_id'], appointment['name'], appointment['phone'])
             
             self.date_edit.setDate(self.date_edit.date().fromString(
                 appointment['appointment_date'], config.DATE_FORMAT
@@ -236,6 +465,7 @@ class AppointmentsWindow(QDialog):
             if service_index >= 0:
                 self.service_combo.setCurrentIndex(service_index)
             
+            self.duration_spin.setValue(appointment.get('duration') or 30)
             self.notes_edit.setPlainText(appointment.get('notes', ''))
 
     def get_stylesheet(self) -> str:
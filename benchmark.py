@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+from database import Database, to_epoch
+from models import AppointmentManager
+from query_trace import count_rows
+
+SCALES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+BENCHMARK_DIR_ENV = 'APPOINTMENTS_BENCHMARK_DIR'
+
+ANCHOR_DATE = date(2026, 1, 1)
+DAYS_SPAN = 365
+GENERATE_CHUNK = 50_000
+BULK_BATCH = 100
+SERIES_EVERY = 1000
+NOISE_FLOOR_MS = 0.05
+
+SKIPPED = {
+    'Database.add_observer', 'Database.remove_observer', 'Database.connection',
+    'Database.close', 'Database.init_database',
+}
+
+FIRST_NAMES = ["أحمد", "محمد", "فاطمة", "سارة", "علي", "محمود", "مريم", "خالد", "نور", "يوسف",
+               "ليلى", "عمر", "هدى", "حسن", "ريم", "إبراهيم", "سلمى", "طارق", "دينا", "كريم"]
+LAST_NAMES = ["عبدالله", "حسن", "علي", "خالد", "إبراهيم", "سالم", "منصور", "يوسف", "الأحمد", "النجار",
+              "الحداد", "العمري", "الشريف", "القاسم", "الزين", "الفارس", "الخطيب", "السيد", "البدري", "الراشد"]
+TIMES = [f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(9 * 60, 17 * 60, 15)]
+
+@dataclass
+class Benchmark:
+    name: str
+    func: Callable[[random.Random, int], Any]
+    iterations: Optional[int] = None
+    rows: Optional[int] = None
+
+def client_phone(index: int) -> str:
+    return f"05{index:08d}"
+
+def random_day(rng: random.Random) -> str:
+    return (ANCHOR_DATE + timedelta(days=rng.randint(-DAYS_SPAN, DAYS_SPAN))).isoformat()
+
+def generate(db: Database, count: int, seed: int):
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    for start in range(0, count, GENERATE_CHUNK):
+        db.bulk_add_clients([
+            (f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", client_phone(index),
+             f"client{index}@example.com")
+            for index in range(start, min(start + GENERATE_CHUNK, count))
+        ])
+        print(f"العملاء: {min(start + GENERATE_CHUNK, count)}/{count}")
+
+    for start in range(0, count, GENERATE_CHUNK):
+        batch = []
+        for _ in range(start, min(start + GENERATE_CHUNK, count)):
+            service = rng.choice(config.SERVICES)
+            batch.append((rng.randint(1, count), random_day(rng), rng.choice(TIMES), service,
+                          "", config.SERVICE_DURATIONS.get(service, 30)))
+        db.bulk_add_appointments(batch)
+        print(f"المواعيد: {min(start + GENERATE_CHUNK, count)}/{count}")
+
+    with db.connection() as conn:
+        conn.execute('''
+            UPDATE appointments SET status = CASE
+                WHEN id % 10 = 9 THEN 'cancelled'
+                WHEN appointment_date < ? AND id % 10 < 7 THEN 'completed'
+                ELSE status
+            END
+        ''', (ANCHOR_DATE.isoformat(),))
+
+    for appointment_id in range(SERIES_EVERY, count + 1, SERIES_EVERY):
+        db.add_series(appointment_id, rng.choice(['daily', 'weekly', 'monthly']), count=rng.randint(2, 20))
+
+    print(f"تم إنشاء البيانات في {time.perf_counter() - started:.1f} ثانية")
+
+def default_data_dir() -> str:
+    return os.environ.get(BENCHMARK_DIR_ENV) or os.path.join(tempfile.gettempdir(), 'appointments-benchmark')
+
+def dataset_path(data_dir: str, scale: str, seed: int) -> str:
+    return os.path.join(data_dir, f"benchmark-{scale}-seed{seed}.db")
+
+def prepare_dataset(data_dir: str, scale: str, seed: int, regenerate: bool = False) -> str:
+    path = dataset_path(data_dir, scale, seed)
+    if os.path.exists(path) and not regenerate:
+        return path
+
+    os.makedirs(data_dir, exist_ok=True)
+    partial = path + '.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    db = Database(partial)
+    try:
+        generate(db, SCALES[scale], seed)
+        with db.connection() as conn:
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    finally:
+        db.close()
+    os.replace(partial, path)
+    return path
+
+def build_benchmarks(db: Database, manager: AppointmentManager, count: int) -> List[Benchmark]:
+    created: Dict[str, List[Any]] = {'clients': [], 'appointments': [], 'series': []}
+    phones = itertools.count(10 ** 7)
+    today = date.today().isoformat()
+
+    def new_client(rng, i):
+        client_id = db.add_client(f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", f"07{next(phones):08d}")
+        created['clients'].append(client_id)
+        return client_id
+
+    def new_appointment(rng, i):
+        appointment_id = db.add_appointment(rng.randint(1, count), random_day(rng), rng.choice(TIMES), "استشارة")
+        created['appointments'].append(appointment_id)
+        return appointment_id
+
+    def new_series(rng, i):
+        day = random_day(rng)
+        appointment_id = db.add_recurring_appointment(rng.randint(1, count), day, rng.choice(TIMES),
+                                                      "علاج", frequency='weekly')
+        created['series'].append(dict(db.get_series(appointment_id), appointment_date=day))
+        return appointment_id
+
+    def series_day(i: int, weeks: int) -> str:
+        series = created['series'][i % len(created['series'])]
+        return (date.fromisoformat(series['appointment_date']) + timedelta(weeks=weeks)).isoformat()
+
+    def series_id(i: int) -> int:
+        return created['series'][i % len(created['series'])]['id']
+
+    def starting_between(rng, i):
+        start = to_epoch(random_day(rng), "00:00")
+        return db.get_appointments_starting_between(start, start + 24 * 3600)
+
+    def days_range(rng, days: int):
+        start = random_day(rng)
+        return start, (date.fromisoformat(start) + timedelta(days=days)).isoformat()
+
+    return [
+        Benchmark('Database.add_client', new_client),
+        Benchmark('Database.bulk_add_clients', lambda rng, i: db.bulk_add_clients([
+            (f"عميل {n}", f"08{next(phones):08d}", "") for n in range(BULK_BATCH)
+        ]), rows=BULK_BATCH),
+        Benchmark('Database.get_client_ids_by_phone', lambda rng, i: db.get_client_ids_by_phone(
+            [client_phone(rng.randrange(count)) for _ in range(50)])),
+        Benchmark('Database.get_all_clients', lambda rng, i: db.get_all_clients(), iterations=3),
+        Benchmark('Database.search_clients', lambda rng, i: db.search_clients(rng.choice(FIRST_NAMES)[:2])),
+        Benchmark('Database.get_client_by_id', lambda rng, i: db.get_client_by_id(rng.randint(1, count))),
+        Benchmark('Database.update_client', lambda rng, i: db.update_client(
+            i + 1, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", client_phone(i))),
+        Benchmark('Database.delete_client', lambda rng, i: db.delete_client(created['clients'][i])),
+        Benchmark('Database.add_appointment', new_appointment),
+        Benchmark('Database.book_appointment', lambda rng, i: db.book_appointment(
+            rng.randint(1, count), random_day(rng), rng.choice(TIMES), "تنظيف")),
+        Benchmark('Database.run_in_transaction', lambda rng, i: db.run_in_transaction(
+            manager.validate_appointment, rng.randint(1, count), random_day(rng), rng.choice(TIMES), 30)),
+        Benchmark('Database.bulk_add_appointments', lambda rng, i: db.bulk_add_appointments([
+            (rng.randint(1, count), random_day(rng), rng.choice(TIMES), "", "", 30) for _ in range(BULK_BATCH)
+        ]), rows=BULK_BATCH),
+        Benchmark('Database.get_appointments_by_date', lambda rng, i: db.get_appointments_by_date(random_day(rng))),
+        Benchmark('Database.get_appointments_between', lambda rng, i: db.get_appointments_between(
+            *days_range(rng, 6))),
+        Benchmark('Database.get_daily_counts', lambda rng, i: db.get_daily_counts(*days_range(rng, 30))),
+        Benchmark('Database.get_appointments_starting_between', starting_between),
+        Benchmark('Database.get_busy_intervals', lambda rng, i: db.get_busy_intervals(*days_range(rng, 6))),
+        Benchmark('Database.get_appointment_dates', lambda rng, i: db.get_appointment_dates(
+            [rng.randint(1, count) for _ in range(50)])),
+        Benchmark('Database.get_conflicting_appointments', lambda rng, i: db.get_conflicting_appointments(
+            random_day(rng), rng.choice(TIMES), 60)),
+        Benchmark('Database.get_appointments_by_client', lambda rng, i: db.get_appointments_by_client(
+            rng.randint(1, count))),
+        Benchmark('Database.get_all_appointments', lambda rng, i: db.get_all_appointments(), iterations=3),
+        Benchmark('Database.get_recent_appointments', lambda rng, i: db.get_recent_appointments(5)),
+        Benchmark('Database.get_upcoming_appointments', lambda rng, i: db.get_upcoming_appointments(5)),
+        Benchmark('Database.get_appointments_page', lambda rng, i: db.get_appointments_page(
+            rng.choice(['date', 'name', 'status']), True, rng.choice(["", rng.choice(FIRST_NAMES)]))),
+        Benchmark('Database.get_appointment_by_id', lambda rng, i: db.get_appointment_by_id(rng.randint(1, count))),
+        Benchmark('Database.update_appointment', lambda rng, i: db.update_appointment(
+            created['appointments'][i], random_day(rng), rng.choice(TIMES), "علاج", "تعديل")),
+        Benchmark('Database.delete_appointment', lambda rng, i: db.delete_appointment(created['appointments'][i])),
+        Benchmark('Database.add_recurring_appointment', new_series),
+        Benchmark('Database.add_series', lambda rng, i: db.add_series(new_appointment(rng, i), 'daily', count=10)),
+        Benchmark('Database.get_series', lambda rng, i: db.get_series(created['series'][i]['appointment_id'])),
+        Benchmark('Database.cancel_series_occurrence', lambda rng, i: db.cancel_series_occurrence(
+            series_id(i), series_day(i, 2))),
+        Benchmark('Database.detach_series_occurrence', lambda rng, i: db.detach_series_occurrence(
+            series_id(i), series_day(i, 3), series_day(i, 3), "16:45")),
+        Benchmark('Database.update_series_from', lambda rng, i: db.update_series_from(
+            series_id(i), series_day(i, 5), series_day(i, 5), "08:00", "تقويم")),
+        Benchmark('Database.cancel_series_from', lambda rng, i: db.cancel_series_from(
+            series_id(i), series_day(i, 4))),
+        Benchmark('Database.add_series_notifications', lambda rng, i: db.add_series_notifications(
+            today, (date.today() + timedelta(days=config.RECURRING_REMINDER_DAYS)).isoformat())),
+        Benchmark('Database.add_notification', lambda rng, i: db.add_notification(
+            created['appointments'][-1 - i], random_day(rng), rng.choice(TIMES))),
+        Benchmark('Database.get_pending_notifications', lambda rng, i: db.get_pending_notifications()),
+        Benchmark('Database.get_next_notifications', lambda rng, i: db.get_next_notifications(50)),
+        Benchmark('Database.mark_notification_sent', lambda rng, i: db.mark_notification_sent(rng.randint(1, count))),
+        Benchmark('Database.get_statistics', lambda rng, i: db.get_statistics()),
+        Benchmark('Database.rebuild_statistics', lambda rng, i: db.rebuild_statistics(), iterations=3),
+        Benchmark('Database.get_data_version', lambda rng, i: db.get_data_version()),
+        Benchmark('Database.get_last_change_id', lambda rng, i: db.get_last_change_id()),
+        Benchmark('Database.get_changes', lambda rng, i: db.get_changes(rng.randint(0, count))),
+        Benchmark('Database.publish_changes', lambda rng, i: db.publish_changes([])),
+        Benchmark('Database.is_maintenance_due', lambda rng, i: db.is_maintenance_due()),
+        Benchmark('Database.run_maintenance', lambda rng, i: db.run_maintenance(), iterations=3),
+        Benchmark('Database.archive_appointments', lambda rng, i: db.archive_appointments(
+            (ANCHOR_DATE - timedelta(days=DAYS_SPAN - i - 1)).isoformat())),
+        Benchmark('AppointmentManager.validate_appointment', lambda rng, i: manager.validate_appointment(
+            rng.randint(1, count), random_day(rng), rng.choice(TIMES), 30)),
+        Benchmark('AppointmentManager.get_available_times', lambda rng, i: manager.get_available_times(
+            random_day(rng))),
+        Benchmark('AppointmentManager.find_free_slots', lambda rng, i: manager.find_free_slots(
+            random_day(rng), 7, 60)),
+        Benchmark('AppointmentManager.get_appointments_by_date_range', lambda rng, i: manager.get_appointments_by_date_range(
+            *days_range(rng, 6))),
+    ]
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def run_benchmark(benchmark: Benchmark, iterations: int, warmup: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(f"{seed}:{benchmark.name}")
+    if benchmark.iterations:
+        iterations, warmup = min(iterations, benchmark.iterations), min(warmup, 1)
+    samples = []
+    rows = 0
+    for i in range(warmup + iterations):
+        started = time.perf_counter()
+        result = benchmark.func(rng, i)
+        elapsed = (time.perf_counter() - started) * 1000
+        if i >= warmup:
+            samples.append(elapsed)
+            rows += benchmark.rows if benchmark.rows is not None else count_rows(result)
+
+    total = sum(samples) / 1000
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(samples, 0.50), 4),
+        'p95_ms': round(percentile(samples, 0.95), 4),
+        'p99_ms': round(percentile(samples, 0.99), 4),
+        'mean_ms': round(sum(samples) / iterations, 4),
+        'rows': rows,
+        'rows_per_sec': round(rows / total, 1) if total else 0.0,
+    }
+
+def missing_benchmarks(benchmarks: List[Benchmark]) -> List[str]:
+    names = {benchmark.name for benchmark in benchmarks}
+    public = {f"{cls.__name__}.{name}" for cls in (Database, AppointmentManager)
+              for name in dir(cls) if not name.startswith('_') and callable(getattr(cls, name))}
+    return sorted(public - names - SKIPPED)
+
+def run_suite(path: str, scale: str, seed: int, iterations: int, warmup: int,
+              only: Optional[str] = None) -> Dict[str, Any]:
+    directory = tempfile.mkdtemp(prefix='benchmark-')
+    working_copy = os.path.join(directory, os.path.basename(path))
+    shutil.copy(path, working_copy)
+
+    db = Database(working_copy)
+    manager = AppointmentManager(db)
+    try:
+        benchmarks = build_benchmarks(db, manager, SCALES[scale])
+        for name in missing_benchmarks(benchmarks):
+            print(f"تنبيه: لا يوجد قياس للدالة {name}")
+
+        results = {}
+        for benchmark in benchmarks:
+            if only and only not in benchmark.name:
+                continue
+            try:
+                stats = results[benchmark.name] = run_benchmark(benchmark, iterations, warmup, seed)
+            except Exception as e:
+                results[benchmark.name] = {'error': str(e)}
+                print(f"{benchmark.name:<52} خطأ: {str(e)}")
+                continue
+            print(f"{benchmark.name:<52} p50 {stats['p50_ms']:>9.3f} ms  p95 {stats['p95_ms']:>9.3f} ms  "
+                  f"p99 {stats['p99_ms']:>9.3f} ms  {stats['rows_per_sec']:>12.1f} صف/ث")
+    finally:
+        db.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        'scale': scale,
+        'seed': seed,
+        'iterations': iterations,
+        'warmup': warmup,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    if baseline.get('scale') != report['scale']:
+        print(f"تنبيه: خط الأساس لحجم {baseline.get('scale')} وليس {report['scale']}")
+
+    regressions = []
+    print(f"\n{'الدالة':<52} {'الأساس p50':>12} {'الحالي p50':>12} {'التغير':>8}")
+    for name, stats in report['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base or 'p50_ms' not in base or 'p50_ms' not in stats:
+            continue
+        change = (stats['p50_ms'] - base['p50_ms']) / base['p50_ms'] if base['p50_ms'] else 0.0
+        regressed = change > threshold and stats['p50_ms'] - base['p50_ms'] > NOISE_FLOOR_MS
+        marker = "  ✗" if regressed else ""
+        print(f"{name:<52} {base['p50_ms']:>12.3f} {stats['p50_ms']:>12.3f} {change:>+8.0%}{marker}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="قياس أداء قاعدة البيانات على بيانات اصطناعية")
+    parser.add_argument('--scale', choices=list(SCALES), default='10k', help="عدد العملاء والمواعيد")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3, help="استدعاءات غير محسوبة قبل القياس")
+    parser.add_argument('--data-dir', default=default_data_dir(),
+                        help=f"مجلد البيانات المولدة والنتائج (الافتراضي ${BENCHMARK_DIR_ENV} أو المجلد المؤقت)")
+    parser.add_argument('--regenerate', action='store_true', help="إعادة توليد البيانات")
+    parser.add_argument('--only', help="قياس الدوال التي يحتوي اسمها على هذا النص فقط "
+                                       "(قياسات التعديل تعتمد على ما أنشأته القياسات السابقة)")
+    parser.add_argument('--output', help="ملف JSON لحفظ النتائج (الافتراضي داخل --data-dir)")
+    parser.add_argument('--baseline', help="ملف JSON لنتائج سابقة للمقارنة")
+    parser.add_argument('--threshold', type=float, default=0.25, help="نسبة التباطؤ المسموح بها في p50")
+    args = parser.parse_args(argv)
+
+    path = prepare_dataset(args.data_dir, args.scale, args.seed, args.regenerate)
+    report = run_suite(path, args.scale, args.seed, args.iterations, args.warmup, args.only)
+
+    output = args.output or os.path.join(args.data_dir, f"benchmark-{args.scale}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nتم حفظ النتائج في {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"\nتباطؤ في {len(regressions)} دالة: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,22 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QCalendarWidget, 
                              QTableWidget, QTableWidgetItem, QPushButton, QLabel, QComboBox)
-from PyQt5.QtCore import Qt, QDate, QLocale
-from PyQt5.QtGui import QFont, QColor, QBrush
+from PyQt5.QtCore import Qt, QDate, QLocale, pyqtSignal
+from PyQt5.QtGui import QFont, QColor, QBrush, QTextCharFormat
+from typing import Optional, List, Dict, Any, Set, Tuple
 import config
 from database import Database
+from db_worker import DatabaseWorker
 
 class CalendarWidget(QWidget):
-    def __init__(self, db: Database):
+    appointment_activated = pyqtSignal(int, str)
+
+    def __init__(self, db: Database, worker: Optional[DatabaseWorker] = None):
         super().__init__()
         self.db = db
+        self.worker = worker or DatabaseWorker(db, parent=self)
+        self.appointments: List[Dict[str, Any]] = []
+        self.month_counts: Dict[Tuple[int, int], Dict[str, int]] = {}
+        self.counts_generation = 0
         self.init_ui()
 
     def init_ui(self):
@@ -23,13 +31,14 @@ class CalendarWidget(QWidget):
         self.calendar = QCalendarWidget()
         self.calendar.setLocale(QLocale(QLocale.Arabic, QLocale.SaudiArabia))
         self.calendar.clicked.connect(self.on_date_selected)
+        self.calendar.currentPageChanged.connect(self.load_month_counts)
         left_layout.addWidget(self.calendar)
 
         view_layout = QHBoxLayout()
         view_layout.addWidget(QLabel("العرض:"))
         self.view_combo = QComboBox()
         self.view_combo.addItems(["يومي", "أسبوعي"])
-        self.view_combo.currentIndexChanged.connect(self.refresh_calendar)
+        self.view_combo.currentIndexChanged.connect(lambda: self.refresh_appointments())
         view_layout.addWidget(self.view_combo)
         view_layout.addStretch()
         left_layout.addLayout(view_layout)
@@ -42,12 +51,17 @@ class CalendarWidget(QWidget):
         appointments_label.setFont(config.FONTS['heading'])
         right_layout.addWidget(appointments_label)
 
+        self.loading_label = QLabel("جارٍ التحميل...")
+        self.loading_label.setVisible(False)
+        right_layout.addWidget(self.loading_label)
+
         self.appointments_table = QTableWidget()
         self.appointments_table.setColumnCount(5)
         self.appointments_table.setHorizontalHeaderLabels([
             "الوقت", "العميل", "الخدمة", "الحالة", "ملاحظات"
         ])
         self.appointments_table.horizontalHeader().setStretchLastSection(True)
+        self.appointments_table.cellDoubleClicked.connect(self.on_appointment_double_click)
         right_layout.addWidget(self.appointments_table)
 
         btn_refresh = QPushButton("تحديث")
@@ -60,30 +74,42 @@ class CalendarWidget(QWidget):
         self.setStyleSheet(self.get_stylesheet())
 
         self.on_date_selected(self.calendar.selectedDate())
+        self.load_month_counts(self.calendar.yearShown(), self.calendar.monthShown())
 
     def on_date_selected(self, date: QDate):
         self.selected_date = date.toString(config.DATE_FORMAT)
         self.refresh_appointments()
 
-    def refresh_appointments(self):
+    def refresh_appointments(self, show_loading: bool = True):
         view_type = self.view_combo.currentText()
 
         if view_type == "يومي":
-            appointments = self.db.get_appointments_by_date(self.selected_date)
+            query, args = self.db.get_appointments_by_date, (self.selected_date,)
         else:
-            from datetime import datetime, timedelta
-            
-            selected = datetime.strptime(self.selected_date, config.DATE_FORMAT)
-            start = selected - timedelta(days=selected.weekday())
-            end = start + timedelta(days=6)
+            selected = QDate.fromString(self.selected_date, config.DATE_FORMAT)
+            start = selected.addDays(1 - selected.dayOfWeek())
+            end = start.addDays(6)
             
-            start_str = start.strftime(config.DATE_FORMAT)
-            end_str = end.strftime(config.DATE_FORMAT)
+            start_str = start.toString(config.DATE_FORMAT)
+            end_str = end.toString(config.DATE_FORMAT)
             
-            all_appointments = self.db.get_all_appointments()
-            appointments = [apt for apt in all_appointments 
-                          if start_str <= apt['appointment_date'] <= end_str]
+            query, args = self.db.get_appointments_between, (start_str, end_str)
+
+        if show_loading:
+            self.loading_label.setText("جارٍ التحميل...")
+            self.loading_label.setVisible(True)
+            self.appointments_table.setEnabled(False)
+        self.worker.submit(f"calendar:{id(self)}", query, *args,
+                           on_result=self.show_appointments, on_error=self.on_load_failed)
+
+    def on_load_failed(self, message: str):
+        self.loading_label.setText(f"تعذر تحميل المواعيد: {message}")
+        self.appointments_table.setEnabled(True)
 
+    def show_appointments(self, appointments: List[Dict[str, Any]]):
+        self.loading_label.setVisible(False)
+        self.appointments_table.setEnabled(True)
+        self.appointments = appointments
         self.appointments_table.setRowCount(len(appointments))
 
         for row, apt in enumerate(appointments):
@@ -106,6 +132,8 @@ class CalendarWidget(QWidget):
 
             for item in [time_item, name_item, service_item, status_item, notes_item]:
                 item.setBackground(QBrush(color))
+                if apt.get('occurrence_date'):
+                    item.setToolTip("موعد متكرر")
 
             self.appointments_table.setItem(row, 0, time_item)
             self.appointments_table.setItem(row, 1, name_item)
@@ -113,8 +141,93 @@ class CalendarWidget(QWidget):
             self.appointments_table.setItem(row, 3, status_item)
             self.appointments_table.setItem(row, 4, notes_item)
 
+    def on_appointment_double_click(self, row: int, column: int):
+        apt = self.appointments[row]
+        self.appointment_activated.emit(apt['id'], apt.get('occurrence_date') or '')
+
+    def load_month_counts(self, year: int, month: int):
+        shown = QDate(year, month, 1)
+        for offset in (0, -1, 1):
+            first = shown.addMonths(offset)
+            key = (first.year(), first.month())
+            if key not in self.month_counts:
+                self.load_month(key)
+
+    def month_task_key(self, key: Tuple[int, int]) -> str:
+        return f"calendar_counts:{id(self)}:{key[0]}-{key[1]}"
+
+    def load_month(self, key: Tuple[int, int]):
+        first = QDate(key[0], key[1], 1)
+        last = first.addDays(first.daysInMonth() - 1)
+        generation = self.counts_generation
+        self.worker.submit(
+            self.month_task_key(key), self.db.get_daily_counts,
+            first.toString(config.DATE_FORMAT), last.toString(config.DATE_FORMAT),
+            on_result=lambda counts, key=key, generation=generation:
+                self.show_month_counts(key, counts, generation),
+            on_error=self.on_load_failed
+        )
+
+    def update_day_counts(self, days: Set[str]):
+        for day in sorted(days):
+            key = (int(day[:4]), int(day[5:7]))
+            if key in self.month_counts:
+                generation = self.counts_generation
+                self.worker.submit(
+                    f"calendar_counts:{id(self)}:{day}", self.db.get_daily_counts, day, day,
+                    on_result=lambda counts, key=key, day=day, generation=generation:
+                        self.show_day_count(key, day, counts.get(day, 0), generation),
+                    on_error=self.on_load_failed
+                )
+            elif self.worker.is_loading(self.month_task_key(key)):
+                self.load_month(key)
+
+    def reload_month_counts(self):
+        self.counts_generation += 1
+        self.month_counts.clear()
+        self.load_month_counts(self.calendar.yearShown(), self.calendar.monthShown())
+
+    def show_month_counts(self, key: Tuple[int, int], counts: Dict[str, int], generation: int):
+        if generation != self.counts_generation:
+            return
+
+        self.month_counts[key] = counts
+        first = QDate(key[0], key[1], 1)
+        for offset in range(first.daysInMonth()):
+            day = first.addDays(offset)
+            self.calendar.setDateTextFormat(day, self.load_format(counts.get(day.toString(config.DATE_FORMAT), 0)))
+
+    def show_day_count(self, key: Tuple[int, int], day: str, count: int, generation: int):
+        if generation != self.counts_generation or key not in self.month_counts:
+            return
+
+        self.month_counts[key][day] = count
+        self.calendar.setDateTextFormat(QDate.fromString(day, config.DATE_FORMAT), self.load_format(count))
+
+    def load_format(self, count: int) -> QTextCharFormat:
+        text_format = QTextCharFormat()
+        for threshold, color in reversed(config.CALENDAR_LOAD_COLORS):
+            if count >= threshold:
+                text_format.setBackground(QBrush(QColor(color)))
+                text_format.setToolTip(f"عدد المواعيد: {count}")
+                break
+        return text_format
+
     def refresh_calendar(self):
         self.refresh_appointments()
+        self.reload_month_counts()
+
+    def apply_changes(self, changes: List[Dict[str, Any]]):
+        if any(change['table_name'] == 'appointment_series' for change in changes):
+            self.reload_month_counts()
+        else:
+            self.update_day_counts({day for change in changes if change['table_name'] == 'appointments'
+                                    for day in (change.get('old_date'), change.get('new_date')) if day})
+
+        client_ids = {apt['client_id'] for apt in self.appointments}
+        if any(change['table_name'] != 'clients' or change['row_id'] in client_ids
+               for change in changes):
+            self.refresh_appointments(show_loading=False)
 
     def get_stylesheet(self) -> str:
         return f"""
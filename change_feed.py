@@ -0,0 +1,87 @@
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from typing import List, Dict, Any, Optional, Tuple
+import config
+from database import Database
+from db_worker import DatabaseWorker
+
+class ChangeFeed(QObject):
+    changes_received = pyqtSignal(object)
+    reset_required = pyqtSignal()
+    local_change = pyqtSignal()
+
+    def __init__(self, db: Database, worker: Optional[DatabaseWorker] = None,
+                 interval: int = config.CHANGE_POLL_INTERVAL_MS,
+                 batch_size: int = config.CHANGE_FEED_BATCH, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker or DatabaseWorker(db, parent=self)
+        self.task_key = f"change_feed:{id(self)}"
+        self.batch_size = batch_size
+        self.last_id = db.get_last_change_id()
+        self._fetching = False
+        self._pending = False
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.poll)
+
+        self.local_change.connect(self.poll)
+        self.db.add_observer(self.on_database_event)
+
+    def start(self):
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+        self.worker.cancel(self.task_key)
+        self.db.remove_observer(self.on_database_event)
+
+    def on_database_event(self, event: str, payload: dict):
+        if event not in ('changes_received', 'changes_reset'):
+            self.local_change.emit()
+
+    def poll(self):
+        if self._fetching:
+            self._pending = True
+            return
+
+        self._fetching = True
+        self.worker.submit(self.task_key, self.read_changes, self.last_id,
+                           on_result=self.apply_changes, on_error=self.on_failed)
+
+    def read_changes(self, after_id: int) -> Tuple[Optional[List[Dict[str, Any]]], int]:
+        changes = self.db.get_changes(after_id, self.batch_size + 1)
+        if len(changes) > self.batch_size:
+            last_id = self.db.get_last_change_id()
+            local = self.db.take_local_changes(last_id)
+            if sum(change_id > after_id for change_id in local) == last_id - after_id:
+                return [], last_id
+            self.db.publish_changes(None)
+            return None, last_id
+
+        if not changes:
+            return changes, after_id
+        local = self.db.take_local_changes(changes[-1]['id'])
+        remote = [change for change in changes if change['id'] not in local]
+        if remote:
+            self.db.publish_changes(remote)
+        return remote, changes[-1]['id']
+
+    def apply_changes(self, result: Tuple[Optional[List[Dict[str, Any]]], int]):
+        changes, self.last_id = result
+        self._finish()
+
+        if changes is None:
+            self.reset_required.emit()
+        elif changes:
+            self.changes_received.emit(changes)
+
+    def on_failed(self, message: str):
+        print(f"خطأ في متابعة تغييرات قاعدة البيانات: {message}")
+        self._finish()
+
+    def _finish(self):
+        self._fetching = False
+        if self._pending:
+            self._pending = False
+            self.poll()
@@ -0,0 +1,62 @@
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QVariant, pyqtSignal
+from typing import List, Dict, Any, Optional
+from models import ClientCache
+
+def client_label(client: Dict[str, Any]) -> str:
+    return f"{client['name']} ({client['phone']})"
+
+class ClientSearchModel(QAbstractListModel):
+    cache_changed = pyqtSignal(str, int)
+
+    def __init__(self, cache: Optional[ClientCache] = None, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self._clients: List[Dict[str, Any]] = []
+
+        if self.cache is not None:
+            self.cache_changed.connect(self.apply_change)
+            self.cache.add_observer(self.on_cache_event)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._clients)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+
+        client = self._clients[index.row()]
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return client_label(client)
+        if role == Qt.UserRole:
+            return client['id']
+        return QVariant()
+
+    def set_clients(self, clients: List[Dict[str, Any]]):
+        self.beginResetModel()
+        self._clients = list(clients)
+        self.endResetModel()
+
+    def client(self, row: int) -> Dict[str, Any]:
+        return self._clients[row]
+
+    def detach(self):
+        if self.cache is not None:
+            self.cache.remove_observer(self.on_cache_event)
+
+    def on_cache_event(self, event: str, client_id: int):
+        self.cache_changed.emit(event, client_id)
+
+    def apply_change(self, event: str, client_id: int):
+        for row, client in enumerate(self._clients):
+            if client['id'] != client_id:
+                continue
+            if event == 'client_deleted':
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._clients[row]
+                self.endRemoveRows()
+            elif event == 'client_updated':
+                updated = self.cache.cached(client_id)
+                if updated is not None:
+                    self._clients[row] = updated
+                    self.dataChanged.emit(self.index(row), self.index(row))
+            return
@@ -1,15 +1,27 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, 
                              QLineEdit, QTableWidget, QTableWidgetItem, QMessageBox, QHeaderView)
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QFont
+from typing import Optional, List, Dict, Any
 import config
 from database import Database
+from db_worker import DatabaseWorker
+from models import ClientCache
 
 class ClientsWindow(QDialog):
-    def __init__(self, db: Database, parent=None):
+    client_cache_changed = pyqtSignal(str, int)
+
+    def __init__(self, db: Database, parent=None, worker: Optional[DatabaseWorker] = None,
+                 client_cache: Optional[ClientCache] = None):
         super().__init__(parent)
         self.db = db
+        self.worker = worker or DatabaseWorker(db, parent=self)
+        self.client_cache = client_cache or ClientCache.for_database(db)
+        self.task_key = f"clients_window:{id(self)}"
+        self.selected_client_id = None
         self.init_ui()
+        self.client_cache_changed.connect(self.apply_client_change)
+        self.client_cache.add_observer(self.on_client_cache_event)
         self.refresh_table()
 
     def init_ui(self):
@@ -29,6 +41,10 @@ class ClientsWindow(QDialog):
         table_layout.addWidget(QLabel("قائمة العملاء:"))
         table_layout.setSpacing(10)
         
+        self.loading_label = QLabel("جارٍ التحميل...")
+        self.loading_label.setVisible(False)
+        table_layout.addWidget(self.loading_label)
+        
         self.clients_table = QTableWidget()
         self.clients_table.setColumnCount(5)
         self.clients_table.setHorizontalHeaderLabels([
@@ -91,16 +107,14 @@ class ClientsWindow(QDialog):
             QMessageBox.warning(self, "خطأ", "يجب إدخال الاسم ورقم الهاتف")
             return
 
-        try:
-            self.db.add_client(name, phone, email)
+        def on_added(client_id):
             QMessageBox.information(self, "نجاح", f"تم إضافة العميل {name} بنجاح")
             self.clear_inputs()
-            self.refresh_table()
             
             if self.parent():
                 self.parent().refresh_all_data()
-        except Exception as e:
-            QMessageBox.critical(self, "خطأ", str(e))
+
+        self.run_write(self.db.add_client, name, phone, email, on_result=on_added)
 
     def update_client(self):
         if not self.selected_client_id:
@@ -115,13 +129,12 @@ class ClientsWindow(QDialog):
             QMessageBox.warning(self, "خطأ", "يجب إدخال الاسم ورقم الهاتف")
             return
 
-        try:
-            self.db.update_client(self.selected_client_id, name, phone, email)
+        def on_updated(result):
             QMessageBox.information(self, "نجاح", "تم تحديث بيانات العميل بنجاح")
             self.clear_inputs()
-            self.refresh_table()
-        except Exception as e:
-            QMessageBox.critical(self, "خطأ", str(e))
+
+        self.run_write(self.db.update_client, self.selected_client_id, name, phone, email,
+                       on_result=on_updated)
 
     def delete_client(self):
         if not self.selected_client_id:
@@ -133,28 +146,91 @@ class ClientsWindow(QDialog):
                                      QMessageBox.Yes | QMessageBox.No)
 
         if reply == QMessageBox.Yes:
-            self.db.delete_client(self.selected_client_id)
-            QMessageBox.information(self, "نجاح", "تم حذف العميل بنجاح")
-            self.clear_inputs()
-            self.refresh_table()
+            def on_deleted(result):
+                QMessageBox.information(self, "نجاح", "تم حذف العميل بنجاح")
+                self.clear_inputs()
+
+            self.run_write(self.db.delete_client, self.selected_client_id, on_result=on_deleted)
+
+    def run_write(self, func, *args, on_result=None):
+        def on_error(message: str):
+            self.setEnabled(True)
+            QMessageBox.critical(self, "خطأ", message)
+
+        def on_done(result):
+            self.setEnabled(True)
+            on_result(result)
+
+        self.setEnabled(False)
+        self.worker.submit(f"{self.task_key}:write", func, *args,
+                           on_result=on_done, on_error=on_error)
 
     def refresh_table(self):
-        clients = self.db.get_all_clients()
+        if self.client_cache.loaded:
+            self.show_clients(self.client_cache.get_all())
+            return
+
+        self.loading_label.setText("جارٍ التحميل...")
+        self.loading_label.setVisible(True)
+        self.worker.submit(f"{self.task_key}:clients", self.client_cache.get_all,
+                           on_result=self.show_clients, on_error=self.on_load_failed)
+
+    def on_load_failed(self, message: str):
+        self.loading_label.setText(f"تعذر تحميل العملاء: {message}")
+
+    def show_clients(self, clients: List[Dict[str, Any]]):
+        self.loading_label.setVisible(False)
         self.clients_table.setRowCount(len(clients))
 
         for row, client in enumerate(clients):
-            self.clients_table.setItem(row, 0, QTableWidgetItem(str(client['id'])))
-            self.clients_table.setItem(row, 1, QTableWidgetItem(client['name']))
-            self.clients_table.setItem(row, 2, QTableWidgetItem(client['phone']))
-            self.clients_table.setItem(row, 3, QTableWidgetItem(client.get('email', '')))
-            self.clients_table.setItem(row, 4, QTableWidgetItem(client.get('created_at', '')[:10]))
+            self.set_client_row(row, client)
+
+    def set_client_row(self, row: int, client: Dict[str, Any]):
+        self.clients_table.setItem(row, 0, QTableWidgetItem(str(client['id'])))
+        self.clients_table.setItem(row, 1, QTableWidgetItem(client['name']))
+        self.clients_table.setItem(row, 2, QTableWidgetItem(client['phone']))
+        self.clients_table.setItem(row, 3, QTableWidgetItem(client.get('email') or ''))
+        self.clients_table.setItem(row, 4, QTableWidgetItem((client.get('created_at') or '')[:10]))
+
+    def find_client_row(self, client_id: int) -> int:
+        for row in range(self.clients_table.rowCount()):
+            item = self.clients_table.item(row, 0)
+            if item is not None and item.text() == str(client_id):
+                return row
+        return -1
+
+    def on_client_cache_event(self, event: str, client_id: int):
+        self.client_cache_changed.emit(event, client_id)
+
+    def apply_client_change(self, event: str, client_id: int):
+        if event == 'clients_reloaded':
+            self.refresh_table()
+            return
+
+        row = self.find_client_row(client_id)
+        if event == 'client_deleted':
+            if row >= 0:
+                self.clients_table.removeRow(row)
+            return
+
+        client = self.client_cache.get(client_id)
+        if client is None:
+            return
+        if row < 0:
+            row = self.clients_table.rowCount()
+            self.clients_table.insertRow(row)
+        self.set_client_row(row, client)
+
+    def closeEvent(self, event):
+        self.client_cache.remove_observer(self.on_client_cache_event)
+        super().closeEvent(event)
 
     def on_client_selected(self):
         selected_rows = self.clients_table.selectionModel().selectedRows()
         if selected_rows:
             row = selected_rows[0].row()
             client_id = int(self.clients_table.item(row, 0).text())
-            client = self.db.get_client_by_id(client_id)
+            client = self.client_cache.get(client_id)
             
             if client:
                 self.selected_client_id = client_id
@@ -1,9 +1,21 @@
-from PyQt5.QtGui import QFont, QColor
-from PyQt5.QtCore import Qt
-
 APP_NAME = "نظام حجز المواعيد"
 APP_VERSION = "1.0.0"
 DB_NAME = "appointments.db"
+DB_PROFILE = "wal"
+
+QUERY_TRACE = False
+SLOW_QUERY_MS = 100
+SLOW_QUERY_LOG = "slow_queries.log"
+QUERY_TRACE_REPORT = "query_trace.json"
+
+STARTUP_REPORT = False
+
+ARCHIVE_AFTER_DAYS = 730
+
+NOTIFICATION_RETENTION_DAYS = 30
+CHANGE_LOG_RETENTION_DAYS = 7
+MAINTENANCE_INTERVAL_HOURS = 24
+MAINTENANCE_CHECK_INTERVAL_MS = 60 * 60 * 1000
 
 WINDOW_WIDTH = 1200
 WINDOW_HEIGHT = 800
@@ -16,6 +28,17 @@ SERVICES = [
     "خدمة أخرى"
 ]
 
+BUSINESS_HOURS = ("09:00", "17:00")
+SLOT_MINUTES = 15
+
+SERVICE_DURATIONS = {service: 30 for service in SERVICES}
+
+RECURRENCE_FREQUENCIES_AR = {
+    "daily": "يومياً",
+    "weekly": "أسبوعياً",
+    "monthly": "شهرياً"
+}
+
 APPOINTMENT_STATUS = [
     "scheduled",
     "completed",
@@ -38,16 +61,47 @@ COLORS = {
     'text': '#333333'
 }
 
-FONTS = {
-    'title': QFont('Arial', 16, QFont.Bold),
-    'heading': QFont('Arial', 14, QFont.Bold),
-    'normal': QFont('Arial', 11),
-    'small': QFont('Arial', 9)
+CALENDAR_LOAD_COLORS = [
+    (1, '#E3F2FD'),
+    (4, '#90CAF9'),
+    (8, '#42A5F5')
+]
+
+FONT_SPECS = {
+    'title': ('Arial', 16, True),
+    'heading': ('Arial', 14, True),
+    'normal': ('Arial', 11, False),
+    'small': ('Arial', 9, False)
 }
 
+def __getattr__(name: str):
+    if name != 'FONTS':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    from PyQt5.QtGui import QFont
+    global FONTS
+    FONTS = {key: QFont(family, size, QFont.Bold if bold else QFont.Normal)
+             for key, (family, size, bold) in FONT_SPECS.items()}
+    return FONTS
+
 TIME_FORMAT = "HH:mm"
 DATE_FORMAT = "yyyy-MM-dd"
 DATETIME_FORMAT = "yyyy-MM-dd HH:mm"
 
 NOTIFICATION_ADVANCE_MINUTES = 60
 NOTIFICATION_CHECK_INTERVAL = 60000
+RECURRING_REMINDER_DAYS = 2
+
+CHANGE_POLL_INTERVAL_MS = 1000
+CHANGE_FEED_BATCH = 500
+
+CLIENT_SEARCH_LIMIT = 20
+CLIENT_SEARCH_DELAY_MS = 200
+
+API_HOST = "127.0.0.1"
+API_PORT = 8080
+API_WORKERS = 8
+API_MAX_BODY_BYTES = 64 * 1024
+API_APPOINTMENTS_LIMIT = 200
+API_MAX_APPOINTMENTS = 1000
+API_IDLE_TIMEOUT = 15
@@ -1,275 +1,1272 @@
 import sqlite3
 import os
-from datetime import datetime
-from typing import List, Tuple, Optional, Dict, Any
+import re
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from datetime import datetime, date, timedelta
+from typing import List, Tuple, Optional, Dict, Any, Iterator, Callable, Set
+import config
+from migrations import (migrate, REBUILD_STATISTICS, REBUILD_ARCHIVE_STATISTICS, ARCHIVE_SCHEMA,
+                        ARCHIVE_APPOINTMENT_COLUMNS, ARCHIVE_NOTIFICATION_COLUMNS)
+from recurrence import FREQUENCIES, occurrences, occurrence_index, last_occurrence
+from query_trace import QueryTracer, TracedConnection, create_tracer
+
+CACHED_STATEMENTS = 256
+
+CONNECTION_PROFILES = {
+    'wal': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000,
+            'retries': 5, 'retry_delay': 0.05},
+    'network': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 10000,
+                'retries': 8, 'retry_delay': 0.1},
+}
+DEFAULT_PROFILE = 'wal'
+
+ARCHIVE_STATUSES = ('completed', 'cancelled')
+ARCHIVE_BATCH = 500
+
+MAINTENANCE_BATCH = 1000
+ANALYSIS_LIMIT = 1000
+
+ORPHAN_CONDITIONS = [
+    ('appointments', 'client_id NOT IN (SELECT id FROM clients)'),
+    ('appointment_series', 'appointment_id NOT IN (SELECT id FROM appointments)'),
+    ('notifications', 'appointment_id NOT IN (SELECT id FROM appointments)'),
+]
+
+DEFAULT_APPOINTMENT_MINUTES = 30
+MAX_APPOINTMENT_MINUTES = 480
+
+APPOINTMENT_SORT_KEYS = {
+    'id': [('a.id', 'id')],
+    'name': [('c.name', 'name'), ('c.id', 'client_id'), ('a.id', 'id')],
+    'date': [('a.appointment_date', 'appointment_date'),
+             ('a.appointment_time', 'appointment_time'), ('a.id', 'id')],
+    'time': [('a.appointment_time', 'appointment_time'), ('a.id', 'id')],
+    'service': [("COALESCE(a.service, '')", 'service'), ('a.id', 'id')],
+    'status': [("COALESCE(a.status, '')", 'status'), ('a.id', 'id')],
+    'notes': [("COALESCE(a.notes, '')", 'notes'), ('a.id', 'id')],
+}
+
+CHANGE_EVENTS = {
+    ('clients', 'insert'): 'client_added',
+    ('clients', 'update'): 'client_updated',
+    ('clients', 'delete'): 'client_deleted',
+    ('appointments', 'insert'): 'appointment_added',
+    ('appointments', 'update'): 'appointment_updated',
+    ('appointments', 'delete'): 'appointment_deleted',
+    ('appointment_series', 'insert'): 'series_added',
+    ('appointment_series', 'update'): 'series_updated',
+    ('appointment_series', 'delete'): 'series_updated',
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+def to_epoch(date: str, time: str) -> int:
+    return int((datetime.fromisoformat(f"{date} {time[:5]}") - EPOCH).total_seconds())
+
+def check_duration(duration: int):
+    if not isinstance(duration, int) or not 0 < duration <= MAX_APPOINTMENT_MINUTES:
+        raise ValueError("خطأ: مدة الموعد غير صالحة")
+
+def epoch_now() -> int:
+    return int((datetime.now().replace(microsecond=0) - EPOCH).total_seconds())
+
+def epoch_to_date(timestamp: int) -> str:
+    return (EPOCH + timedelta(seconds=timestamp)).date().isoformat()
+
+def shift_date(day: str, days: int) -> str:
+    return (date.fromisoformat(day) + timedelta(days=days)).isoformat()
+
+def archive_path_for(db_path: str) -> str:
+    root, extension = os.path.splitext(db_path)
+    return f"{root}_archive{extension or '.db'}"
+
+def appointment_order(appointment: Dict[str, Any]) -> Tuple[str, str]:
+    return appointment['appointment_date'], appointment['appointment_time']
+
+def notification_message(appointment_time: str, client_name: str) -> str:
+    return f"تذكير: لديك موعد في {appointment_time} مع {client_name}"
+
+def fts_prefix_query(text: str) -> str:
+    return ' '.join(f'"{token}"*' for token in re.findall(r'\w+', text))
+
+def is_busy_error(error: sqlite3.OperationalError) -> bool:
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff == sqlite3.SQLITE_BUSY
+    return 'database is locked' in str(error)
+
+def retry_on_busy(method: Callable) -> Callable:
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self.pool.run(method, self, *args, **kwargs)
+    return wrapper
+
+def chunked(items: List[Any], size: int = 500) -> Iterator[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class ConnectionPool:
+    def __init__(self, db_path: str, cached_statements: int = CACHED_STATEMENTS,
+                 profile: str = DEFAULT_PROFILE, tracer: Optional[QueryTracer] = None,
+                 on_connect: Optional[Callable[[sqlite3.Connection], Any]] = None):
+        if profile not in CONNECTION_PROFILES:
+            raise Exception(f"خطأ: إعدادات الاتصال غير معروفة: {profile}")
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self.profile = CONNECTION_PROFILES[profile]
+        self.tracer = tracer
+        self.on_connect = on_connect
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._local_changes: Set[int] = set()
+
+    def acquire(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path,
+                                   timeout=self.profile['busy_timeout'] / 1000,
+                                   isolation_level='IMMEDIATE',
+                                   cached_statements=self.cached_statements,
+                                   check_same_thread=False,
+                                   factory=TracedConnection if self.tracer else sqlite3.Connection)
+            conn.row_factory = sqlite3.Row
+            if self.tracer:
+                self.tracer.attach(conn)
+            self.configure(conn)
+            self._local.conn = conn
+            self._local.depth = 0
+            self._local.pending = []
+            self._local.tracking = False
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'change_log'").fetchone():
+                self.track_local_changes(conn)
+            if self.on_connect:
+                self.on_connect(conn)
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def configure(self, conn: sqlite3.Connection):
+        if conn.execute('PRAGMA page_count').fetchone()[0] == 0:
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute(f"PRAGMA busy_timeout = {int(self.profile['busy_timeout'])}")
+        conn.execute(f"PRAGMA journal_mode = {self.profile['journal_mode']}")
+        conn.execute(f"PRAGMA synchronous = {self.profile['synchronous']}")
+        conn.execute('PRAGMA foreign_keys = ON')
+
+    def track_local_changes(self, conn: sqlite3.Connection):
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS local_changes (id INTEGER PRIMARY KEY)')
+        conn.execute('''
+            CREATE TEMP TRIGGER IF NOT EXISTS record_local_change AFTER INSERT ON main.change_log
+            BEGIN
+                INSERT OR IGNORE INTO local_changes (id) VALUES (NEW.id);
+            END
+        ''')
+        self._local.tracking = True
+
+    def take_local_changes(self, up_to_id: int) -> Set[int]:
+        with self._lock:
+            taken = {change_id for change_id in self._local_changes if change_id <= up_to_id}
+            self._local_changes -= taken
+        return taken
+
+    def _commit(self, conn: sqlite3.Connection):
+        written: Set[int] = set()
+        if self._local.tracking and conn.in_transaction:
+            written = {row[0] for row in conn.execute('DELETE FROM temp.local_changes RETURNING id')}
+        with self._lock:
+            self._local_changes |= written
+        try:
+            conn.commit()
+        except Exception:
+            with self._lock:
+                self._local_changes -= written
+            raise
+
+    def run(self, func: Callable, *args, **kwargs):
+        self.acquire()
+        if self._local.depth > 0:
+            return func(*args, **kwargs)
+
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if attempt >= self.profile['retries'] or not is_busy_error(e):
+                    raise
+            time.sleep(self.profile['retry_delay'] * (2 ** attempt) * random.uniform(0.5, 1.5))
+            attempt += 1
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        depth = self._local.depth
+        self._local.depth = depth + 1
+        try:
+            yield conn
+            if depth == 0:
+                self._commit(conn)
+        except Exception:
+            if depth == 0:
+                conn.rollback()
+                self._local.pending = []
+            raise
+        finally:
+            self._local.depth = depth
+
+        if depth == 0 and self._local.pending:
+            pending, self._local.pending = self._local.pending, []
+            for callback in pending:
+                callback()
+
+    def after_commit(self, callback: Callable[[], None]):
+        self.acquire()
+        if self._local.depth > 0:
+            self._local.pending.append(callback)
+        else:
+            callback()
+
+    def close_all(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
 
 class Database:
-    def __init__(self, db_name: str = "appointments.db"):
+    def __init__(self, db_name: str = "appointments.db", profile: str = DEFAULT_PROFILE,
+                 tracer: Optional[QueryTracer] = None):
         self.db_path = db_name
+        self.archive_path = archive_path_for(db_name)
+        self.tracer = tracer or create_tracer()
+        self.pool = ConnectionPool(db_name, profile=profile, tracer=self.tracer,
+                                   on_connect=self._attach_archive)
+        self._observers: List[Callable[[str, Dict[str, Any]], None]] = []
+        if self.tracer:
+            self.tracer.instrument(self)
         self.init_database()
 
-    def get_connection(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+    def connection(self):
+        return self.pool.connection()
+
+    def add_observer(self, callback: Callable[[str, Dict[str, Any]], None]):
+        self._observers.append(callback)
+
+    def remove_observer(self, callback: Callable[[str, Dict[str, Any]], None]):
+        if callback in self._observers:
+            self._observers.remove(callback)
+
+    def _notify(self, event: str, **payload):
+        self.pool.after_commit(lambda: self._dispatch(event, payload))
+
+    def _dispatch(self, event: str, payload: Dict[str, Any]):
+        for callback in list(self._observers):
+            try:
+                callback(event, payload)
+            except Exception as e:
+                print(f"خطأ في معالجة حدث قاعدة البيانات {event}: {str(e)}")
+
+    def close(self):
+        if self.tracer:
+            self.tracer.write_report()
+        self.pool.close_all()
 
     def init_database(self):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clients (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                phone TEXT NOT NULL UNIQUE,
-                email TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        with self.connection() as conn:
+            migrate(conn)
+            self.pool.track_local_changes(conn)
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS appointments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_id INTEGER NOT NULL,
-                appointment_date TEXT NOT NULL,
-                appointment_time TEXT NOT NULL,
-                service TEXT,
-                notes TEXT,
-                status TEXT DEFAULT 'scheduled',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (client_id) REFERENCES clients(id) ON DELETE CASCADE
-            )
-        ''')
+    def _attach_archive(self, conn: sqlite3.Connection, create: bool = False, required: bool = False) -> bool:
+        if conn.execute("SELECT 1 FROM pragma_database_list WHERE name = 'archive'").fetchone():
+            return True
+        if not (create or os.path.exists(self.archive_path)):
+            return False
+        if conn.in_transaction:
+            if required or create:
+                raise Exception("خطأ: لا يمكن فتح قاعدة بيانات الأرشيف أثناء معاملة مفتوحة")
+            return False
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS notifications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                appointment_id INTEGER NOT NULL,
-                notification_time TEXT NOT NULL,
-                message TEXT,
-                is_sent INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (appointment_id) REFERENCES appointments(id) ON DELETE CASCADE
-            )
-        ''')
+        conn.execute('ATTACH DATABASE ? AS archive', (self.archive_path,))
+        for statement in ARCHIVE_SCHEMA:
+            conn.execute(statement)
+        return True
+
+    def _archive_reaches(self, conn: sqlite3.Connection, start_date: Optional[str] = None) -> bool:
+        if not self._attach_archive(conn):
+            return False
+        last = conn.execute('SELECT MAX(appointment_date) FROM archive.appointments').fetchone()[0]
+        return last is not None and (start_date is None or start_date <= last)
 
-        conn.commit()
-        conn.close()
+    def _with_archived(self, conn: sqlite3.Connection, appointments: List[Dict[str, Any]],
+                       query: str, params: Any) -> List[Dict[str, Any]]:
+        hot_ids = {apt['id'] for apt in appointments}
+        archived = [dict(row) for row in conn.execute(query.format(table='archive.appointments'), params)
+                    if row['id'] not in hot_ids]
+        return archived + appointments
 
+    @retry_on_busy
     def add_client(self, name: str, phone: str, email: str = "") -> int:
-        conn = self.get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute('''
+            with self.connection() as conn:
+                cursor = conn.execute('''
+                    INSERT INTO clients (name, phone, email)
+                    VALUES (?, ?, ?)
+                ''', (name, phone, email))
+                client_id = cursor.lastrowid
+        except sqlite3.IntegrityError:
+            raise sqlite3.IntegrityError("خطأ: رقم الهاتف موجود بالفعل")
+
+        self._notify('client_added', client_id=client_id)
+        return client_id
+
+    @retry_on_busy
+    def bulk_add_clients(self, clients: List[Tuple[str, str, str]]) -> Dict[int, str]:
+        errors: Dict[int, str] = {}
+        valid = []
+        seen = set()
+
+        with self.connection() as conn:
+            existing = self.get_client_ids_by_phone([phone for _, phone, _ in clients if phone])
+            for index, (name, phone, email) in enumerate(clients):
+                if not name or not phone:
+                    errors[index] = "يجب إدخال الاسم ورقم الهاتف"
+                elif phone in existing or phone in seen:
+                    errors[index] = "خطأ: رقم الهاتف موجود بالفعل"
+                else:
+                    seen.add(phone)
+                    valid.append((name, phone, email or ""))
+
+            conn.executemany('''
                 INSERT INTO clients (name, phone, email)
                 VALUES (?, ?, ?)
-            ''', (name, phone, email))
-            conn.commit()
-            client_id = cursor.lastrowid
-            return client_id
-        except sqlite3.IntegrityError as e:
-            raise Exception(f"خطأ: رقم الهاتف موجود بالفعل")
-        finally:
-            conn.close()
+            ''', valid)
+
+        if valid:
+            self._notify('clients_imported', count=len(valid))
+        return errors
+
+    def get_client_ids_by_phone(self, phones: List[str]) -> Dict[str, int]:
+        ids: Dict[str, int] = {}
+        with self.connection() as conn:
+            for chunk in chunked(list(set(phones))):
+                placeholders = ', '.join('?' * len(chunk))
+                cursor = conn.execute(f'SELECT id, phone FROM clients WHERE phone IN ({placeholders})', chunk)
+                ids.update((row['phone'], row['id']) for row in cursor)
+        return ids
 
     def get_all_clients(self) -> List[Dict[str, Any]]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM clients ORDER BY name')
-        clients = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return clients
+        with self.connection() as conn:
+            cursor = conn.execute('SELECT * FROM clients ORDER BY name')
+            return [dict(row) for row in cursor.fetchall()]
+
+    def search_clients(self, text: str, limit: int = config.CLIENT_SEARCH_LIMIT) -> List[Dict[str, Any]]:
+        clients: List[Dict[str, Any]] = []
+        phone = re.sub(r'[\s()+-]', '', text)
+        query = fts_prefix_query(text)
+
+        with self.connection() as conn:
+            if phone.isdigit():
+                cursor = conn.execute('''
+                    SELECT * FROM clients
+                    WHERE phone >= ? AND phone < ?
+                    ORDER BY phone
+                    LIMIT ?
+                ''', (phone, phone + '\uffff', limit))
+                clients = [dict(row) for row in cursor.fetchall()]
+
+            if query and len(clients) < limit:
+                found = {client['id'] for client in clients}
+                cursor = conn.execute('''
+                    SELECT c.* FROM clients_fts f
+                    JOIN clients c ON c.id = f.rowid
+                    WHERE clients_fts MATCH ?
+                    ORDER BY f.rowid
+                    LIMIT ?
+                ''', (query, limit))
+                clients.extend(client for client in map(dict, cursor.fetchall())
+                               if client['id'] not in found)
+
+        return clients[:limit]
 
     def get_client_by_id(self, client_id: int) -> Optional[Dict[str, Any]]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM clients WHERE id = ?', (client_id,))
-        client = cursor.fetchone()
-        conn.close()
-        return dict(client) if client else None
+        with self.connection() as conn:
+            client = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
+            return dict(client) if client else None
 
+    @retry_on_busy
     def update_client(self, client_id: int, name: str, phone: str, email: str = ""):
-        conn = self.get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute('''
-                UPDATE clients 
-                SET name = ?, phone = ?, email = ?
-                WHERE id = ?
-            ''', (name, phone, email, client_id))
-            conn.commit()
+            with self.connection() as conn:
+                conn.execute('''
+                    UPDATE clients 
+                    SET name = ?, phone = ?, email = ?
+                    WHERE id = ?
+                ''', (name, phone, email, client_id))
         except sqlite3.IntegrityError:
-            raise Exception(f"خطأ: رقم الهاتف موجود بالفعل")
-        finally:
-            conn.close()
+            raise sqlite3.IntegrityError("خطأ: رقم الهاتف موجود بالفعل")
+
+        self._notify('client_updated', client_id=client_id)
 
+    @retry_on_busy
     def delete_client(self, client_id: int):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM clients WHERE id = ?', (client_id,))
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            if self._attach_archive(conn, required=True):
+                self._purge_archived(conn, 'client_id = ?', (client_id,))
+            conn.execute('DELETE FROM clients WHERE id = ?', (client_id,))
 
+        self._notify('client_deleted', client_id=client_id)
+
+    @retry_on_busy
     def add_appointment(self, client_id: int, appointment_date: str, 
-                       appointment_time: str, service: str = "", notes: str = "") -> int:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO appointments (client_id, appointment_date, appointment_time, service, notes)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (client_id, appointment_date, appointment_time, service, notes))
-        conn.commit()
-        appointment_id = cursor.lastrowid
-        
-        self.add_notification(appointment_id, appointment_date, appointment_time)
-        
-        conn.close()
+                       appointment_time: str, service: str = "", notes: str = "",
+                       duration: int = DEFAULT_APPOINTMENT_MINUTES) -> int:
+        check_duration(duration)
+        starts_at = to_epoch(appointment_date, appointment_time)
+        with self.connection() as conn:
+            client = conn.execute('SELECT name FROM clients WHERE id = ?', (client_id,)).fetchone()
+            if client is None:
+                raise Exception("خطأ: العميل غير موجود")
+
+            cursor = conn.execute('''
+                INSERT INTO appointments (client_id, appointment_date, appointment_time, service, notes,
+                                          starts_at, duration)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (client_id, appointment_date, appointment_time, service, notes, starts_at, duration))
+            appointment_id = cursor.lastrowid
+
+            self._insert_notification(conn, appointment_id, appointment_date,
+                                      appointment_time, client['name'])
+
+        self._notify('appointment_added', appointment_id=appointment_id,
+                     appointment_date=appointment_date, appointment_time=appointment_time)
         return appointment_id
 
+    @retry_on_busy
+    def run_in_transaction(self, func: Callable, *args, **kwargs):
+        with self.connection() as conn:
+            if not conn.in_transaction:
+                conn.execute('BEGIN IMMEDIATE')
+            return func(*args, **kwargs)
+
+    @retry_on_busy
+    def book_appointment(self, client_id: int, appointment_date: str, appointment_time: str,
+                         service: str = "", notes: str = "",
+                         duration: int = DEFAULT_APPOINTMENT_MINUTES) -> Tuple[Optional[int], List[Dict[str, Any]]]:
+        check_duration(duration)
+        with self.connection() as conn:
+            if not conn.in_transaction:
+                conn.execute('BEGIN IMMEDIATE')
+            conflicts = self.get_conflicting_appointments(appointment_date, appointment_time, duration)
+            if conflicts:
+                return None, conflicts
+            return self.add_appointment(client_id, appointment_date, appointment_time,
+                                        service, notes, duration), []
+
+    @retry_on_busy
+    def bulk_add_appointments(self, appointments: List[Tuple[int, str, str, str, str, int]]) -> Dict[int, str]:
+        errors: Dict[int, str] = {}
+        valid = []
+
+        with self.connection() as conn:
+            client_names: Dict[int, str] = {}
+            for chunk in chunked(list({apt[0] for apt in appointments if apt[0]})):
+                placeholders = ', '.join('?' * len(chunk))
+                cursor = conn.execute(f'SELECT id, name FROM clients WHERE id IN ({placeholders})', chunk)
+                client_names.update((row['id'], row['name']) for row in cursor)
+
+            for index, (client_id, appointment_date, appointment_time,
+                        service, notes, duration) in enumerate(appointments):
+                if client_id not in client_names:
+                    errors[index] = "العميل غير موجود"
+                    continue
+                try:
+                    starts_at = to_epoch(appointment_date, appointment_time)
+                except (TypeError, ValueError):
+                    errors[index] = "تاريخ أو وقت غير صالح"
+                    continue
+                duration = duration or DEFAULT_APPOINTMENT_MINUTES
+                if not 0 < duration <= MAX_APPOINTMENT_MINUTES:
+                    errors[index] = "مدة الموعد غير صالحة"
+                    continue
+                valid.append((client_id, appointment_date, appointment_time,
+                              service or "", notes or "", starts_at, duration))
+
+            now = epoch_now()
+            notifications = []
+            for row in valid:
+                appointment_id = conn.execute('''
+                    INSERT INTO appointments (client_id, appointment_date, appointment_time, service, notes,
+                                              starts_at, duration)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', row).lastrowid
+                client_id, appointment_date, appointment_time, _, _, starts_at, _ = row
+                if starts_at >= now:
+                    notifications.append((appointment_id, appointment_date + " " + appointment_time,
+                                          notification_message(appointment_time, client_names[client_id])))
+
+            conn.executemany('''
+                INSERT INTO notifications (appointment_id, notification_time, message)
+                VALUES (?, ?, ?)
+            ''', notifications)
+
+        if valid:
+            self._notify('appointments_imported', count=len(valid))
+        return errors
+
     def get_appointments_by_date(self, date: str) -> List[Dict[str, Any]]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
+        query = '''
             SELECT a.*, c.name, c.phone, c.email 
-            FROM appointments a
+            FROM {table} a
             JOIN clients c ON a.client_id = c.id
             WHERE a.appointment_date = ?
             ORDER BY a.appointment_time
-        ''', (date,))
-        appointments = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return appointments
+        '''
+        with self.connection() as conn:
+            cursor = conn.execute(query.format(table='appointments'), (date,))
+            appointments = [dict(row) for row in cursor.fetchall()]
+            if self._archive_reaches(conn, date):
+                appointments = sorted(self._with_archived(conn, appointments, query, (date,)),
+                                      key=appointment_order)
+            return self._merge_occurrences(conn, appointments, date, date)
+
+    def get_appointments_between(self, start_date: str, end_date: str,
+                                 status: Optional[str] = None,
+                                 limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        query = '''
+            SELECT a.*, c.name, c.phone, c.email 
+            FROM {table} a
+            JOIN clients c ON a.client_id = c.id
+            WHERE a.appointment_date BETWEEN ? AND ?
+        '''
+        params: List[Any] = [start_date, end_date]
+        if status is not None:
+            query += ' AND a.status = ?'
+            params.append(status)
+        query += ' ORDER BY a.appointment_date, a.appointment_time'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+
+        with self.connection() as conn:
+            cursor = conn.execute(query.format(table='appointments'), params)
+            appointments = [dict(row) for row in cursor.fetchall()]
+            if self._archive_reaches(conn, start_date):
+                appointments = sorted(self._with_archived(conn, appointments, query, params),
+                                      key=appointment_order)
+            appointments = self._merge_occurrences(conn, appointments, start_date, end_date, status)
+            return appointments if limit is None else appointments[:limit]
+
+    def get_daily_counts(self, start_date: str, end_date: str) -> Dict[str, int]:
+        query = '''
+            SELECT appointment_date, COUNT(*) AS count
+            FROM {table}
+            WHERE appointment_date BETWEEN ? AND ? AND status != 'cancelled'
+            GROUP BY appointment_date
+        '''
+        with self.connection() as conn:
+            cursor = conn.execute(query.format(table='appointments'), (start_date, end_date))
+            counts = {row['appointment_date']: row['count'] for row in cursor.fetchall()}
+            if self._archive_reaches(conn, start_date):
+                for row in conn.execute(query.format(table='archive.appointments'), (start_date, end_date)):
+                    counts[row['appointment_date']] = counts.get(row['appointment_date'], 0) + row['count']
+            for apt in self._expand_series(conn, start_date, end_date):
+                counts[apt['appointment_date']] = counts.get(apt['appointment_date'], 0) + 1
+            return counts
+
+    def get_appointments_starting_between(self, start: int, end: int,
+                                          status: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = '''
+            SELECT a.*, c.name, c.phone, c.email 
+            FROM appointments a
+            JOIN clients c ON a.client_id = c.id
+            WHERE a.starts_at > ? AND a.starts_at <= ?
+        '''
+        params: List[Any] = [start, end]
+        if status is not None:
+            query += ' AND a.status = ?'
+            params.append(status)
+        query += ' ORDER BY a.starts_at'
+
+        with self.connection() as conn:
+            cursor = conn.execute(query, params)
+            appointments = [dict(row) for row in cursor.fetchall()]
+            appointments.extend(
+                apt for apt in self._expand_series(conn, epoch_to_date(start), epoch_to_date(end))
+                if start < apt['starts_at'] <= end and (status is None or apt['status'] == status)
+            )
+            return sorted(appointments, key=lambda apt: apt['starts_at'])
+
+    def get_busy_intervals(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT id, appointment_date, appointment_time, duration
+                FROM appointments
+                WHERE appointment_date BETWEEN ? AND ? AND status != 'cancelled'
+            ''', (start_date, end_date))
+            intervals = [dict(row) for row in cursor.fetchall()]
+            intervals.extend({'id': apt['id'],
+                              'appointment_date': apt['appointment_date'],
+                              'appointment_time': apt['appointment_time'],
+                              'duration': apt['duration']}
+                             for apt in self._expand_series(conn, start_date, end_date))
+            return intervals
+
+    def get_appointment_dates(self, appointment_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        dates: Dict[int, Dict[str, Any]] = {}
+        with self.connection() as conn:
+            for chunk in chunked(list(set(appointment_ids))):
+                placeholders = ', '.join('?' * len(chunk))
+                cursor = conn.execute(f'''
+                    SELECT a.id, a.appointment_date, s.id AS series_id
+                    FROM appointments a
+                    LEFT JOIN appointment_series s ON s.appointment_id = a.id
+                    WHERE a.id IN ({placeholders})
+                ''', chunk)
+                dates.update((row['id'], dict(row)) for row in cursor)
+        return dates
+
+    def get_conflicting_appointments(self, appointment_date: str, appointment_time: str,
+                                     duration: int = DEFAULT_APPOINTMENT_MINUTES,
+                                     exclude_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        start = to_epoch(appointment_date, appointment_time)
+        end = start + duration * 60
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT a.*, c.name, c.phone, c.email 
+                FROM appointments a
+                JOIN clients c ON a.client_id = c.id
+                WHERE a.starts_at > ? AND a.starts_at < ?
+                  AND a.starts_at + a.duration * 60 > ?
+                  AND a.status != 'cancelled'
+                  AND a.id != ?
+                ORDER BY a.starts_at
+            ''', (start - MAX_APPOINTMENT_MINUTES * 60, end, start, exclude_id or 0))
+            conflicts = [dict(row) for row in cursor.fetchall()]
+            conflicts.extend(
+                apt for apt in self._expand_series(conn, shift_date(appointment_date, -1), appointment_date)
+                if apt['starts_at'] < end and apt['starts_at'] + apt['duration'] * 60 > start
+                and apt['id'] != exclude_id
+            )
+            return sorted(conflicts, key=lambda apt: apt['starts_at'])
 
     def get_appointments_by_client(self, client_id: int) -> List[Dict[str, Any]]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
+        query = '''
             SELECT a.*, c.name, c.phone 
-            FROM appointments a
+            FROM {table} a
             JOIN clients c ON a.client_id = c.id
             WHERE a.client_id = ?
             ORDER BY a.appointment_date, a.appointment_time DESC
-        ''', (client_id,))
-        appointments = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return appointments
+        '''
+        with self.connection() as conn:
+            cursor = conn.execute(query.format(table='appointments'), (client_id,))
+            appointments = [dict(row) for row in cursor.fetchall()]
+            if self._archive_reaches(conn):
+                appointments = self._with_archived(conn, appointments, query, (client_id,))
+                appointments.sort(key=lambda apt: apt['appointment_time'], reverse=True)
+                appointments.sort(key=lambda apt: apt['appointment_date'])
+            return appointments
 
     def get_all_appointments(self) -> List[Dict[str, Any]]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
+        query = '''
             SELECT a.*, c.name, c.phone, c.email 
-            FROM appointments a
+            FROM {table} a
             JOIN clients c ON a.client_id = c.id
             ORDER BY a.appointment_date DESC, a.appointment_time DESC
-        ''')
-        appointments = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return appointments
+        '''
+        with self.connection() as conn:
+            cursor = conn.execute(query.format(table='appointments'))
+            appointments = [dict(row) for row in cursor.fetchall()]
+            if self._archive_reaches(conn):
+                appointments = sorted(self._with_archived(conn, appointments, query, ()),
+                                      key=appointment_order, reverse=True)
+            return appointments
+
+    def get_recent_appointments(self, n: int = 5) -> List[Dict[str, Any]]:
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT a.*, c.name, c.phone, c.email 
+                FROM appointments a
+                JOIN clients c ON a.client_id = c.id
+                ORDER BY a.id DESC
+                LIMIT ?
+            ''', (n,))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_upcoming_appointments(self, n: int = 5) -> List[Dict[str, Any]]:
+        now = datetime.now()
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT a.*, c.name, c.phone, c.email 
+                FROM appointments a
+                JOIN clients c ON a.client_id = c.id
+                WHERE a.status = 'scheduled'
+                  AND (a.appointment_date, a.appointment_time) >= (?, ?)
+                ORDER BY a.appointment_date, a.appointment_time
+                LIMIT ?
+            ''', (now.strftime('%Y-%m-%d'), now.strftime('%H:%M'), n))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_appointments_page(self, sort_key: str = 'date', descending: bool = True,
+                              search: str = "", status: Optional[str] = None,
+                              after: Optional[Dict[str, Any]] = None,
+                              limit: int = 200, ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        columns = APPOINTMENT_SORT_KEYS[sort_key]
+        expressions = [expression for expression, _ in columns]
+
+        conditions = []
+        params: List[Any] = []
+        if search:
+            pattern = f"%{search}%"
+            conditions.append('(c.name LIKE ? OR c.phone LIKE ? OR a.service LIKE ? OR a.notes LIKE ?)')
+            params.extend([pattern] * 4)
+        if status is not None:
+            conditions.append('a.status = ?')
+            params.append(status)
+        if after is not None:
+            operator = '<' if descending else '>'
+            placeholders = ', '.join('?' * len(columns))
+            values = [after['id'] if key == 'id' else after.get(key) or '' for _, key in columns]
+            conditions.append(f"{expressions[0]} {operator}= ?")
+            conditions.append(f"({', '.join(expressions)}) {operator} ({placeholders})")
+            params.extend([values[0]] + values)
+        if ids is not None:
+            conditions.append(f"a.id IN ({', '.join('?' * len(ids))})")
+            params.extend(ids)
+
+        direction = 'DESC' if descending else 'ASC'
+        tables = 'appointments a JOIN clients c ON a.client_id = c.id'
+        if sort_key == 'name' and ids is None:
+            tables = ('appointments a CROSS JOIN clients c ON a.client_id = c.id' if search
+                      else 'clients c CROSS JOIN appointments a ON a.client_id = c.id')
+        query = f'SELECT a.*, c.name, c.phone, c.email FROM {tables}'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY ' + ', '.join(f"{expression} {direction}" for expression in expressions)
+        query += ' LIMIT ?'
+        params.append(limit)
 
+        with self.connection() as conn:
+            cursor = conn.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
+
+    @retry_on_busy
     def update_appointment(self, appointment_id: int, appointment_date: str, 
                          appointment_time: str, service: str = "", 
-                         notes: str = "", status: str = "scheduled"):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE appointments 
-            SET appointment_date = ?, appointment_time = ?, service = ?, notes = ?, status = ?
-            WHERE id = ?
-        ''', (appointment_date, appointment_time, service, notes, status, appointment_id))
-        conn.commit()
-        conn.close()
+                         notes: str = "", status: str = "scheduled",
+                         duration: Optional[int] = None):
+        if duration is not None:
+            check_duration(duration)
+        starts_at = to_epoch(appointment_date, appointment_time)
+        with self.connection() as conn:
+            conn.execute('''
+                UPDATE appointments 
+                SET appointment_date = ?, appointment_time = ?, service = ?, notes = ?, status = ?,
+                    starts_at = ?, duration = COALESCE(?, duration)
+                WHERE id = ?
+            ''', (appointment_date, appointment_time, service, notes, status, starts_at,
+                  duration, appointment_id))
+
+            client = conn.execute('''
+                SELECT c.name FROM appointments a
+                JOIN clients c ON a.client_id = c.id
+                WHERE a.id = ?
+            ''', (appointment_id,)).fetchone()
+            if client:
+                conn.execute('''
+                    UPDATE notifications
+                    SET notification_time = ?, message = ?
+                    WHERE appointment_id = ? AND is_sent = 0 AND occurrence_date IS NULL
+                ''', (appointment_date + " " + appointment_time,
+                      notification_message(appointment_time, client['name']), appointment_id))
 
+            series = conn.execute('SELECT * FROM appointment_series WHERE appointment_id = ?',
+                                  (appointment_id,)).fetchone()
+            if series:
+                conn.execute('''
+                    DELETE FROM notifications
+                    WHERE appointment_id = ? AND is_sent = 0 AND occurrence_date IS NOT NULL
+                ''', (appointment_id,))
+                last = last_occurrence(appointment_date, series['frequency'], series['interval'],
+                                       series['until'], series['count'])
+                conn.execute('UPDATE appointment_series SET last_occurrence = ? WHERE id = ?',
+                             (last, series['id']))
+
+        self._notify('appointment_updated', appointment_id=appointment_id,
+                     appointment_date=appointment_date, appointment_time=appointment_time)
+        if series:
+            self._notify('series_updated', series_id=series['id'])
+
+    @retry_on_busy
     def delete_appointment(self, appointment_id: int):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM appointments WHERE id = ?', (appointment_id,))
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            conn.execute('DELETE FROM appointments WHERE id = ?', (appointment_id,))
+
+        self._notify('appointment_deleted', appointment_id=appointment_id)
+
+    @retry_on_busy
+    def add_series(self, appointment_id: int, frequency: str, interval: int = 1,
+                   count: Optional[int] = None, until: Optional[str] = None) -> int:
+        if frequency not in FREQUENCIES:
+            raise Exception("خطأ: نوع التكرار غير صالح")
+
+        with self.connection() as conn:
+            appointment = conn.execute('SELECT appointment_date FROM appointments WHERE id = ?',
+                                       (appointment_id,)).fetchone()
+            if appointment is None:
+                raise Exception("خطأ: الموعد غير موجود")
+
+            interval = max(1, interval)
+            cursor = conn.execute('''
+                INSERT INTO appointment_series (appointment_id, frequency, interval, until, count,
+                                                last_occurrence)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (appointment_id, frequency, interval, until, count,
+                  last_occurrence(appointment['appointment_date'], frequency, interval, until, count)))
+            series_id = cursor.lastrowid
+
+        self._notify('series_added', series_id=series_id, appointment_id=appointment_id)
+        return series_id
+
+    @retry_on_busy
+    def add_recurring_appointment(self, client_id: int, appointment_date: str, appointment_time: str,
+                                  service: str = "", notes: str = "",
+                                  duration: int = DEFAULT_APPOINTMENT_MINUTES,
+                                  frequency: str = 'weekly', interval: int = 1,
+                                  count: Optional[int] = None, until: Optional[str] = None) -> int:
+        with self.connection():
+            appointment_id = self.add_appointment(client_id, appointment_date, appointment_time,
+                                                  service, notes, duration)
+            self.add_series(appointment_id, frequency, interval, count, until)
+        return appointment_id
+
+    def get_series(self, appointment_id: int) -> Optional[Dict[str, Any]]:
+        with self.connection() as conn:
+            series = conn.execute('SELECT * FROM appointment_series WHERE appointment_id = ?',
+                                  (appointment_id,)).fetchone()
+            return dict(series) if series else None
+
+    def _get_series_template(self, conn: sqlite3.Connection, series_id: int) -> Dict[str, Any]:
+        series = conn.execute('''
+            SELECT s.*, a.client_id, a.appointment_date, a.appointment_time, a.service, a.notes,
+                   a.duration
+            FROM appointment_series s
+            JOIN appointments a ON s.appointment_id = a.id
+            WHERE s.id = ?
+        ''', (series_id,)).fetchone()
+        if series is None:
+            raise Exception("خطأ: سلسلة المواعيد غير موجودة")
+        return dict(series)
+
+    @retry_on_busy
+    def cancel_series_occurrence(self, series_id: int, occurrence_date: str):
+        with self.connection() as conn:
+            series = self._get_series_template(conn, series_id)
+            if occurrence_date == series['appointment_date']:
+                conn.execute("UPDATE appointments SET status = 'cancelled' WHERE id = ?",
+                             (series['appointment_id'],))
+            else:
+                conn.execute('''
+                    INSERT OR IGNORE INTO series_exceptions (series_id, occurrence_date)
+                    VALUES (?, ?)
+                ''', (series_id, occurrence_date))
+                conn.execute('''
+                    DELETE FROM notifications
+                    WHERE appointment_id = ? AND occurrence_date = ? AND is_sent = 0
+                ''', (series['appointment_id'], occurrence_date))
+
+        self._notify('series_updated', series_id=series_id)
+
+    @retry_on_busy
+    def cancel_series_from(self, series_id: int, from_date: str):
+        with self.connection() as conn:
+            series = self._get_series_template(conn, series_id)
+            if from_date <= series['appointment_date']:
+                conn.execute("UPDATE appointments SET status = 'cancelled' WHERE id = ?",
+                             (series['appointment_id'],))
+            until = shift_date(max(from_date, series['appointment_date']), -1)
+            conn.execute('''
+                UPDATE appointment_series SET until = ?, last_occurrence = ?
+                WHERE id = ? AND (until IS NULL OR until >= ?)
+            ''', (until, last_occurrence(series['appointment_date'], series['frequency'], series['interval'],
+                                         until, series['count']), series_id, from_date))
+            conn.execute('''
+                DELETE FROM notifications
+                WHERE appointment_id = ? AND occurrence_date >= ? AND is_sent = 0
+            ''', (series['appointment_id'], from_date))
+
+        self._notify('series_updated', series_id=series_id)
+
+    @retry_on_busy
+    def update_series_from(self, series_id: int, from_date: str, appointment_date: str,
+                           appointment_time: str, service: str = "", notes: str = "",
+                           duration: Optional[int] = None) -> int:
+        with self.connection() as conn:
+            series = self._get_series_template(conn, series_id)
+            if from_date <= series['appointment_date']:
+                self.update_appointment(series['appointment_id'], appointment_date, appointment_time,
+                                        service, notes, duration=duration)
+                return series['appointment_id']
+
+            count = series['count']
+            if count is not None:
+                count -= occurrence_index(date.fromisoformat(series['appointment_date']),
+                                          series['frequency'], series['interval'],
+                                          date.fromisoformat(from_date))
+                if count <= 0:
+                    raise Exception("خطأ: الموعد خارج نطاق السلسلة")
+
+            until = shift_date(from_date, -1)
+            conn.execute('UPDATE appointment_series SET until = ?, last_occurrence = ? WHERE id = ?',
+                         (until, last_occurrence(series['appointment_date'], series['frequency'],
+                                                 series['interval'], until, series['count']), series_id))
+            conn.execute('''
+                DELETE FROM notifications
+                WHERE appointment_id = ? AND occurrence_date >= ? AND is_sent = 0
+            ''', (series['appointment_id'], from_date))
+
+            appointment_id = self.add_appointment(series['client_id'], appointment_date, appointment_time,
+                                                  service, notes, duration or series['duration'])
+            new_series_id = self.add_series(appointment_id, series['frequency'], series['interval'],
+                                            count, series['until'])
+            conn.execute('''
+                UPDATE series_exceptions SET series_id = ?
+                WHERE series_id = ? AND occurrence_date > ?
+            ''', (new_series_id, series_id, from_date))
 
+        self._notify('series_updated', series_id=series_id)
+        return appointment_id
+
+    @retry_on_busy
+    def detach_series_occurrence(self, series_id: int, occurrence_date: str, appointment_date: str,
+                                 appointment_time: str, service: str = "", notes: str = "",
+                                 duration: Optional[int] = None) -> int:
+        with self.connection() as conn:
+            series = self._get_series_template(conn, series_id)
+            self.cancel_series_occurrence(series_id, occurrence_date)
+            return self.add_appointment(series['client_id'], appointment_date, appointment_time,
+                                        service, notes, duration or series['duration'])
+
+    @retry_on_busy
+    def add_series_notifications(self, start_date: str, end_date: str) -> int:
+        now = epoch_now()
+        with self.connection() as conn:
+            pending = [(apt['id'], apt['appointment_date'] + " " + apt['appointment_time'],
+                        notification_message(apt['appointment_time'], apt['name']),
+                        apt['occurrence_date'])
+                       for apt in self._expand_series(conn, start_date, end_date)
+                       if apt['starts_at'] >= now]
+            if not pending:
+                return 0
+
+            changes = conn.total_changes
+            conn.executemany('''
+                INSERT OR IGNORE INTO notifications (appointment_id, notification_time, message,
+                                                     occurrence_date)
+                VALUES (?, ?, ?, ?)
+            ''', pending)
+            return conn.total_changes - changes
+
+    def _expand_series(self, conn: sqlite3.Connection, start_date: str,
+                       end_date: str) -> List[Dict[str, Any]]:
+        templates = conn.execute('''
+            SELECT a.*, c.name, c.phone, c.email, s.id AS series_id, s.frequency, s.interval,
+                   s.until, s.count
+            FROM appointment_series s
+            JOIN appointments a ON s.appointment_id = a.id
+            JOIN clients c ON a.client_id = c.id
+            WHERE (s.last_occurrence IS NULL OR s.last_occurrence >= ?) AND a.appointment_date < ?
+        ''', (start_date, end_date)).fetchall()
+        if not templates:
+            return []
+
+        exceptions: Dict[int, set] = {}
+        for row in conn.execute('''
+            SELECT series_id, occurrence_date FROM series_exceptions
+            WHERE occurrence_date BETWEEN ? AND ?
+        ''', (start_date, end_date)):
+            exceptions.setdefault(row['series_id'], set()).add(row['occurrence_date'])
+
+        expanded = []
+        for template in map(dict, templates):
+            first_date = template['appointment_date']
+            for day in occurrences(first_date, template['frequency'], template['interval'],
+                                   max(start_date, shift_date(first_date, 1)), end_date,
+                                   template['until'], template['count'],
+                                   exceptions.get(template['series_id'], ())):
+                expanded.append(dict(template, appointment_date=day, occurrence_date=day,
+                                     status='scheduled',
+                                     starts_at=to_epoch(day, template['appointment_time'])))
+        return expanded
+
+    def _merge_occurrences(self, conn: sqlite3.Connection, appointments: List[Dict[str, Any]],
+                           start_date: str, end_date: str,
+                           status: Optional[str] = None) -> List[Dict[str, Any]]:
+        expanded = [apt for apt in self._expand_series(conn, start_date, end_date)
+                    if status is None or apt['status'] == status]
+        if not expanded:
+            return appointments
+        return sorted(appointments + expanded, key=appointment_order)
+
+    @retry_on_busy
     def add_notification(self, appointment_id: int, appointment_date: str, appointment_time: str):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        appointment = self.get_appointment_by_id(appointment_id)
-        if appointment:
-            client = self.get_client_by_id(appointment['client_id'])
-            message = f"تذكير: لديك موعد في {appointment_time} مع {client['name']}"
-            
-            cursor.execute('''
-                INSERT INTO notifications (appointment_id, notification_time, message)
-                VALUES (?, ?, ?)
-            ''', (appointment_id, appointment_date + " " + appointment_time, message))
-            conn.commit()
-        
-        conn.close()
+        with self.connection() as conn:
+            client = conn.execute('''
+                SELECT c.name FROM appointments a
+                JOIN clients c ON a.client_id = c.id
+                WHERE a.id = ?
+            ''', (appointment_id,)).fetchone()
+            if client:
+                self._insert_notification(conn, appointment_id, appointment_date,
+                                          appointment_time, client['name'])
+
+    def _insert_notification(self, conn: sqlite3.Connection, appointment_id: int,
+                             appointment_date: str, appointment_time: str, client_name: str):
+        conn.execute('''
+            INSERT INTO notifications (appointment_id, notification_time, message)
+            VALUES (?, ?, ?)
+        ''', (appointment_id, appointment_date + " " + appointment_time,
+              notification_message(appointment_time, client_name)))
 
     def get_appointment_by_id(self, appointment_id: int) -> Optional[Dict[str, Any]]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
+        query = '''
             SELECT a.*, c.name, c.phone, c.email 
-            FROM appointments a
+            FROM {table} a
             JOIN clients c ON a.client_id = c.id
             WHERE a.id = ?
-        ''', (appointment_id,))
-        appointment = cursor.fetchone()
-        conn.close()
-        return dict(appointment) if appointment else None
+        '''
+        with self.connection() as conn:
+            appointment = conn.execute(query.format(table='appointments'), (appointment_id,)).fetchone()
+            if appointment is None and self._archive_reaches(conn):
+                appointment = conn.execute(query.format(table='archive.appointments'),
+                                           (appointment_id,)).fetchone()
+            return dict(appointment) if appointment else None
 
     def get_pending_notifications(self) -> List[Dict[str, Any]]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT n.*, a.appointment_date, a.appointment_time, c.name, c.phone, c.email
-            FROM notifications n
-            JOIN appointments a ON n.appointment_id = a.id
-            JOIN clients c ON a.client_id = c.id
-            WHERE n.is_sent = 0 AND n.notification_time <= ?
-            ORDER BY n.notification_time
-        ''', (datetime.now().strftime('%Y-%m-%d %H:%M'),))
-        notifications = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return notifications
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT n.*, COALESCE(n.occurrence_date, a.appointment_date) AS appointment_date,
+                       a.appointment_time, c.name, c.phone, c.email
+                FROM notifications n
+                JOIN appointments a ON n.appointment_id = a.id
+                JOIN clients c ON a.client_id = c.id
+                WHERE n.is_sent = 0 AND n.notification_time <= ?
+                ORDER BY n.notification_time
+            ''', (datetime.now().strftime('%Y-%m-%d %H:%M'),))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_next_notifications(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT id, appointment_id, notification_time
+                FROM notifications
+                WHERE is_sent = 0
+                ORDER BY notification_time
+                LIMIT ?
+            ''', (limit,))
+            return [dict(row) for row in cursor.fetchall()]
 
+    @retry_on_busy
     def mark_notification_sent(self, notification_id: int):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE notifications 
-            SET is_sent = 1
-            WHERE id = ?
-        ''', (notification_id,))
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            conn.execute('''
+                UPDATE notifications 
+                SET is_sent = 1
+                WHERE id = ?
+            ''', (notification_id,))
+
+    def get_data_version(self) -> int:
+        with self.connection() as conn:
+            return conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def get_last_change_id(self) -> int:
+        with self.connection() as conn:
+            return conn.execute('SELECT COALESCE(MAX(id), 0) FROM change_log').fetchone()[0]
+
+    def get_changes(self, after_id: int, limit: int = 500) -> List[Dict[str, Any]]:
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT id, table_name, row_id, operation, old_date, new_date FROM change_log
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (after_id, limit))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def take_local_changes(self, up_to_id: int) -> Set[int]:
+        return self.pool.take_local_changes(up_to_id)
+
+    def publish_changes(self, changes: Optional[List[Dict[str, Any]]]):
+        if changes is None:
+            self._notify('changes_reset')
+        else:
+            self._notify('changes_received', changes=changes)
 
     def get_statistics(self) -> Dict[str, int]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT COUNT(*) as count FROM clients')
-        total_clients = cursor.fetchone()['count']
-        
-        cursor.execute('SELECT COUNT(*) as count FROM appointments')
-        total_appointments = cursor.fetchone()['count']
-        
-        cursor.execute('''
-            SELECT COUNT(*) as count FROM appointments 
-            WHERE status = "scheduled"
-        ''')
-        scheduled_count = cursor.fetchone()['count']
-        
-        cursor.execute('''
-            SELECT COUNT(*) as count FROM appointments 
-            WHERE status = "completed"
-        ''')
-        completed_count = cursor.fetchone()['count']
-        
-        conn.close()
-        
+        with self.connection() as conn:
+            counters = {row['key']: row['value']
+                        for row in conn.execute('SELECT key, value FROM statistics')}
+
+        def count(key: str) -> int:
+            return counters.get(key, 0) + counters.get(f"archived:{key}", 0)
+
         return {
-            'total_clients': total_clients,
-            'total_appointments': total_appointments,
-            'scheduled': scheduled_count,
-            'completed': completed_count
+            'total_clients': counters.get('clients', 0),
+            'total_appointments': count('appointments'),
+            'scheduled': count('status:scheduled'),
+            'completed': count('status:completed')
         }
+
+    @retry_on_busy
+    def rebuild_statistics(self) -> Dict[str, int]:
+        with self.connection() as conn:
+            archived = self._attach_archive(conn)
+            for statement in REBUILD_STATISTICS + (REBUILD_ARCHIVE_STATISTICS if archived else []):
+                conn.execute(statement)
+        return self.get_statistics()
+
+    @retry_on_busy
+    def archive_appointments(self, before_date: str, batch_size: int = ARCHIVE_BATCH) -> Dict[str, int]:
+        archived = {'appointments': 0, 'notifications': 0}
+        while True:
+            with self.connection() as conn:
+                self._attach_archive(conn, create=True)
+
+                ids = [row[0] for row in conn.execute(f'''
+                    SELECT id FROM main.appointments
+                    WHERE appointment_date < ?
+                      AND status IN ({','.join('?' * len(ARCHIVE_STATUSES))})
+                      AND id NOT IN (SELECT appointment_id FROM main.appointment_series)
+                    ORDER BY appointment_date
+                    LIMIT ?
+                ''', (before_date, *ARCHIVE_STATUSES, batch_size))]
+                if not ids:
+                    return archived
+
+                marks = ','.join('?' * len(ids))
+                conn.execute(f'''
+                    INSERT OR REPLACE INTO archive.appointments ({ARCHIVE_APPOINTMENT_COLUMNS})
+                    SELECT {ARCHIVE_APPOINTMENT_COLUMNS} FROM main.appointments WHERE id IN ({marks})
+                ''', ids)
+                conn.execute(f'''
+                    INSERT OR REPLACE INTO archive.notifications ({ARCHIVE_NOTIFICATION_COLUMNS})
+                    SELECT {ARCHIVE_NOTIFICATION_COLUMNS} FROM main.notifications
+                    WHERE appointment_id IN ({marks})
+                ''', ids)
+                conn.execute(f'''
+                    INSERT INTO statistics (key, value)
+                    SELECT 'archived:status:' || COALESCE(status, ''), COUNT(*) FROM main.appointments
+                    WHERE id IN ({marks}) GROUP BY COALESCE(status, '')
+                    ON CONFLICT(key) DO UPDATE SET value = value + excluded.value
+                ''', ids)
+                conn.execute('''
+                    INSERT INTO statistics (key, value) VALUES ('archived:appointments', ?)
+                    ON CONFLICT(key) DO UPDATE SET value = value + excluded.value
+                ''', (len(ids),))
+                archived['notifications'] += conn.execute(
+                    f'DELETE FROM main.notifications WHERE appointment_id IN ({marks})', ids
+                ).rowcount
+                archived['appointments'] += conn.execute(
+                    f'DELETE FROM main.appointments WHERE id IN ({marks})', ids
+                ).rowcount
+
+    def _purge_archived(self, conn: sqlite3.Connection, condition: str, params: Tuple = ()) -> int:
+        counts = conn.execute(f'''
+            SELECT COALESCE(status, ''), COUNT(*) FROM archive.appointments
+            WHERE {condition} GROUP BY COALESCE(status, '')
+        ''', params).fetchall()
+        if not counts:
+            return 0
+
+        conn.executemany('UPDATE statistics SET value = MAX(value - ?, 0) WHERE key = ?',
+                         [(count, f"archived:status:{status}") for status, count in counts] +
+                         [(sum(count for _, count in counts), 'archived:appointments')])
+        conn.execute(f'''
+            DELETE FROM archive.notifications WHERE appointment_id IN (
+                SELECT id FROM archive.appointments WHERE {condition}
+            )
+        ''', params)
+        return conn.execute(f'DELETE FROM archive.appointments WHERE {condition}', params).rowcount
+
+    def _delete_in_batches(self, table: str, condition: str, params: Tuple = (),
+                           batch_size: int = MAINTENANCE_BATCH) -> int:
+        deleted = 0
+        while True:
+            with self.connection() as conn:
+                count = conn.execute(f'''
+                    DELETE FROM main.{table} WHERE id IN (
+                        SELECT id FROM main.{table} WHERE {condition} LIMIT ?
+                    )
+                ''', (*params, batch_size)).rowcount
+            deleted += count
+            if count < batch_size:
+                return deleted
+
+    def _database_bytes(self, conn: sqlite3.Connection) -> int:
+        return (conn.execute('PRAGMA main.page_count').fetchone()[0]
+                * conn.execute('PRAGMA main.page_size').fetchone()[0])
+
+    @retry_on_busy
+    def run_maintenance(self, retention_days: int = config.NOTIFICATION_RETENTION_DAYS,
+                        change_log_days: int = config.CHANGE_LOG_RETENTION_DAYS,
+                        vacuum: bool = False) -> Dict[str, int]:
+        started = time.perf_counter()
+        with self.connection() as conn:
+            bytes_before = self._database_bytes(conn)
+
+        orphans = sum(self._delete_in_batches(table, condition) for table, condition in ORPHAN_CONDITIONS)
+        with self.connection() as conn:
+            orphans += conn.execute('''
+                DELETE FROM series_exceptions WHERE series_id NOT IN (SELECT id FROM appointment_series)
+            ''').rowcount
+
+        with self.connection() as conn:
+            if self._attach_archive(conn):
+                orphans += self._purge_archived(conn, 'client_id NOT IN (SELECT id FROM main.clients)')
+                orphans += conn.execute('''
+                    DELETE FROM archive.notifications
+                    WHERE appointment_id NOT IN (SELECT id FROM archive.appointments)
+                ''').rowcount
+
+        cutoff = (datetime.now() - timedelta(days=retention_days)).strftime('%Y-%m-%d %H:%M')
+        expired = self._delete_in_batches('notifications', 'is_sent = 1 AND notification_time < ?', (cutoff,))
+        pruned = self._delete_in_batches(
+            'change_log', "changed_at < datetime('now', ?) AND id < (SELECT MAX(id) FROM change_log)",
+            (f"-{change_log_days} days",)
+        )
+
+        with self.connection() as conn:
+            if vacuum or conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                conn.execute('VACUUM')
+            else:
+                conn.executescript('PRAGMA incremental_vacuum')
+            conn.execute(f'PRAGMA analysis_limit = {ANALYSIS_LIMIT}')
+            conn.execute('ANALYZE')
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+            bytes_after = self._database_bytes(conn)
+
+            report = {
+                'orphans': orphans,
+                'expired_notifications': expired,
+                'pruned_changes': pruned,
+                'bytes_before': bytes_before,
+                'bytes_after': bytes_after,
+                'duration_ms': int((time.perf_counter() - started) * 1000),
+            }
+            conn.execute(f'''
+                INSERT INTO maintenance_log ({', '.join(report)}) VALUES ({', '.join('?' * len(report))})
+            ''', tuple(report.values()))
+
+        report['bytes_reclaimed'] = max(bytes_before - bytes_after, 0)
+        return report
+
+    def is_maintenance_due(self, interval_hours: float = config.MAINTENANCE_INTERVAL_HOURS) -> bool:
+        with self.connection() as conn:
+            return conn.execute('''
+                SELECT 1 FROM maintenance_log WHERE ran_at > datetime('now', ?)
+            ''', (f"-{interval_hours} hours",)).fetchone() is None
@@ -0,0 +1,109 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from typing import Callable, Dict, Tuple, Optional, Any
+import threading
+from database import Database
+
+DEFAULT_WORKER_THREADS = 2
+
+class DatabaseTask(QRunnable):
+    def __init__(self, worker: 'DatabaseWorker', key: str, generation: int,
+                 func: Callable, args: tuple, kwargs: dict):
+        super().__init__()
+        self.worker = worker
+        self.key = key
+        self.generation = generation
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        if not self.worker.is_current(self.key, self.generation):
+            self.worker.skipped.emit(self.key, self.generation)
+            return
+
+        try:
+            result = self.func(*self.args, **self.kwargs)
+        except Exception as e:
+            self.worker.failed.emit(self.key, self.generation, str(e))
+        else:
+            self.worker.finished.emit(self.key, self.generation, result)
+
+class DatabaseWorker(QObject):
+    finished = pyqtSignal(str, int, object)
+    failed = pyqtSignal(str, int, str)
+    skipped = pyqtSignal(str, int)
+    busy_changed = pyqtSignal(bool)
+
+    def __init__(self, db: Database, max_threads: int = DEFAULT_WORKER_THREADS, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.pool.setExpiryTimeout(-1)
+        self._lock = threading.Lock()
+        self._generations: Dict[str, int] = {}
+        self._callbacks: Dict[str, Tuple[int, Optional[Callable], Optional[Callable]]] = {}
+        self._pending = 0
+
+        self.finished.connect(self._on_finished)
+        self.failed.connect(self._on_failed)
+        self.skipped.connect(self._on_skipped)
+
+    def submit(self, key: str, func: Callable, *args,
+               on_result: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[str], None]] = None, **kwargs) -> int:
+        with self._lock:
+            generation = self._generations.get(key, 0) + 1
+            self._generations[key] = generation
+
+        self._callbacks[key] = (generation, on_result, on_error)
+        self._set_pending(self._pending + 1)
+        self.pool.start(DatabaseTask(self, key, generation, func, args, kwargs))
+        return generation
+
+    def cancel(self, key: str):
+        with self._lock:
+            if key in self._generations:
+                self._generations[key] += 1
+        self._callbacks.pop(key, None)
+
+    def is_current(self, key: str, generation: int) -> bool:
+        with self._lock:
+            return self._generations.get(key) == generation
+
+    def is_loading(self, key: str) -> bool:
+        return key in self._callbacks
+
+    def wait(self, timeout: int = -1) -> bool:
+        return self.pool.waitForDone(timeout)
+
+    def _take_callbacks(self, key: str, generation: int):
+        self._set_pending(self._pending - 1)
+        callbacks = self._callbacks.get(key)
+        if callbacks is None or callbacks[0] != generation:
+            return None
+        del self._callbacks[key]
+        return callbacks
+
+    def _on_finished(self, key: str, generation: int, result: object):
+        callbacks = self._take_callbacks(key, generation)
+        if callbacks and callbacks[1]:
+            callbacks[1](result)
+
+    def _on_failed(self, key: str, generation: int, message: str):
+        callbacks = self._take_callbacks(key, generation)
+        if callbacks is None:
+            return
+        if callbacks[2]:
+            callbacks[2](message)
+        else:
+            print(f"خطأ في قاعدة البيانات: {message}")
+
+    def _on_skipped(self, key: str, generation: int):
+        self._take_callbacks(key, generation)
+
+    def _set_pending(self, pending: int):
+        was_busy = self._pending > 0
+        self._pending = pending
+        if was_busy != (pending > 0):
+            self.busy_changed.emit(pending > 0)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from itertools import islice
+from typing import Dict, Any, IO, Iterator, List
+
+from database import Database, CONNECTION_PROFILES, DEFAULT_PROFILE
+
+IMPORT_CACHE_KIB = 64 * 1024
+JSON_BLOCK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'\s*')
+
+def read_json_array(f: IO[str], block_size: int = JSON_BLOCK_SIZE) -> Iterator[Any]:
+    decoder = json.JSONDecoder()
+    buffer, position = '', 0
+
+    def fill() -> bool:
+        nonlocal buffer, position
+        block = f.read(block_size)
+        buffer, position = buffer[position:] + block, 0
+        return bool(block)
+
+    def peek() -> str:
+        nonlocal position
+        while True:
+            position = WHITESPACE.match(buffer, position).end()
+            if position < len(buffer):
+                return buffer[position]
+            if not fill():
+                raise Exception("خطأ: ملف JSON غير مكتمل")
+
+    if peek() != '[':
+        raise Exception("خطأ: ملف JSON يجب أن يحتوي على مصفوفة من السجلات")
+    position += 1
+    if peek() == ']':
+        return
+
+    while True:
+        peek()
+        try:
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if not fill():
+                raise
+            continue
+        yield record
+
+        separator = peek()
+        position += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise Exception("خطأ: ملف JSON غير صالح")
+
+def read_records(path: str, file_format: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if file_format == 'csv':
+            yield from csv.DictReader(f)
+        elif file_format == 'jsonl':
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield ValueError(f"خطأ: السطر {line_number} ليس JSON صالحاً ({e.msg})")
+        else:
+            yield from read_json_array(f)
+
+def detect_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.json':
+        return 'json'
+    return 'csv'
+
+def text(record: Dict[str, Any], key: str) -> str:
+    value = record.get(key)
+    return "" if value is None else str(value).strip()
+
+def parse_duration(value: str) -> int:
+    if not value:
+        return 0
+    return int(value) if value.isdigit() else -1
+
+def import_clients(db: Database, records: List[Dict[str, Any]]) -> Dict[int, str]:
+    return db.bulk_add_clients([
+        (text(record, 'name'), text(record, 'phone'), text(record, 'email'))
+        for record in records
+    ])
+
+def import_appointments(db: Database, records: List[Dict[str, Any]]) -> Dict[int, str]:
+    phones = [text(record, 'client_phone') for record in records if not text(record, 'client_id')]
+    client_ids = db.get_client_ids_by_phone([phone for phone in phones if phone])
+
+    rows = []
+    for record in records:
+        client_id = text(record, 'client_id')
+        rows.append((
+            int(client_id) if client_id.isdigit() else client_ids.get(text(record, 'client_phone')),
+            text(record, 'appointment_date'),
+            text(record, 'appointment_time'),
+            text(record, 'service'),
+            text(record, 'notes'),
+            parse_duration(text(record, 'duration')),
+        ))
+    return db.bulk_add_appointments(rows)
+
+def record_error(record: Any) -> str:
+    if isinstance(record, Exception):
+        return str(record)
+    return "خطأ: السجل يجب أن يكون كائن JSON"
+
+def run_import(db: Database, kind: str, path: str, file_format: str, chunk_size: int) -> int:
+    importer = import_clients if kind == 'clients' else import_appointments
+    records = read_records(path, file_format)
+
+    started = time.perf_counter()
+    total = imported = failed = 0
+    with db.connection() as conn:
+        conn.execute(f'PRAGMA cache_size = {-IMPORT_CACHE_KIB}')
+
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+
+        errors = {index: record_error(record) for index, record in enumerate(chunk)
+                  if not isinstance(record, dict)}
+        valid = [index for index, record in enumerate(chunk) if isinstance(record, dict)]
+        try:
+            row_errors = importer(db, [chunk[index] for index in valid]) if valid else {}
+        except Exception as e:
+            print(f"السجلات {total + 1}-{total + len(chunk)}: {str(e)}", file=sys.stderr)
+            errors.update(dict.fromkeys(valid, str(e)))
+        else:
+            errors.update({valid[index]: message for index, message in row_errors.items()})
+            for index, message in sorted(errors.items()):
+                print(f"السجل {total + index + 1}: {message}", file=sys.stderr)
+
+        total += len(chunk)
+        failed += len(errors)
+        imported += len(chunk) - len(errors)
+
+    elapsed = time.perf_counter() - started
+    print(f"تم استيراد {imported} من {total} سجل ({failed} خطأ) في {elapsed:.2f} ثانية")
+    return 0 if failed == 0 else 1
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="استيراد العملاء والمواعيد من ملفات CSV أو JSON")
+    parser.add_argument('kind', choices=['clients', 'appointments'])
+    parser.add_argument('path', help="ملف CSV أو JSON أو JSON Lines")
+    parser.add_argument('--format', choices=['csv', 'json', 'jsonl'], help="صيغة الملف (تُستنتج من الامتداد)")
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--db', default="appointments.db", help="مسار قاعدة البيانات")
+    parser.add_argument('--profile', choices=sorted(CONNECTION_PROFILES), default=DEFAULT_PROFILE,
+                        help="إعدادات الاتصال بقاعدة البيانات")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db, args.profile)
+    try:
+        return run_import(db, args.kind, args.path, args.format or detect_format(args.path), args.chunk_size)
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
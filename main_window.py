@@ -1,23 +1,32 @@
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QLabel, QTableWidget, QTableWidgetItem, 
-                             QTabWidget, QStatusBar, QMessageBox)
+                             QTableView, QTabWidget, QStatusBar, QMessageBox,
+                             QLineEdit, QComboBox)
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QIcon, QFont, QColor
 from datetime import datetime
 import config
 from database import Database
-from clients_window import ClientsWindow
-from appointments_window import AppointmentsWindow
-from calendar_widget import CalendarWidget
-from notifications import NotificationManager
+from query_trace import create_tracer
+from db_worker import DatabaseWorker
+from change_feed import ChangeFeed
+from models import ClientCache
+from startup_timer import STARTUP
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.db = Database(config.DB_NAME)
-        self.notification_manager = NotificationManager(self.db)
+        self.db = Database(config.DB_NAME, config.DB_PROFILE,
+                           create_tracer(config.QUERY_TRACE, config.SLOW_QUERY_MS,
+                                         config.SLOW_QUERY_LOG, config.QUERY_TRACE_REPORT))
+        self.db_worker = DatabaseWorker(self.db, parent=self)
+        self.db_worker.busy_changed.connect(self.on_worker_busy_changed)
+        self.client_cache = ClientCache.for_database(self.db)
+        self.all_appointments_model = None
+        self.calendar_widget = None
+        self.first_painted = False
         self.init_ui()
-        self.setup_notifications_timer()
+        self.setup_change_feed()
 
     def init_ui(self):
         self.setWindowTitle(config.APP_NAME)
@@ -32,17 +41,19 @@ class MainWindow(QMainWindow):
         header_layout = self.create_header()
         main_layout.addLayout(header_layout)
 
-        tabs = QTabWidget()
-        
-        dashboard_tab = self.create_dashboard_tab()
-        appointments_tab = self.create_appointments_tab()
-        calendar_tab = self.create_calendar_tab()
+        self.tabs = QTabWidget()
+        self.tabs.addTab(self.create_dashboard_tab(), "لوحة التحكم")
 
-        tabs.addTab(dashboard_tab, "لوحة التحكم")
-        tabs.addTab(appointments_tab, "المواعيد")
-        tabs.addTab(calendar_tab, "التقويم")
+        self.tab_builders = {}
+        for builder, title in ((self.create_appointments_tab, "المواعيد"),
+                               (self.create_calendar_tab, "التقويم")):
+            page = QWidget()
+            page.setLayout(QVBoxLayout())
+            page.layout().setContentsMargins(0, 0, 0, 0)
+            self.tab_builders[self.tabs.addTab(page, title)] = builder
+        self.tabs.currentChanged.connect(self.build_tab)
 
-        main_layout.addWidget(tabs)
+        main_layout.addWidget(self.tabs)
 
         central_widget.setLayout(main_layout)
 
@@ -76,12 +87,10 @@ class MainWindow(QMainWindow):
 
         stats_layout = QHBoxLayout()
 
-        stats = self.db.get_statistics()
-
-        self.stat_clients = self.create_stat_box(f"إجمالي العملاء", str(stats['total_clients']))
-        self.stat_appointments = self.create_stat_box(f"إجمالي المواعيد", str(stats['total_appointments']))
-        self.stat_scheduled = self.create_stat_box(f"مواعيد مجدولة", str(stats['scheduled']))
-        self.stat_completed = self.create_stat_box(f"مواعيد مكتملة", str(stats['completed']))
+        self.stat_clients = self.create_stat_box(f"إجمالي العملاء", "...")
+        self.stat_appointments = self.create_stat_box(f"إجمالي المواعيد", "...")
+        self.stat_scheduled = self.create_stat_box(f"مواعيد مجدولة", "...")
+        self.stat_completed = self.create_stat_box(f"مواعيد مكتملة", "...")
 
         stats_layout.addWidget(self.stat_clients)
         stats_layout.addWidget(self.stat_appointments)
@@ -107,7 +116,14 @@ class MainWindow(QMainWindow):
         widget.setLayout(layout)
         return widget
 
+    def build_tab(self, index: int):
+        builder = self.tab_builders.pop(index, None)
+        if builder is not None:
+            self.tabs.widget(index).layout().addWidget(builder())
+
     def create_appointments_tab(self) -> QWidget:
+        from appointments_model import AppointmentsTableModel
+
         widget = QWidget()
         layout = QVBoxLayout()
 
@@ -115,23 +131,40 @@ class MainWindow(QMainWindow):
         btn_new = QPushButton("+ موعد جديد")
         btn_new.clicked.connect(self.open_appointments_window)
         btn_refresh = QPushButton("تحديث")
-        btn_refresh.clicked.connect(self.update_dashboard_appointments)
+        btn_refresh.clicked.connect(self.update_all_appointments)
         
         btn_layout.addWidget(btn_new)
         btn_layout.addWidget(btn_refresh)
         btn_layout.addStretch()
 
+        self.appointments_search = QLineEdit()
+        self.appointments_search.setPlaceholderText("بحث بالاسم أو الهاتف أو الخدمة...")
+        self.appointments_search.textChanged.connect(lambda: self.search_timer.start())
+        btn_layout.addWidget(self.appointments_search)
+
+        self.appointments_status_filter = QComboBox()
+        self.appointments_status_filter.addItem("كل الحالات", None)
+        for status in config.APPOINTMENT_STATUS:
+            self.appointments_status_filter.addItem(config.APPOINTMENT_STATUS_AR[status], status)
+        self.appointments_status_filter.currentIndexChanged.connect(self.apply_appointments_filter)
+        btn_layout.addWidget(self.appointments_status_filter)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(300)
+        self.search_timer.timeout.connect(self.apply_appointments_filter)
+
         layout.addLayout(btn_layout)
 
-        self.all_appointments_table = QTableWidget()
-        self.all_appointments_table.setColumnCount(7)
-        self.all_appointments_table.setHorizontalHeaderLabels([
-            "رقم", "العميل", "التاريخ", "الوقت", "الخدمة", "الحالة", "ملاحظات"
-        ])
+        self.all_appointments_model = AppointmentsTableModel(self.db, worker=self.db_worker, parent=self)
+        self.all_appointments_model.load_failed.connect(self.on_load_failed)
+        self.all_appointments_table = QTableView()
+        self.all_appointments_table.setModel(self.all_appointments_model)
+        self.all_appointments_table.setSelectionBehavior(QTableView.SelectRows)
         self.all_appointments_table.horizontalHeader().setStretchLastSection(True)
-        self.all_appointments_table.itemDoubleClicked.connect(self.on_appointment_double_click)
-
-        self.update_all_appointments()
+        self.all_appointments_table.horizontalHeader().setSortIndicator(2, Qt.DescendingOrder)
+        self.all_appointments_table.setSortingEnabled(True)
+        self.all_appointments_table.doubleClicked.connect(self.on_appointment_double_click)
 
         layout.addWidget(self.all_appointments_table)
 
@@ -139,10 +172,13 @@ class MainWindow(QMainWindow):
         return widget
 
     def create_calendar_tab(self) -> QWidget:
+        from calendar_widget import CalendarWidget
+
         widget = QWidget()
         layout = QVBoxLayout()
 
-        self.calendar_widget = CalendarWidget(self.db)
+        self.calendar_widget = CalendarWidget(self.db, self.db_worker)
+        self.calendar_widget.appointment_activated.connect(self.open_appointments_window)
         layout.addWidget(self.calendar_widget)
 
         widget.setLayout(layout)
@@ -171,7 +207,15 @@ class MainWindow(QMainWindow):
         return box
 
     def update_dashboard_appointments(self):
-        appointments = self.db.get_all_appointments()[-5:]
+        self.db_worker.submit('dashboard', self.load_dashboard,
+                              on_result=self.show_dashboard, on_error=self.on_load_failed)
+
+    def load_dashboard(self):
+        return self.db.get_recent_appointments(5), self.db.get_statistics()
+
+    def show_dashboard(self, result):
+        appointments, stats = result
+        STARTUP.mark('first_data')
         
         self.appointments_table.setRowCount(len(appointments))
         
@@ -187,73 +231,105 @@ class MainWindow(QMainWindow):
             
             self.appointments_table.setItem(row, 5, QTableWidgetItem(apt.get('notes', '')))
 
-        stats = self.db.get_statistics()
         self.stat_clients.layout().itemAt(1).widget().setText(str(stats['total_clients']))
         self.stat_appointments.layout().itemAt(1).widget().setText(str(stats['total_appointments']))
         self.stat_scheduled.layout().itemAt(1).widget().setText(str(stats['scheduled']))
         self.stat_completed.layout().itemAt(1).widget().setText(str(stats['completed']))
 
     def update_all_appointments(self):
-        appointments = self.db.get_all_appointments()
-        
-        self.all_appointments_table.setRowCount(len(appointments))
-        
-        for row, apt in enumerate(appointments):
-            self.all_appointments_table.setItem(row, 0, QTableWidgetItem(str(apt.get('id', ''))))
-            self.all_appointments_table.setItem(row, 1, QTableWidgetItem(apt.get('name', '')))
-            self.all_appointments_table.setItem(row, 2, QTableWidgetItem(apt.get('appointment_date', '')))
-            self.all_appointments_table.setItem(row, 3, QTableWidgetItem(apt.get('appointment_time', '')))
-            self.all_appointments_table.setItem(row, 4, QTableWidgetItem(apt.get('service', '')))
-            
-            status = apt.get('status', 'scheduled')
-            status_ar = config.APPOINTMENT_STATUS_AR.get(status, status)
-            self.all_appointments_table.setItem(row, 5, QTableWidgetItem(status_ar))
-            
-            self.all_appointments_table.setItem(row, 6, QTableWidgetItem(apt.get('notes', '')))
+        self.all_appointments_model.reload()
 
-    def on_appointment_double_click(self, item):
-        row = item.row()
-        appointment_id = int(self.all_appointments_table.item(row, 0).text())
-        
-        appointment = self.db.get_appointment_by_id(appointment_id)
-        if appointment:
-            self.open_appointments_window(appointment_id)
+    def apply_appointments_filter(self):
+        self.all_appointments_model.set_filter(
+            self.appointments_search.text().strip(),
+            self.appointments_status_filter.currentData()
+        )
+
+    def on_appointment_double_click(self, index):
+        appointment_id = self.all_appointments_model.appointment_id(index.row())
+        self.open_appointments_window(appointment_id)
 
     def open_clients_window(self):
+        from clients_window import ClientsWindow
+
         if self.clients_window is None or not self.clients_window.isVisible():
-            self.clients_window = ClientsWindow(self.db, self)
+            self.clients_window = ClientsWindow(self.db, self, self.db_worker, self.client_cache)
         self.clients_window.show()
 
-    def open_appointments_window(self, appointment_id=None):
+    def open_appointments_window(self, appointment_id=None, occurrence_date=None):
+        from appointments_window import AppointmentsWindow
+
         if self.appointments_window is None or not self.appointments_window.isVisible():
-            self.appointments_window = AppointmentsWindow(self.db, self)
+            self.appointments_window = AppointmentsWindow(self.db, self, self.db_worker, self.client_cache)
         
         if appointment_id:
-            self.appointments_window.load_appointment(appointment_id)
+            self.appointments_window.load_appointment(appointment_id, occurrence_date or None)
         
         self.appointments_window.show()
 
-    def setup_notifications_timer(self):
-        self.notification_timer = QTimer()
-        self.notification_timer.timeout.connect(self.check_notifications)
-        self.notification_timer.start(config.NOTIFICATION_CHECK_INTERVAL)
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_painted:
+            self.first_painted = True
+            STARTUP.mark('first_paint')
+            QTimer.singleShot(0, self.setup_reminder_scheduler)
+            QTimer.singleShot(0, self.setup_maintenance_scheduler)
 
-    def check_notifications(self):
-        pending = self.db.get_pending_notifications()
-        
-        for notification in pending:
-            self.notification_manager.send_notification(
-                notification['client_name'],
-                notification['message'],
-                notification['id']
-            )
+    def setup_reminder_scheduler(self):
+        from notifications import NotificationManager, ReminderScheduler
 
-    def refresh_all_data(self):
+        self.notification_manager = NotificationManager(self.db)
+        self.reminder_scheduler = ReminderScheduler(self.db, self.notification_manager, self.db_worker, parent=self)
+        self.reminder_scheduler.start()
+
+    def setup_maintenance_scheduler(self):
+        from maintenance_scheduler import MaintenanceScheduler
+
+        self.maintenance_scheduler = MaintenanceScheduler(self.db, self.db_worker, parent=self)
+        self.maintenance_scheduler.finished.connect(self.on_maintenance_finished)
+        self.maintenance_scheduler.start()
+
+    def on_maintenance_finished(self, report):
+        removed = report['orphans'] + report['expired_notifications'] + report['pruned_changes']
+        self.statusBar().showMessage(
+            f"تمت صيانة قاعدة البيانات: حذف {removed} صف وتحرير {report['bytes_reclaimed'] // 1024} KB"
+        )
+
+    def setup_change_feed(self):
+        self.change_feed = ChangeFeed(self.db, self.db_worker, parent=self)
+        self.change_feed.changes_received.connect(self.apply_changes)
+        self.change_feed.reset_required.connect(self.reload_all_data)
+        self.change_feed.start()
+
+    def apply_changes(self, changes):
         self.update_dashboard_appointments()
-        self.update_all_appointments()
-        self.calendar_widget.refresh_calendar()
+        if self.all_appointments_model is not None:
+            self.all_appointments_model.apply_changes(changes)
+        if self.calendar_widget is not None:
+            self.calendar_widget.apply_changes(changes)
+
+    def on_worker_busy_changed(self, busy: bool):
+        self.statusBar().showMessage("جارٍ التحميل..." if busy else "جاهز")
+
+    def on_load_failed(self, message: str):
+        self.statusBar().showMessage(f"تعذر تحميل البيانات: {message}")
+
+    def refresh_all_data(self):
+        self.change_feed.poll()
         self.statusBar().showMessage("تم التحديث بنجاح")
 
+    def reload_all_data(self):
+        self.update_dashboard_appointments()
+        if self.all_appointments_model is not None:
+            self.update_all_appointments()
+        if self.calendar_widget is not None:
+            self.calendar_widget.refresh_calendar()
+
+    def closeEvent(self, event):
+        if self.db.tracer:
+            self.db.tracer.write_report()
+        super().closeEvent(event)
+
     def get_stylesheet(self) -> str:
         return f"""
         QMainWindow {{
@@ -295,13 +371,13 @@ class MainWindow(QMainWindow):
             background-color: #164570;
         }}
         
-        QTableWidget {{
+        QTableView {{
             background-color: white;
             border: 1px solid #ddd;
             gridline-color: #f0f0f0;
         }}
         
-        QTableWidget::item {{
+        QTableView::item {{
             padding: 5px;
         }}
         
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from multiprocessing import Pool
+from typing import Tuple
+
+import config
+from database import Database, CONNECTION_PROFILES, DEFAULT_PROFILE, ARCHIVE_BATCH, is_busy_error
+
+def rebuild_statistics(db: Database, args) -> int:
+    stats = db.rebuild_statistics()
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+    return 0
+
+def archive(db: Database, args) -> int:
+    before = args.before or (date.today() - timedelta(days=args.days)).isoformat()
+    started = time.perf_counter()
+    archived = db.archive_appointments(before, args.batch)
+    elapsed = time.perf_counter() - started
+
+    print(f"الأرشيف: {db.archive_path}")
+    print(f"تمت أرشفة {archived['appointments']} موعد و {archived['notifications']} تذكير "
+          f"قبل {before} في {elapsed:.2f} ثانية")
+    return 0
+
+def compact(db: Database, args) -> int:
+    if args.if_due and not db.is_maintenance_due(args.if_due):
+        print("لا حاجة للصيانة الآن")
+        return 0
+
+    report = db.run_maintenance(args.retention_days, args.change_log_days, args.vacuum)
+    print(f"سجلات يتيمة محذوفة: {report['orphans']}")
+    print(f"تذكيرات مرسلة منتهية الصلاحية: {report['expired_notifications']}")
+    print(f"سجلات تغييرات قديمة: {report['pruned_changes']}")
+    print(f"الحجم: {report['bytes_before'] / 1024:.0f} KB ← {report['bytes_after'] / 1024:.0f} KB "
+          f"(تم تحرير {report['bytes_reclaimed'] / 1024:.0f} KB في {report['duration_ms']} ms)")
+    return 0
+
+def book_concurrently(db_path: str, profile: str, worker: int, bookings: int) -> Tuple[int, int]:
+    db = Database(db_path, profile)
+    booked = locked = 0
+    day = (date.today() + timedelta(days=worker + 1)).isoformat()
+    try:
+        for i in range(bookings):
+            try:
+                db.add_appointment(1, day, f"{8 + i // 60 % 12:02d}:{i % 60:02d}", notes=f"worker {worker}")
+                db.get_appointments_by_date(day)
+                booked += 1
+            except Exception as e:
+                if not is_busy_error(e):
+                    raise
+                locked += 1
+    finally:
+        db.close()
+    return booked, locked
+
+def check_concurrency(db: Database, args) -> int:
+    directory = os.path.dirname(os.path.abspath(db.db_path))
+    handle, path = tempfile.mkstemp(prefix='concurrency-', suffix='.db', dir=directory)
+    os.close(handle)
+    try:
+        scratch = Database(path, args.profile)
+        scratch.add_client("اختبار التزامن", "0000000000")
+        scratch.close()
+
+        started = time.perf_counter()
+        with Pool(args.processes) as pool:
+            results = pool.starmap(book_concurrently,
+                                   [(path, args.profile, worker, args.bookings)
+                                    for worker in range(args.processes)])
+        elapsed = time.perf_counter() - started
+
+        scratch = Database(path, args.profile)
+        stored = scratch.get_statistics()['total_appointments']
+        scratch.close()
+    finally:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    booked = sum(result[0] for result in results)
+    locked = sum(result[1] for result in results)
+    print(f"الإعدادات: {args.profile}")
+    print(f"العمليات: {args.processes} × {args.bookings} حجز في {elapsed:.2f} ثانية")
+    print(f"تم الحجز: {booked}، محفوظ: {stored}، أخطاء القفل: {locked}")
+    return 0 if locked == 0 and booked == stored == args.processes * args.bookings else 1
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="أدوات صيانة قاعدة بيانات المواعيد")
+    parser.add_argument('--db', default="appointments.db", help="مسار قاعدة البيانات")
+    parser.add_argument('--profile', choices=sorted(CONNECTION_PROFILES), default=DEFAULT_PROFILE,
+                        help="إعدادات الاتصال بقاعدة البيانات")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('rebuild-statistics', help="إعادة حساب عدادات الإحصائيات من الجداول")
+
+    archive_parser = subparsers.add_parser('archive',
+                                           help="نقل المواعيد المكتملة والملغاة القديمة إلى قاعدة بيانات الأرشيف")
+    archive_parser.add_argument('--days', type=int, default=config.ARCHIVE_AFTER_DAYS,
+                                help="أرشفة المواعيد الأقدم من هذا العدد من الأيام")
+    archive_parser.add_argument('--before', help="أرشفة المواعيد قبل هذا التاريخ (YYYY-MM-DD)")
+    archive_parser.add_argument('--batch', type=int, default=ARCHIVE_BATCH, help="عدد المواعيد في كل معاملة")
+
+    compact_parser = subparsers.add_parser('compact',
+                                           help="حذف السجلات اليتيمة والتذكيرات القديمة وضغط قاعدة البيانات")
+    compact_parser.add_argument('--retention-days', type=int, default=config.NOTIFICATION_RETENTION_DAYS,
+                                help="حذف التذكيرات المرسلة الأقدم من هذا العدد من الأيام")
+    compact_parser.add_argument('--change-log-days', type=int, default=config.CHANGE_LOG_RETENTION_DAYS,
+                                help="حذف سجلات التغييرات الأقدم من هذا العدد من الأيام")
+    compact_parser.add_argument('--vacuum', action='store_true',
+                                help="إعادة بناء الملف بالكامل بأمر VACUUM (يلزم مرة واحدة لقواعد البيانات القديمة)")
+    compact_parser.add_argument('--if-due', type=float, metavar='HOURS',
+                                help="التشغيل فقط إذا مر هذا العدد من الساعات منذ آخر صيانة")
+
+    concurrency_parser = subparsers.add_parser('check-concurrency',
+                                               help="حجز متزامن من عدة عمليات على نسخة مؤقتة بجوار قاعدة البيانات")
+    concurrency_parser.add_argument('--processes', type=int, default=4)
+    concurrency_parser.add_argument('--bookings', type=int, default=100)
+
+    args = parser.parse_args(argv)
+    commands = {
+        'rebuild-statistics': rebuild_statistics,
+        'archive': archive,
+        'compact': compact,
+        'check-concurrency': check_concurrency,
+    }
+
+    db = Database(args.db, args.profile)
+    try:
+        return commands[args.command](db, args)
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from typing import Dict, Optional
+import config
+from database import Database
+from db_worker import DatabaseWorker
+
+class MaintenanceScheduler(QObject):
+    finished = pyqtSignal(object)
+
+    def __init__(self, db: Database, worker: Optional[DatabaseWorker] = None,
+                 interval_hours: float = config.MAINTENANCE_INTERVAL_HOURS,
+                 check_interval: int = config.MAINTENANCE_CHECK_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker or DatabaseWorker(db, parent=self)
+        self.task_key = f"maintenance:{id(self)}"
+        self.interval_hours = interval_hours
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(check_interval)
+        self._timer.timeout.connect(self.run_if_due)
+
+    def start(self):
+        self._timer.start()
+        self.run_if_due()
+
+    def stop(self):
+        self._timer.stop()
+        self.worker.cancel(self.task_key)
+
+    def run_if_due(self):
+        self.worker.submit(self.task_key, self.maintain_if_due,
+                           on_result=self.on_finished, on_error=self.on_failed)
+
+    def maintain_if_due(self) -> Optional[Dict[str, int]]:
+        if not self.db.is_maintenance_due(self.interval_hours):
+            return None
+        return self.db.run_maintenance(config.NOTIFICATION_RETENTION_DAYS, config.CHANGE_LOG_RETENTION_DAYS)
+
+    def on_finished(self, report: Optional[Dict[str, int]]):
+        if report is not None:
+            self.finished.emit(report)
+
+    def on_failed(self, message: str):
+        print(f"خطأ في صيانة قاعدة البيانات: {message}")
@@ -0,0 +1,353 @@
+import sqlite3
+from typing import List, Tuple
+
+REBUILD_STATISTICS = [
+    'DELETE FROM statistics',
+    "INSERT INTO statistics (key, value) SELECT 'clients', COUNT(*) FROM clients",
+    "INSERT INTO statistics (key, value) SELECT 'appointments', COUNT(*) FROM appointments",
+    '''
+    INSERT INTO statistics (key, value)
+    SELECT 'status:' || COALESCE(status, ''), COUNT(*) FROM appointments GROUP BY COALESCE(status, '')
+    ''',
+]
+
+ARCHIVE_APPOINTMENT_COLUMNS = ('id, client_id, appointment_date, appointment_time, service, notes, status, '
+                               'created_at, starts_at, duration')
+ARCHIVE_NOTIFICATION_COLUMNS = 'id, appointment_id, notification_time, message, is_sent, created_at, occurrence_date'
+
+ARCHIVE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS archive.appointments (
+        id INTEGER PRIMARY KEY,
+        client_id INTEGER NOT NULL,
+        appointment_date TEXT NOT NULL,
+        appointment_time TEXT NOT NULL,
+        service TEXT,
+        notes TEXT,
+        status TEXT,
+        created_at TIMESTAMP,
+        starts_at INTEGER,
+        duration INTEGER NOT NULL DEFAULT 30,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS archive.idx_appointments_date_time ON appointments(appointment_date, appointment_time)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_appointments_client ON appointments(client_id)',
+    '''
+    CREATE TABLE IF NOT EXISTS archive.notifications (
+        id INTEGER PRIMARY KEY,
+        appointment_id INTEGER NOT NULL,
+        notification_time TEXT NOT NULL,
+        message TEXT,
+        is_sent INTEGER,
+        created_at TIMESTAMP,
+        occurrence_date TEXT
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS archive.idx_notifications_appointment ON notifications(appointment_id)',
+]
+
+REBUILD_ARCHIVE_STATISTICS = [
+    "INSERT INTO statistics (key, value) SELECT 'archived:appointments', COUNT(*) FROM archive.appointments",
+    '''
+    INSERT INTO statistics (key, value)
+    SELECT 'archived:status:' || COALESCE(status, ''), COUNT(*) FROM archive.appointments
+    GROUP BY COALESCE(status, '')
+    ''',
+]
+
+CHANGE_LOG_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS change_log_{table}_{operation} AFTER {operation.upper()} ON {table}
+    BEGIN
+        INSERT INTO change_log (table_name, row_id, operation) VALUES ('{table}', {row}.id, '{operation}');
+    END
+    '''
+    for table in ('clients', 'appointments', 'appointment_series')
+    for operation, row in (('insert', 'NEW'), ('update', 'NEW'), ('delete', 'OLD'))
+] + [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS change_log_series_exceptions_{operation} AFTER {operation.upper()} ON series_exceptions
+    BEGIN
+        INSERT INTO change_log (table_name, row_id, operation)
+        VALUES ('appointment_series', {row}.series_id, 'update');
+    END
+    '''
+    for operation, row in (('insert', 'NEW'), ('delete', 'OLD'))
+]
+
+APPOINTMENT_CHANGE_LOG_TRIGGERS = [
+    statement
+    for operation, old_date, new_date in (('insert', 'NULL', 'NEW.appointment_date'),
+                                          ('update', 'OLD.appointment_date', 'NEW.appointment_date'),
+                                          ('delete', 'OLD.appointment_date', 'NULL'))
+    for statement in (
+        f'DROP TRIGGER IF EXISTS change_log_appointments_{operation}',
+        f'''
+        CREATE TRIGGER change_log_appointments_{operation} AFTER {operation.upper()} ON appointments
+        BEGIN
+            INSERT INTO change_log (table_name, row_id, operation, old_date, new_date)
+            VALUES ('appointments', {'OLD' if operation == 'delete' else 'NEW'}.id, '{operation}',
+                    {old_date}, {new_date});
+        END
+        ''',
+    )
+]
+
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "base tables", [
+        '''
+        CREATE TABLE IF NOT EXISTS clients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone TEXT NOT NULL UNIQUE,
+            email TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS appointments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER NOT NULL,
+            appointment_date TEXT NOT NULL,
+            appointment_time TEXT NOT NULL,
+            service TEXT,
+            notes TEXT,
+            status TEXT DEFAULT 'scheduled',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (client_id) REFERENCES clients(id) ON DELETE CASCADE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            appointment_id INTEGER NOT NULL,
+            notification_time TEXT NOT NULL,
+            message TEXT,
+            is_sent INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (appointment_id) REFERENCES appointments(id) ON DELETE CASCADE
+        )
+        ''',
+    ]),
+    (2, "appointment and notification indexes", [
+        'CREATE INDEX IF NOT EXISTS idx_appointments_date_time ON appointments(appointment_date, appointment_time)',
+        'CREATE INDEX IF NOT EXISTS idx_appointments_client ON appointments(client_id)',
+        'CREATE INDEX IF NOT EXISTS idx_appointments_status ON appointments(status)',
+        'CREATE INDEX IF NOT EXISTS idx_notifications_pending ON notifications(is_sent, notification_time)',
+    ]),
+    (3, "trigger-maintained statistics counters", [
+        '''
+        CREATE TABLE IF NOT EXISTS statistics (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS statistics_clients_insert AFTER INSERT ON clients
+        BEGIN
+            INSERT INTO statistics (key, value) VALUES ('clients', 1)
+            ON CONFLICT(key) DO UPDATE SET value = value + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS statistics_clients_delete AFTER DELETE ON clients
+        BEGIN
+            UPDATE statistics SET value = value - 1 WHERE key = 'clients';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS statistics_appointments_insert AFTER INSERT ON appointments
+        BEGIN
+            INSERT INTO statistics (key, value) VALUES ('appointments', 1)
+            ON CONFLICT(key) DO UPDATE SET value = value + 1;
+            INSERT INTO statistics (key, value) VALUES ('status:' || COALESCE(NEW.status, ''), 1)
+            ON CONFLICT(key) DO UPDATE SET value = value + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS statistics_appointments_delete AFTER DELETE ON appointments
+        BEGIN
+            UPDATE statistics SET value = value - 1 WHERE key = 'appointments';
+            UPDATE statistics SET value = value - 1 WHERE key = 'status:' || COALESCE(OLD.status, '');
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS statistics_appointments_status AFTER UPDATE OF status ON appointments
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE statistics SET value = value - 1 WHERE key = 'status:' || COALESCE(OLD.status, '');
+            INSERT INTO statistics (key, value) VALUES ('status:' || COALESCE(NEW.status, ''), 1)
+            ON CONFLICT(key) DO UPDATE SET value = value + 1;
+        END
+        ''',
+    ] + REBUILD_STATISTICS),
+    (4, "epoch start column for appointments", [
+        'ALTER TABLE appointments ADD COLUMN starts_at INTEGER',
+        '''
+        UPDATE appointments
+        SET starts_at = CAST(strftime('%s', appointment_date || ' ' || appointment_time) AS INTEGER)
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_appointments_starts_at ON appointments(starts_at)',
+    ]),
+    (5, "appointment duration", [
+        'ALTER TABLE appointments ADD COLUMN duration INTEGER NOT NULL DEFAULT 30',
+    ]),
+    (6, "recurring appointment series", [
+        '''
+        CREATE TABLE IF NOT EXISTS appointment_series (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            appointment_id INTEGER NOT NULL UNIQUE,
+            frequency TEXT NOT NULL,
+            interval INTEGER NOT NULL DEFAULT 1,
+            until TEXT,
+            count INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (appointment_id) REFERENCES appointments(id) ON DELETE CASCADE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS series_exceptions (
+            series_id INTEGER NOT NULL,
+            occurrence_date TEXT NOT NULL,
+            PRIMARY KEY (series_id, occurrence_date),
+            FOREIGN KEY (series_id) REFERENCES appointment_series(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        ''',
+        'ALTER TABLE notifications ADD COLUMN occurrence_date TEXT',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_notifications_occurrence
+        ON notifications(appointment_id, occurrence_date) WHERE occurrence_date IS NOT NULL
+        ''',
+    ]),
+    (7, "full-text search over clients", [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS clients_fts USING fts5(
+            name, phone, email,
+            content='clients', content_rowid='id',
+            prefix='2 3',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS clients_fts_insert AFTER INSERT ON clients
+        BEGIN
+            INSERT INTO clients_fts (rowid, name, phone, email)
+            VALUES (NEW.id, NEW.name, NEW.phone, NEW.email);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS clients_fts_delete AFTER DELETE ON clients
+        BEGIN
+            INSERT INTO clients_fts (clients_fts, rowid, name, phone, email)
+            VALUES ('delete', OLD.id, OLD.name, OLD.phone, OLD.email);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS clients_fts_update AFTER UPDATE OF name, phone, email ON clients
+        BEGIN
+            INSERT INTO clients_fts (clients_fts, rowid, name, phone, email)
+            VALUES ('delete', OLD.id, OLD.name, OLD.phone, OLD.email);
+            INSERT INTO clients_fts (rowid, name, phone, email)
+            VALUES (NEW.id, NEW.name, NEW.phone, NEW.email);
+        END
+        ''',
+        "INSERT INTO clients_fts (clients_fts) VALUES ('rebuild')",
+    ]),
+    (8, "change log for the change feed", [
+        '''
+        CREATE TABLE IF NOT EXISTS change_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            operation TEXT NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ] + CHANGE_LOG_TRIGGERS),
+    (9, "notification lookup index and maintenance log", [
+        'CREATE INDEX IF NOT EXISTS idx_notifications_appointment ON notifications(appointment_id)',
+        '''
+        CREATE TABLE IF NOT EXISTS maintenance_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ran_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            orphans INTEGER NOT NULL DEFAULT 0,
+            expired_notifications INTEGER NOT NULL DEFAULT 0,
+            pruned_changes INTEGER NOT NULL DEFAULT 0,
+            bytes_before INTEGER NOT NULL DEFAULT 0,
+            bytes_after INTEGER NOT NULL DEFAULT 0,
+            duration_ms INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+    ]),
+    (10, "index for upcoming scheduled appointments", [
+        '''
+        CREATE INDEX IF NOT EXISTS idx_appointments_status_date_time
+        ON appointments(status, appointment_date, appointment_time)
+        ''',
+    ]),
+    (11, "last occurrence date of recurring series", [
+        'ALTER TABLE appointment_series ADD COLUMN last_occurrence TEXT',
+        '''
+        UPDATE appointment_series SET last_occurrence = (
+            SELECT CASE
+                WHEN appointment_series.count IS NULL THEN appointment_series.until
+                ELSE min(COALESCE(appointment_series.until, '9999-12-31'),
+                         date(a.appointment_date,
+                              '+' || ((max(appointment_series.count, 1) - 1) * appointment_series.interval
+                                      * (CASE appointment_series.frequency WHEN 'weekly' THEN 7 ELSE 1 END))
+                              || (CASE appointment_series.frequency WHEN 'monthly' THEN ' months' ELSE ' days' END)))
+            END
+            FROM appointments a WHERE a.id = appointment_series.appointment_id
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_series_last_occurrence ON appointment_series(last_occurrence)',
+    ]),
+    (12, "appointment dates in the change log", [
+        'ALTER TABLE change_log ADD COLUMN old_date TEXT',
+        'ALTER TABLE change_log ADD COLUMN new_date TEXT',
+    ] + APPOINTMENT_CHANGE_LOG_TRIGGERS),
+    (13, "indexes for every appointments list sort key", [
+        'CREATE INDEX IF NOT EXISTS idx_clients_name ON clients(name)',
+        'CREATE INDEX IF NOT EXISTS idx_appointments_time ON appointments(appointment_time)',
+        "CREATE INDEX IF NOT EXISTS idx_appointments_service ON appointments(COALESCE(service, ''))",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_status_key ON appointments(COALESCE(status, ''))",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_notes ON appointments(COALESCE(notes, ''))",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+def migrate(conn: sqlite3.Connection) -> int:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+    if get_schema_version(conn) >= LATEST_VERSION:
+        return LATEST_VERSION
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        current = get_schema_version(conn)
+        for version, description, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                         (version, description))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return LATEST_VERSION
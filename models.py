@@ -1,6 +1,16 @@
 from dataclasses import dataclass
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, date, timedelta
+from typing import Optional, Dict, List, Set, Callable, Iterable
+import threading
+import weakref
+import config
+from database import DEFAULT_APPOINTMENT_MINUTES, MAX_APPOINTMENT_MINUTES, CHANGE_EVENTS
+
+_occupancy_caches = weakref.WeakKeyDictionary()
+_client_caches = weakref.WeakKeyDictionary()
+
+def to_minutes(time: str) -> int:
+    return int(time[:2]) * 60 + int(time[3:5])
 
 @dataclass
 class Client:
@@ -32,6 +42,8 @@ class Appointment:
     client_name: str = ""
     client_phone: str = ""
     created_at: Optional[str] = None
+    starts_at: Optional[int] = None
+    duration: int = 30
 
     @staticmethod
     def from_dict(data: dict) -> 'Appointment':
@@ -45,7 +57,9 @@ class Appointment:
             status=data.get('status', 'scheduled'),
             client_name=data.get('name', ''),
             client_phone=data.get('phone', ''),
-            created_at=data.get('created_at')
+            created_at=data.get('created_at'),
+            starts_at=data.get('starts_at'),
+            duration=data.get('duration', 30)
         )
 
 @dataclass
@@ -72,11 +86,231 @@ class Notification:
             client_email=data.get('email', '')
         )
 
+class OccupancyCache:
+    def __init__(self, db):
+        self.db = db
+        self.slot_minutes = config.SLOT_MINUTES
+        self.opening = to_minutes(config.BUSINESS_HOURS[0])
+        self.closing = to_minutes(config.BUSINESS_HOURS[1])
+        self.slot_count = (self.closing - self.opening) // self.slot_minutes
+        self._lock = threading.RLock()
+        self._bitmaps: Dict[str, int] = {}
+        self._appointment_dates: Dict[int, Set[str]] = {}
+        self._generation = 0
+        db.add_observer(self.on_database_event)
+
+    @staticmethod
+    def for_database(db) -> 'OccupancyCache':
+        cache = _occupancy_caches.get(db)
+        if cache is None:
+            cache = _occupancy_caches[db] = OccupancyCache(db)
+        return cache
+
+    def on_database_event(self, event: str, payload: dict):
+        if event == 'appointment_added':
+            self.invalidate([payload['appointment_date']])
+        elif event in ('appointment_updated', 'appointment_deleted'):
+            with self._lock:
+                dates = self._appointment_dates.pop(payload['appointment_id'], set())
+                if 'appointment_date' in payload:
+                    dates.add(payload['appointment_date'])
+                self.invalidate(dates)
+        elif event == 'changes_received':
+            self.apply_changes(payload['changes'])
+        elif event in ('appointments_imported', 'changes_reset') or event.startswith('series'):
+            self.clear()
+
+    def apply_changes(self, changes: List[dict]):
+        if any(change['table_name'] == 'appointment_series' for change in changes):
+            self.clear()
+            return
+
+        appointment_ids = [change['row_id'] for change in changes if change['table_name'] == 'appointments']
+        if not appointment_ids:
+            return
+        current = self.db.get_appointment_dates(appointment_ids)
+        if any(row['series_id'] is not None for row in current.values()):
+            self.clear()
+            return
+
+        with self._lock:
+            dates: Set[str] = set()
+            for appointment_id in appointment_ids:
+                dates |= self._appointment_dates.pop(appointment_id, set())
+                if appointment_id in current:
+                    dates.add(current[appointment_id]['appointment_date'])
+            self.invalidate(dates)
+
+    def invalidate(self, dates: Iterable[str]):
+        with self._lock:
+            self._generation += 1
+            for day in dates:
+                self._bitmaps.pop(day, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._bitmaps.clear()
+            self._appointment_dates.clear()
+
+    def slot_mask(self, time: str, duration: int) -> int:
+        start = to_minutes(time) - self.opening
+        first = max(0, start // self.slot_minutes)
+        last = min(self.slot_count, -(-(start + duration) // self.slot_minutes))
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    def get_bitmaps(self, start_date: str, days: int) -> Dict[str, int]:
+        first_day = date.fromisoformat(start_date)
+        dates = [(first_day + timedelta(days=offset)).isoformat() for offset in range(days)]
+        with self._lock:
+            missing = [day for day in dates if day not in self._bitmaps]
+            if not missing:
+                return {day: self._bitmaps[day] for day in dates}
+            generation = self._generation
+
+        loaded = dict.fromkeys(missing, 0)
+        intervals = [apt for apt in self.db.get_busy_intervals(missing[0], missing[-1])
+                     if apt['appointment_date'] in loaded]
+        for apt in intervals:
+            loaded[apt['appointment_date']] |= self.slot_mask(apt['appointment_time'], apt['duration'])
+
+        with self._lock:
+            if generation == self._generation:
+                self._bitmaps.update(loaded)
+                for apt in intervals:
+                    self._appointment_dates.setdefault(apt['id'], set()).add(apt['appointment_date'])
+            return {day: self._bitmaps.get(day, loaded.get(day, 0)) for day in dates}
+
+class ClientCache:
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.RLock()
+        self._by_id: Dict[int, dict] = {}
+        self._by_phone: Dict[str, int] = {}
+        self._ordered: Optional[List[dict]] = None
+        self._loaded = False
+        self._generation = 0
+        self._observers: List[Callable[[str, int], None]] = []
+        db.add_observer(self.on_database_event)
+
+    @staticmethod
+    def for_database(db) -> 'ClientCache':
+        cache = _client_caches.get(db)
+        if cache is None:
+            cache = _client_caches[db] = ClientCache(db)
+        return cache
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def add_observer(self, callback: Callable[[str, int], None]):
+        self._observers.append(callback)
+
+    def remove_observer(self, callback: Callable[[str, int], None]):
+        if callback in self._observers:
+            self._observers.remove(callback)
+
+    def _notify(self, event: str, client_id: int = 0):
+        for callback in list(self._observers):
+            try:
+                callback(event, client_id)
+            except Exception as e:
+                print(f"خطأ في معالجة حدث العملاء {event}: {str(e)}")
+
+    def get_all(self) -> List[dict]:
+        with self._lock:
+            if self._loaded:
+                if self._ordered is None:
+                    self._ordered = sorted(self._by_id.values(), key=lambda client: client['name'])
+                return self._ordered
+            generation = self._generation
+
+        clients = self.db.get_all_clients()
+        with self._lock:
+            if generation == self._generation:
+                self._by_id = {client['id']: client for client in clients}
+                self._by_phone = {client['phone']: client['id'] for client in clients}
+                self._ordered = clients
+                self._loaded = True
+        return clients
+
+    def get(self, client_id: int) -> Optional[dict]:
+        with self._lock:
+            if client_id in self._by_id or self._loaded:
+                return self._by_id.get(client_id)
+            generation = self._generation
+
+        client = self.db.get_client_by_id(client_id)
+        with self._lock:
+            if client and generation == self._generation:
+                self._store(client)
+        return client
+
+    def cached(self, client_id: int) -> Optional[dict]:
+        with self._lock:
+            return self._by_id.get(client_id)
+
+    def get_by_phone(self, phone: str) -> Optional[dict]:
+        with self._lock:
+            if phone in self._by_phone:
+                return self._by_id.get(self._by_phone[phone])
+            if self._loaded:
+                return None
+
+        client_id = self.db.get_client_ids_by_phone([phone]).get(phone)
+        return self.get(client_id) if client_id else None
+
+    def _store(self, client: dict):
+        self._discard(client['id'])
+        self._by_id[client['id']] = client
+        self._by_phone[client['phone']] = client['id']
+        self._ordered = None
+
+    def _discard(self, client_id: int):
+        old = self._by_id.pop(client_id, None)
+        if old is not None:
+            self._by_phone.pop(old['phone'], None)
+            self._ordered = None
+
+    def on_database_event(self, event: str, payload: dict):
+        if event in ('client_added', 'client_updated'):
+            client_id = payload['client_id']
+            client = self.db.get_client_by_id(client_id)
+            with self._lock:
+                self._generation += 1
+                if client is None:
+                    self._discard(client_id)
+                else:
+                    self._store(client)
+            self._notify(event, client_id)
+        elif event == 'client_deleted':
+            with self._lock:
+                self._generation += 1
+                self._discard(payload['client_id'])
+            self._notify(event, payload['client_id'])
+        elif event == 'changes_received':
+            for change in payload['changes']:
+                if change['table_name'] == 'clients':
+                    self.on_database_event(CHANGE_EVENTS[(change['table_name'], change['operation'])],
+                                           {'client_id': change['row_id']})
+        elif event in ('clients_imported', 'changes_reset'):
+            with self._lock:
+                self._generation += 1
+                self._by_id, self._by_phone, self._ordered = {}, {}, None
+                self._loaded = False
+            self._notify('clients_reloaded')
+
 class AppointmentManager:
     def __init__(self, database):
         self.db = database
+        self.occupancy = OccupancyCache.for_database(database)
 
-    def validate_appointment(self, client_id: int, date: str, time: str) -> tuple[bool, str]:
+    def validate_appointment(self, client_id: int, date: str, time: str,
+                             duration: int = DEFAULT_APPOINTMENT_MINUTES,
+                             exclude_id: Optional[int] = None) -> tuple[bool, str]:
         if not client_id:
             return False, "يجب اختيار عميل"
         
@@ -86,42 +320,57 @@ class AppointmentManager:
         if not time:
             return False, "يجب اختيار وقت"
         
-        existing = self.db.get_appointments_by_date(date)
-        for apt in existing:
-            if apt['appointment_time'] == time:
-                return False, "هذا الوقت محجوز بالفعل"
+        if not 0 < duration <= MAX_APPOINTMENT_MINUTES:
+            return False, "مدة الموعد غير صالحة"
+        
+        conflicts = self.db.get_conflicting_appointments(date, time, duration, exclude_id)
+        if conflicts:
+            apt = conflicts[0]
+            return False, f"هذا الوقت محجوز بالفعل: موعد {apt['name']} في {apt['appointment_time']} لمدة {apt['duration']} دقيقة"
         
         return True, "OK"
 
     def get_available_times(self, date: str, interval_minutes: int = 30) -> list:
-        from datetime import datetime, timedelta
-        
-        business_hours = [
-            (9, 0),
-            (17, 0)
-        ]
-        
-        existing = self.db.get_appointments_by_date(date)
-        existing_times = {apt['appointment_time'] for apt in existing}
+        bitmap = self.occupancy.get_bitmaps(date, 1)[date]
         
         available = []
-        current = datetime.strptime(f"{business_hours[0][0]:02d}:{business_hours[0][1]:02d}", "%H:%M")
-        end = datetime.strptime(f"{business_hours[1][0]:02d}:{business_hours[1][1]:02d}", "%H:%M")
-        
-        while current < end:
-            time_str = current.strftime("%H:%M")
-            if time_str not in existing_times:
+        for minute in range(self.occupancy.opening, self.occupancy.closing, interval_minutes):
+            time_str = f"{minute // 60:02d}:{minute % 60:02d}"
+            if not bitmap & self.occupancy.slot_mask(time_str, interval_minutes):
                 available.append(time_str)
-            current += timedelta(minutes=interval_minutes)
         
         return available
 
+    def find_free_slots(self, start_date: str, days: int = 7, duration: Optional[int] = None,
+                        service: Optional[str] = None, limit: int = 10) -> List[dict]:
+        duration = duration or config.SERVICE_DURATIONS.get(service, DEFAULT_APPOINTMENT_MINUTES)
+        occupancy = self.occupancy
+        needed = -(-duration // occupancy.slot_minutes)
+        mask = (1 << needed) - 1
+
+        now = datetime.now()
+        today = now.date().isoformat()
+        now_minutes = now.hour * 60 + now.minute
+
+        slots = []
+        for day, bitmap in occupancy.get_bitmaps(start_date, days).items():
+            if day < today:
+                continue
+            for slot in range(occupancy.slot_count - needed + 1):
+                if (bitmap >> slot) & mask:
+                    continue
+                minute = occupancy.opening + slot * occupancy.slot_minutes
+                if day == today and minute <= now_minutes:
+                    continue
+                slots.append({
+                    'appointment_date': day,
+                    'appointment_time': f"{minute // 60:02d}:{minute % 60:02d}",
+                    'duration': duration
+                })
+                if len(slots) >= limit:
+                    return slots
+
+        return slots
+
     def get_appointments_by_date_range(self, start_date: str, end_date: str) -> list:
-        all_appointments = self.db.get_all_appointments()
-        filtered = []
-        
-        for apt in all_appointments:
-            if start_date <= apt['appointment_date'] <= end_date:
-                filtered.append(apt)
-        
-        return sorted(filtered, key=lambda x: x['appointment_date'])
+        return self.db.get_appointments_between(start_date, end_date)
@@ -1,21 +1,35 @@
 from PyQt5.QtWidgets import QSystemTrayIcon, QMenu, QApplication, QMessageBox
 from PyQt5.QtGui import QIcon, QColor
-from PyQt5.QtCore import Qt, QTimer, QDateTime
-from datetime import datetime, timedelta
-from database import Database
+from PyQt5.QtCore import Qt, QTimer, QDateTime, QObject, pyqtSignal
+from datetime import datetime, timedelta, date
+from typing import List, Optional
+from database import Database, epoch_now
+from db_worker import DatabaseWorker
 import config
+import heapq
 import sys
 
+MAX_TIMER_INTERVAL_MS = 24 * 60 * 60 * 1000
+
 class NotificationManager:
     def __init__(self, db: Database):
         self.db = db
         self.sent_notifications = set()
 
-    def send_notification(self, client_name: str, message: str, notification_id: int):
+    def send_notification(self, client_name: str, message: str, notification_id: int,
+                          worker: Optional[DatabaseWorker] = None):
+        if notification_id in self.sent_notifications:
+            return
+
         try:
             self.show_popup_notification(client_name, message)
-            self.db.mark_notification_sent(notification_id)
             self.sent_notifications.add(notification_id)
+            if worker:
+                worker.submit(f"notification_sent:{notification_id}", self.db.mark_notification_sent,
+                              notification_id,
+                              on_error=lambda error: print(f"خطأ في إرسال التنبيه: {error}"))
+            else:
+                self.db.mark_notification_sent(notification_id)
         except Exception as e:
             print(f"خطأ في إرسال التنبيه: {str(e)}")
 
@@ -51,22 +65,10 @@ class NotificationManager:
         return self.db.get_pending_notifications()
 
     def check_upcoming_appointments(self) -> list:
-        now = datetime.now()
-        upcoming_time = now + timedelta(minutes=config.NOTIFICATION_ADVANCE_MINUTES)
-        
-        all_appointments = self.db.get_all_appointments()
-        upcoming = []
+        now = epoch_now()
+        upcoming_time = now + config.NOTIFICATION_ADVANCE_MINUTES * 60
         
-        for apt in all_appointments:
-            apt_datetime = datetime.strptime(
-                f"{apt['appointment_date']} {apt['appointment_time']}", 
-                f"{config.DATE_FORMAT} {config.TIME_FORMAT}"
-            )
-            
-            if now < apt_datetime <= upcoming_time and apt['status'] == 'scheduled':
-                upcoming.append(apt)
-        
-        return upcoming
+        return self.db.get_appointments_starting_between(now, upcoming_time, status='scheduled')
 
     def create_tray_icon(self) -> QSystemTrayIcon:
         tray_icon = QSystemTrayIcon()
@@ -125,3 +127,123 @@ class AppointmentReminder:
 
     def get_upcoming_appointments(self):
         return self.notification_manager.check_upcoming_appointments()
+
+class ReminderScheduler(QObject):
+    reminder_scheduled = pyqtSignal(str)
+    reload_requested = pyqtSignal()
+
+    def __init__(self, db: Database, notification_manager: NotificationManager,
+                 worker: Optional[DatabaseWorker] = None, batch_size: int = 50, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.notification_manager = notification_manager
+        self.worker = worker or DatabaseWorker(db, parent=self)
+        self.task_key = f"reminders:{id(self)}"
+        self.due_key = f"reminders_due:{id(self)}"
+        self.batch_size = batch_size
+        self._heap = []
+        self._added: List[str] = []
+        self._firing = False
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self.fire_due_reminders)
+
+        self.reminder_scheduled.connect(self.add_reminder)
+        self.reload_requested.connect(self.reload)
+        self.db.add_observer(self.on_database_event)
+
+    def start(self):
+        self.reload()
+
+    def stop(self):
+        self._timer.stop()
+        self.worker.cancel(self.task_key)
+        self.worker.cancel(self.due_key)
+        self.db.remove_observer(self.on_database_event)
+
+    def reload(self, minimum_delay: int = 0):
+        self._added = []
+        self.worker.submit(self.task_key, self.load_reminders,
+                           on_result=lambda times: self.show_reminders(times, minimum_delay),
+                           on_error=self.on_load_failed)
+
+    def load_reminders(self) -> List[str]:
+        today = date.today()
+        self.db.add_series_notifications(
+            today.isoformat(),
+            (today + timedelta(days=config.RECURRING_REMINDER_DAYS)).isoformat()
+        )
+        return [n['notification_time'] for n in self.db.get_next_notifications(self.batch_size)]
+
+    def show_reminders(self, notification_times: List[str], minimum_delay: int = 0):
+        self._heap = notification_times + self._added
+        self._added = []
+        heapq.heapify(self._heap)
+        self._arm(minimum_delay)
+
+    def on_load_failed(self, message: str):
+        print(f"خطأ في تحميل التذكيرات: {message}")
+        self._timer.start(config.NOTIFICATION_CHECK_INTERVAL)
+
+    def on_database_event(self, event: str, payload: dict):
+        if event in ('appointment_added', 'appointment_updated'):
+            self.reminder_scheduled.emit(f"{payload['appointment_date']} {payload['appointment_time']}")
+        elif event in ('appointments_imported', 'series_added', 'series_updated', 'changes_reset'):
+            self.reload_requested.emit()
+        elif event == 'changes_received':
+            if any(change['table_name'] != 'clients' for change in payload['changes']):
+                self.reload_requested.emit()
+
+    def add_reminder(self, notification_time: str):
+        if self.worker.is_loading(self.task_key):
+            self._added.append(notification_time)
+        heapq.heappush(self._heap, notification_time)
+        self._arm()
+
+    def fire_due_reminders(self):
+        now = datetime.now()
+        fired = False
+        while self._heap and self._parse_time(self._heap[0]) <= now:
+            heapq.heappop(self._heap)
+            fired = True
+
+        self.worker.submit(self.due_key, self.db.get_pending_notifications,
+                           on_result=lambda notifications: self.show_due_reminders(notifications, fired),
+                           on_error=self.on_load_failed)
+
+    def show_due_reminders(self, notifications: List[dict], fired: bool):
+        if self._firing:
+            return
+
+        self._firing = True
+        try:
+            for notification in notifications:
+                self.notification_manager.send_notification(
+                    notification['name'],
+                    notification['message'],
+                    notification['id'],
+                    self.worker
+                )
+        finally:
+            self._firing = False
+
+        if self._heap and fired:
+            self._arm()
+        else:
+            self.reload(config.NOTIFICATION_CHECK_INTERVAL if fired else 0)
+
+    def _arm(self, minimum_delay: int = 0):
+        if not self._heap:
+            self._timer.start(MAX_TIMER_INTERVAL_MS)
+            return
+
+        delay = (self._parse_time(self._heap[0]) - datetime.now()).total_seconds() * 1000
+        self._timer.start(int(min(max(delay, minimum_delay), MAX_TIMER_INTERVAL_MS)))
+
+    def _parse_time(self, notification_time: str) -> datetime:
+        try:
+            return datetime.strptime(notification_time[:16], "%Y-%m-%d %H:%M")
+        except ValueError:
+            return datetime.now()
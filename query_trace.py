@@ -0,0 +1,255 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+
+TRACE_ENV = 'APPOINTMENTS_TRACE'
+SLOW_QUERY_MS_ENV = 'APPOINTMENTS_SLOW_QUERY_MS'
+SLOW_QUERY_LOG_ENV = 'APPOINTMENTS_SLOW_QUERY_LOG'
+
+DEFAULT_SLOW_QUERY_MS = 100.0
+DEFAULT_SLOW_QUERY_LOG = "slow_queries.log"
+DEFAULT_TRACE_REPORT = "query_trace.json"
+
+HISTOGRAM_BOUNDS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+UNTRACED_METHODS = {'connection', 'close', 'add_observer', 'remove_observer', 'publish_changes'}
+TOP_STATEMENTS = 50
+OUTSIDE_METHODS = '-'
+
+def normalize_sql(sql: str) -> str:
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+def count_rows(result: Any) -> int:
+    if isinstance(result, (list, dict)):
+        return len(result)
+    return 0 if result is None else 1
+
+class TracedCursor(sqlite3.Cursor):
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            self.connection.tracer.add_rows(1)
+        return row
+
+    def fetchmany(self, *args):
+        rows = super().fetchmany(*args)
+        self.connection.tracer.add_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self.connection.tracer.add_rows(len(rows))
+        return rows
+
+    def __next__(self):
+        row = super().__next__()
+        self.connection.tracer.add_rows(1)
+        return row
+
+class TracedConnection(sqlite3.Connection):
+    tracer: 'QueryTracer' = None
+
+    def execute(self, sql: str, parameters=()):
+        cursor = self.cursor(TracedCursor)
+        cursor.execute(sql, parameters)
+        if cursor.description is None and cursor.rowcount > 0:
+            self.tracer.add_rows(cursor.rowcount)
+        return cursor
+
+    def executemany(self, sql: str, parameters):
+        cursor = self.cursor(TracedCursor)
+        cursor.executemany(sql, parameters)
+        if cursor.rowcount > 0:
+            self.tracer.add_rows(cursor.rowcount)
+        return cursor
+
+class LatencyHistogram:
+    def __init__(self):
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+
+    def add(self, elapsed_ms: float, rows: int = 0):
+        index = 0
+        while index < len(HISTOGRAM_BOUNDS_MS) and elapsed_ms > HISTOGRAM_BOUNDS_MS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += rows
+
+    def percentile(self, fraction: float) -> float:
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return HISTOGRAM_BOUNDS_MS[index] if index < len(HISTOGRAM_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        return {
+            'count': self.count,
+            'rows': self.rows,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.percentile(0.50),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'histogram': {label: count for label, count in zip(labels, self.buckets) if count},
+        }
+
+class QueryTracer:
+    def __init__(self, slow_query_ms: float = DEFAULT_SLOW_QUERY_MS,
+                 slow_query_log: str = DEFAULT_SLOW_QUERY_LOG,
+                 report_path: Optional[str] = DEFAULT_TRACE_REPORT):
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_log = slow_query_log
+        self.report_path = report_path
+        self.db = None
+        self.methods: Dict[str, LatencyHistogram] = {}
+        self.statements: Dict[tuple, LatencyHistogram] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _state(self):
+        state = self._local
+        if not hasattr(state, 'stack'):
+            state.stack = []
+            state.statement = None
+            state.slow = []
+            state.explaining = False
+        return state
+
+    def instrument(self, db):
+        self.db = db
+        for name in dir(type(db)):
+            if name.startswith('_') or name in UNTRACED_METHODS:
+                continue
+            method = getattr(db, name)
+            if callable(method):
+                setattr(db, name, self.wrap(f"{type(db).__name__}.{name}", method))
+
+    def attach(self, conn: TracedConnection):
+        conn.tracer = self
+        conn.set_trace_callback(self.on_statement)
+
+    def wrap(self, name: str, method: Callable) -> Callable:
+        @wraps(method)
+        def traced(*args, **kwargs):
+            state = self._state()
+            self._close_statement(state)
+            state.stack.append(name)
+            started = time.perf_counter()
+            result = None
+            try:
+                result = method(*args, **kwargs)
+                return result
+            finally:
+                elapsed = (time.perf_counter() - started) * 1000
+                self._close_statement(state)
+                state.stack.pop()
+                with self._lock:
+                    self.methods.setdefault(name, LatencyHistogram()).add(elapsed, count_rows(result))
+                if elapsed >= self.slow_query_ms and not any(entry[1] == name for entry in state.slow):
+                    state.slow.append((datetime.now(), name, elapsed, None, count_rows(result)))
+                if not state.stack and state.slow:
+                    self._write_slow(state)
+        return traced
+
+    def on_statement(self, sql: str):
+        state = self._state()
+        if state.explaining or sql.startswith('--'):
+            return
+        if state.statement is not None and state.statement[0] == sql:
+            return
+        self._close_statement(state)
+        state.statement = [sql, time.perf_counter(), state.stack[-1] if state.stack else OUTSIDE_METHODS, 0]
+
+    def add_rows(self, rows: int):
+        statement = self._state().statement
+        if statement is not None:
+            statement[3] += rows
+
+    def _close_statement(self, state):
+        if state.statement is None:
+            return
+        sql, started, method, rows = state.statement
+        state.statement = None
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.statements.setdefault((method, normalize_sql(sql)), LatencyHistogram()).add(elapsed, rows)
+        if elapsed >= self.slow_query_ms:
+            state.slow.append((datetime.now(), method, elapsed, sql, rows))
+
+    def _write_slow(self, state):
+        entries, state.slow = state.slow, []
+        lines = []
+        for logged_at, method, elapsed, sql, rows in entries:
+            lines.append(f"{logged_at.isoformat(sep=' ', timespec='seconds')} | {method} | "
+                         f"{elapsed:.1f} ms | {rows} rows")
+            if sql is None:
+                lines.append("(زمن الدالة كاملة، لا يوجد استعلام منفرد بطيء)")
+            else:
+                lines.append(sql.strip())
+                lines.extend(f"  {step}" for step in self.explain(state, sql))
+            lines.append("")
+
+        with self._lock:
+            with open(self.slow_query_log, 'a', encoding='utf-8') as log:
+                log.write('\n'.join(lines) + '\n')
+
+    def explain(self, state, sql: str) -> List[str]:
+        if self.db is None or not sql.lstrip().upper().startswith(('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')):
+            return []
+        state.explaining = True
+        try:
+            conn = self.db.pool.acquire()
+            return [f"QUERY PLAN: {row[3]}" for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        except sqlite3.Error as e:
+            return [f"QUERY PLAN: غير متاح ({str(e)})"]
+        finally:
+            state.explaining = False
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            methods = {name: histogram.to_dict() for name, histogram in sorted(self.methods.items())}
+            statements = sorted(self.statements.items(), key=lambda item: item[1].total_ms, reverse=True)
+            return {
+                'slow_query_ms': self.slow_query_ms,
+                'methods': methods,
+                'statements': [dict(method=method, sql=sql, **histogram.to_dict())
+                               for (method, sql), histogram in statements[:TOP_STATEMENTS]],
+            }
+
+    def write_report(self, path: Optional[str] = None):
+        path = path or self.report_path
+        if not path:
+            return
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+def create_tracer(enabled: bool = False, slow_query_ms: float = DEFAULT_SLOW_QUERY_MS,
+                  slow_query_log: str = DEFAULT_SLOW_QUERY_LOG,
+                  report_path: Optional[str] = DEFAULT_TRACE_REPORT) -> Optional[QueryTracer]:
+    flag = os.environ.get(TRACE_ENV)
+    if flag is not None:
+        enabled = flag.strip().lower() not in ('', '0', 'false', 'no', 'off')
+    if not enabled:
+        return None
+
+    return QueryTracer(float(os.environ.get(SLOW_QUERY_MS_ENV, slow_query_ms)),
+                       os.environ.get(SLOW_QUERY_LOG_ENV, slow_query_log),
+                       report_path)
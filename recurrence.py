@@ -0,0 +1,57 @@
+import calendar
+from datetime import date, timedelta
+from typing import Iterator, Optional, Iterable
+
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+
+def add_months(day: date, months: int) -> date:
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+def nth_occurrence(first: date, frequency: str, interval: int, n: int) -> date:
+    if frequency == 'daily':
+        return first + timedelta(days=interval * n)
+    if frequency == 'weekly':
+        return first + timedelta(weeks=interval * n)
+    return add_months(first, interval * n)
+
+def occurrence_index(first: date, frequency: str, interval: int, day: date) -> int:
+    if day <= first:
+        return 0
+    if frequency == 'monthly':
+        n = ((day.year - first.year) * 12 + day.month - first.month) // interval
+    else:
+        step = interval * (7 if frequency == 'weekly' else 1)
+        n = (day - first).days // step
+    while nth_occurrence(first, frequency, interval, n) < day:
+        n += 1
+    return n
+
+def last_occurrence(first_date: str, frequency: str, interval: int,
+                    until: Optional[str] = None, count: Optional[int] = None) -> Optional[str]:
+    last = None
+    if count is not None:
+        last = nth_occurrence(date.fromisoformat(first_date), frequency, max(1, interval or 1), max(count, 1) - 1)
+    if until:
+        last = min(last, date.fromisoformat(until)) if last else date.fromisoformat(until)
+    return last.isoformat() if last else None
+
+def occurrences(first_date: str, frequency: str, interval: int, start_date: str, end_date: str,
+                until: Optional[str] = None, count: Optional[int] = None,
+                exceptions: Iterable[str] = ()) -> Iterator[str]:
+    first = date.fromisoformat(first_date)
+    end = date.fromisoformat(end_date)
+    if until:
+        end = min(end, date.fromisoformat(until))
+    interval = max(1, interval or 1)
+
+    n = occurrence_index(first, frequency, interval, date.fromisoformat(start_date))
+    while count is None or n < count:
+        day = nth_occurrence(first, frequency, interval, n)
+        if day > end:
+            break
+        text = day.isoformat()
+        if text not in exceptions:
+            yield text
+        n += 1
@@ -0,0 +1,43 @@
+import os
+import time
+from typing import Dict
+
+STARTUP_REPORT_ENV = 'APPOINTMENTS_STARTUP_REPORT'
+
+STARTUP_EVENTS = {
+    'imports': "تحميل الوحدات",
+    'window': "إنشاء النافذة",
+    'first_paint': "أول رسم للنافذة",
+    'first_data': "أول تحميل للبيانات",
+}
+
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.marks: Dict[str, float] = {}
+        self.enabled = False
+        self.reported = False
+
+    def configure(self, enabled: bool = False):
+        flag = os.environ.get(STARTUP_REPORT_ENV)
+        if flag is not None:
+            enabled = flag.strip().lower() not in ('', '0', 'false', 'no', 'off')
+        self.enabled = enabled
+
+    def mark(self, event: str):
+        if event not in self.marks:
+            self.marks[event] = (time.perf_counter() - self.started) * 1000
+
+        if not self.reported and all(name in self.marks for name in STARTUP_EVENTS):
+            self.reported = True
+            if self.enabled:
+                print(self.report())
+
+    def report(self) -> str:
+        lines = ["زمن بدء التشغيل:"]
+        for event, label in STARTUP_EVENTS.items():
+            if event in self.marks:
+                lines.append(f"  {label}: {self.marks[event]:.0f} ms")
+        return '\n'.join(lines)
+
+STARTUP = StartupTimer()
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from database import Database
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "appointments.db"))
+    yield database
+    database.close()
+
+@pytest.fixture
+def client_id(db):
+    return db.add_client("عميل الاختبار", "0500000000")
+
+@pytest.fixture(scope='session')
+def qapp():
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+@pytest.fixture
+def worker(qapp, db):
+    from db_worker import DatabaseWorker
+    database_worker = DatabaseWorker(db)
+    yield database_worker
+    database_worker.wait()
+
+def wait_for_worker(qapp, database_worker):
+    database_worker.wait()
+    qapp.processEvents()
@@ -0,0 +1,83 @@
+import asyncio
+import re
+from datetime import date, timedelta
+from http import HTTPStatus
+
+import pytest
+
+from api_server import ApiServer
+
+class FakeWriter:
+    def __init__(self):
+        self.data = b''
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def server(db):
+    api = ApiServer(db, workers=1)
+    yield api
+    api.executor.shutdown(wait=True)
+
+def test_duplicate_phone_race_is_a_conflict(server, client_id):
+    server.db.get_client_ids_by_phone = lambda phones: {}
+    status, payload = server.dispatch('POST', '/clients', {}, {'name': "عميل", 'phone': "0500000000"})
+
+    assert status == HTTPStatus.CONFLICT
+    assert payload['error'] == "رقم الهاتف موجود بالفعل"
+
+def test_server_bugs_are_internal_errors(server, capsys):
+    def broken(query, body):
+        raise RuntimeError("bug")
+    server.routes.insert(0, ('GET', re.compile(r'/broken'), broken))
+
+    status, payload = server.dispatch('GET', '/broken', {}, {})
+
+    assert status == HTTPStatus.INTERNAL_SERVER_ERROR
+    assert "bug" not in payload['error']
+    assert "RuntimeError" in capsys.readouterr().err
+
+def test_invalid_input_is_a_bad_request(server, client_id):
+    status, _ = server.dispatch('POST', '/appointments', {},
+                                {'client_id': client_id, 'date': "2026-13-40", 'time': "10:00"})
+    assert status == HTTPStatus.BAD_REQUEST
+
+def test_booking_for_a_missing_client_is_not_found(server):
+    day = (date.today() + timedelta(days=1)).isoformat()
+    status, _ = server.dispatch('POST', '/appointments', {}, {'client_id': 999, 'date': day, 'time': "10:00"})
+    assert status == HTTPStatus.NOT_FOUND
+
+@pytest.mark.parametrize('request_bytes, status', [
+    (b"POST /clients HTTP/1.1\r\nContent-Length: abc\r\n\r\n", HTTPStatus.BAD_REQUEST),
+    (b"POST /clients HTTP/1.1\r\nContent-Length: -5\r\n\r\n", HTTPStatus.BAD_REQUEST),
+    (b"POST /clients HTTP/1.1\r\nContent-Length: 99999999\r\n\r\n", HTTPStatus.REQUEST_ENTITY_TOO_LARGE),
+    (b"GET /health HTTP/1.1\r\nX-Long: " + b"a" * 100000 + b"\r\n\r\n", HTTPStatus.BAD_REQUEST),
+])
+def test_malformed_requests_get_an_error_response(server, request_bytes, status):
+    async def send():
+        reader = asyncio.StreamReader()
+        reader.feed_data(request_bytes)
+        reader.feed_eof()
+        writer = FakeWriter()
+        await server.handle_connection(reader, writer)
+        return writer.data
+
+    response = asyncio.run(send())
+    assert response.startswith(f"HTTP/1.1 {status.value} ".encode())
+
+def test_appointment_ranges_are_limited(server, client_id):
+    day = (date.today() + timedelta(days=1)).isoformat()
+    for hour in range(9, 14):
+        server.db.add_appointment(client_id, day, f"{hour:02d}:00")
+
+    status, payload = server.dispatch('GET', '/appointments', {'start': day, 'end': day, 'limit': '3'}, {})
+    assert status == HTTPStatus.OK and len(payload) == 3
+    status, _ = server.dispatch('GET', '/appointments', {'start': day, 'end': day, 'limit': '-1'}, {})
+    assert status == HTTPStatus.BAD_REQUEST
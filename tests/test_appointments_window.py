@@ -0,0 +1,23 @@
+from datetime import date, timedelta
+
+from appointments_window import AppointmentsWindow
+
+def test_booking_checks_and_writes_in_one_transaction(qapp, db, worker, client_id):
+    window = AppointmentsWindow(db, worker=worker)
+    day = (date.today() + timedelta(days=1)).isoformat()
+
+    states = []
+    add_appointment = db.add_appointment
+    def recording(*args, **kwargs):
+        with db.connection() as conn:
+            states.append(conn.in_transaction)
+        return add_appointment(*args, **kwargs)
+    db.add_appointment = recording
+
+    assert window.write_appointment(client_id, day, "10:00", "", "", 30, None, None, None)[0]
+    saved, message = window.write_appointment(client_id, day, "10:15", "", "", 30, None, None, None)
+    window.close()
+
+    assert states == [True]
+    assert not saved and "محجوز" in message
+    assert len(db.get_appointments_by_date(day)) == 1
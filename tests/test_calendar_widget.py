@@ -0,0 +1,37 @@
+from datetime import date
+
+from calendar_widget import CalendarWidget
+from conftest import wait_for_worker
+from database import Database
+
+def month_day(day: int) -> str:
+    return date.today().replace(day=day).isoformat()
+
+def test_changes_refetch_only_the_changed_dates(qapp, db, worker, client_id):
+    moved = db.add_appointment(client_id, month_day(10), "10:00")
+    widget = CalendarWidget(db, worker=worker)
+    wait_for_worker(qapp, worker)
+    key = (date.today().year, date.today().month)
+    assert widget.month_counts[key][month_day(10)] == 1
+    last_id = db.get_last_change_id()
+
+    other = Database(db.db_path)
+    other.update_appointment(moved, month_day(20), "10:00")
+    other.close()
+
+    ranges = []
+    get_daily_counts = db.get_daily_counts
+    def recording(start_date, end_date):
+        ranges.append((start_date, end_date))
+        return get_daily_counts(start_date, end_date)
+    db.get_daily_counts = recording
+
+    generation = widget.counts_generation
+    widget.apply_changes(db.get_changes(last_id))
+    wait_for_worker(qapp, worker)
+    widget.close()
+
+    assert sorted(ranges) == [(month_day(10), month_day(10)), (month_day(20), month_day(20))]
+    assert widget.counts_generation == generation
+    assert widget.month_counts[key][month_day(10)] == 0
+    assert widget.month_counts[key][month_day(20)] == 1
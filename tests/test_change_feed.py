@@ -0,0 +1,75 @@
+import threading
+
+from change_feed import ChangeFeed
+from clients_model import ClientSearchModel
+from conftest import wait_for_worker
+from database import Database
+from models import ClientCache
+
+def record_threads(db, *names):
+    threads = []
+    for name in names:
+        def recording(*args, method=getattr(db, name), **kwargs):
+            threads.append(threading.current_thread())
+            return method(*args, **kwargs)
+        setattr(db, name, recording)
+    return threads
+
+def drain(qapp, worker, feed):
+    wait_for_worker(qapp, worker)
+    while feed._fetching:
+        wait_for_worker(qapp, worker)
+
+def test_poll_tick_reads_on_the_worker(qapp, db, worker, client_id):
+    cache = ClientCache(db)
+    model = ClientSearchModel(cache)
+    model.set_clients([db.get_client_by_id(client_id)])
+    feed = ChangeFeed(db, worker)
+
+    other = Database(db.db_path)
+    other.update_client(client_id, "اسم جديد", "0500000000")
+    other.close()
+
+    threads = record_threads(db, 'get_changes', 'get_data_version', 'get_last_change_id', 'get_client_by_id')
+    feed._timer.timeout.emit()
+    wait_for_worker(qapp, worker)
+    feed.stop()
+    model.detach()
+
+    assert threads and threading.main_thread() not in threads
+    assert model.client(0)['name'] == "اسم جديد"
+
+def test_local_writes_are_not_published_again(qapp, db, worker, client_id):
+    feed = ChangeFeed(db, worker)
+    events = []
+    db.add_observer(lambda event, payload: events.append((event, payload)))
+
+    db.add_appointment(client_id, "2030-01-01", "10:00")
+    other = Database(db.db_path)
+    remote_id = other.add_appointment(client_id, "2030-01-02", "10:00")
+    other.close()
+    db.update_client(client_id, "اسم جديد", "0500000000")
+
+    feed.poll()
+    drain(qapp, worker, feed)
+    feed.stop()
+
+    received = [payload['changes'] for event, payload in events if event == 'changes_received']
+    assert [[(change['table_name'], change['row_id']) for change in changes] for changes in received] == [
+        [('appointments', remote_id)]
+    ]
+    assert feed.last_id == db.get_last_change_id()
+    assert db.take_local_changes(feed.last_id) == set()
+
+def test_large_local_batches_do_not_reset_the_views(qapp, db, worker, client_id):
+    feed = ChangeFeed(db, worker, batch_size=2)
+    events = []
+    db.add_observer(lambda event, payload: events.append(event))
+
+    db.bulk_add_appointments([(client_id, "2030-01-01", f"{hour:02d}:00", "", "", 30) for hour in (9, 10, 11)])
+    feed.poll()
+    drain(qapp, worker, feed)
+    feed.stop()
+
+    assert 'changes_reset' not in events and 'changes_received' not in events
+    assert feed.last_id == db.get_last_change_id()
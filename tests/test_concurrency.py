@@ -0,0 +1,54 @@
+import sqlite3
+import threading
+
+import pytest
+
+import maintenance
+from database import CONNECTION_PROFILES, Database
+
+@pytest.mark.parametrize('profile', sorted(CONNECTION_PROFILES))
+def test_concurrent_bookings_are_all_stored(tmp_path, profile, capsys):
+    path = str(tmp_path / "appointments.db")
+    Database(path, profile).close()
+
+    status = maintenance.main(['--db', path, '--profile', profile, 'check-concurrency',
+                               '--processes', '3', '--bookings', '20'])
+
+    assert status == 0, capsys.readouterr().out
+    assert "أخطاء القفل: 0" in capsys.readouterr().out
+
+def test_busy_writes_are_retried(tmp_path):
+    path = str(tmp_path / "appointments.db")
+    db = Database(path)
+    db.pool.profile = dict(db.pool.profile, busy_timeout=0, retry_delay=0.05)
+    db.pool.close_all()
+
+    blocker = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    blocker.execute('BEGIN IMMEDIATE')
+    attempts = []
+    add_client = Database.add_client.__wrapped__
+    def counting(self, *args):
+        attempts.append(1)
+        return add_client(self, *args)
+
+    releaser = threading.Timer(0.1, blocker.commit)
+    releaser.start()
+    try:
+        client_id = db.pool.run(counting, db, "عميل", "0500000000")
+    finally:
+        releaser.join()
+        blocker.close()
+
+    assert len(attempts) > 1
+    assert db.get_client_by_id(client_id)['name'] == "عميل"
+    db.close()
+
+def test_other_errors_are_not_retried(db):
+    attempts = []
+    def failing():
+        attempts.append(1)
+        raise sqlite3.OperationalError("no such table: missing")
+
+    with pytest.raises(sqlite3.OperationalError):
+        db.pool.run(failing)
+    assert attempts == [1]
@@ -0,0 +1,293 @@
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+def future(days: int) -> str:
+    return (date.today() + timedelta(days=days)).isoformat()
+
+def test_upcoming_appointments_skip_cancelled_and_completed(db, client_id):
+    scheduled = db.add_appointment(client_id, future(1), "10:00")
+    cancelled = db.add_appointment(client_id, future(1), "09:00")
+    completed = db.add_appointment(client_id, future(2), "09:00")
+    db.update_appointment(cancelled, future(1), "09:00", status='cancelled')
+    db.update_appointment(completed, future(2), "09:00", status='completed')
+
+    assert [apt['id'] for apt in db.get_upcoming_appointments(5)] == [scheduled]
+
+def test_upcoming_appointments_use_status_index(db):
+    with db.connection() as conn:
+        plan = ' '.join(row[3] for row in conn.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT * FROM appointments a
+            WHERE a.status = 'scheduled' AND (a.appointment_date, a.appointment_time) >= (?, ?)
+            ORDER BY a.appointment_date, a.appointment_time LIMIT 5
+        ''', ('2026-01-01', '10:00')))
+    assert 'idx_appointments_status_date_time' in plan
+    assert 'TEMP B-TREE' not in plan
+
+def last_occurrence_of(db, appointment_id):
+    return db.get_series(appointment_id)['last_occurrence']
+
+def test_series_store_their_last_occurrence(db, client_id):
+    bounded = db.add_recurring_appointment(client_id, "2026-01-05", "10:00", frequency='weekly', count=4)
+    capped = db.add_recurring_appointment(client_id, "2026-01-05", "11:00", frequency='daily',
+                                          count=30, until="2026-01-10")
+    open_ended = db.add_recurring_appointment(client_id, "2026-01-05", "12:00", frequency='monthly')
+
+    assert last_occurrence_of(db, bounded) == "2026-01-26"
+    assert last_occurrence_of(db, capped) == "2026-01-10"
+    assert last_occurrence_of(db, open_ended) is None
+
+    db.update_appointment(bounded, "2026-01-12", "10:00")
+    assert last_occurrence_of(db, bounded) == "2026-02-02"
+
+    db.cancel_series_from(db.get_series(open_ended)['id'], "2026-04-05")
+    assert last_occurrence_of(db, open_ended) == "2026-04-04"
+
+    db.update_series_from(db.get_series(bounded)['id'], "2026-01-26", "2026-01-27", "10:00")
+    assert last_occurrence_of(db, bounded) == "2026-01-25"
+    assert last_occurrence_of(db, db.get_appointments_by_date("2026-01-27")[0]['id']) == "2026-02-03"
+
+def test_finished_series_are_not_expanded(db, client_id):
+    db.add_recurring_appointment(client_id, "2026-01-05", "10:00", frequency='daily', count=3)
+    db.add_recurring_appointment(client_id, "2026-01-05", "11:00", frequency='weekly')
+
+    later = db.get_appointments_between("2026-02-02", "2026-02-08")
+    assert [(apt['appointment_date'], apt['appointment_time']) for apt in later] == [("2026-02-02", "11:00")]
+    assert [apt['appointment_date'] for apt in db.get_appointments_between("2026-01-05", "2026-01-08")
+            if apt['appointment_time'] == "10:00"] == ["2026-01-05", "2026-01-06", "2026-01-07"]
+
+    with db.connection() as conn:
+        plan = ' '.join(row[3] for row in conn.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT * FROM appointment_series s JOIN appointments a ON s.appointment_id = a.id
+            WHERE (s.last_occurrence IS NULL OR s.last_occurrence >= ?) AND a.appointment_date < ?
+        ''', ("2026-02-02", "2026-02-08")))
+    assert 'idx_series_last_occurrence' in plan
+
+def test_last_occurrence_backfill_never_ends_early(db, client_id):
+    from migrations import MIGRATIONS
+    from recurrence import last_occurrence
+
+    backfill = next(statements for version, _, statements in MIGRATIONS if version == 11)[1]
+    cases = [("2026-01-31", 'monthly', 1, None, 3), ("2026-01-05", 'weekly', 2, None, 5),
+             ("2026-01-05", 'daily', 3, "2026-01-20", 10), ("2026-01-05", 'daily', 1, "2026-03-01", None)]
+    for first_date, frequency, interval, until, count in cases:
+        db.add_recurring_appointment(client_id, first_date, "10:00", frequency=frequency,
+                                     interval=interval, until=until, count=count)
+
+    with db.connection() as conn:
+        conn.execute('UPDATE appointment_series SET last_occurrence = NULL')
+        conn.execute(backfill)
+        stored = [row[0] for row in conn.execute('SELECT last_occurrence FROM appointment_series ORDER BY id')]
+
+    for case, value in zip(cases, stored):
+        assert value >= last_occurrence(case[0], case[1], case[2], case[3], case[4])
+    assert stored[1:] == [last_occurrence(*case) for case in cases[1:]]
+
+def test_events_are_sent_after_the_outer_commit(db, client_id):
+    from database import Database
+
+    other = Database(db.db_path)
+    seen = []
+    def observer(event, payload):
+        if event == 'appointment_added':
+            seen.append(other.get_appointment_by_id(payload['appointment_id']) is not None)
+    db.add_observer(observer)
+
+    appointment_id, conflicts = db.book_appointment(client_id, future(1), "10:00")
+    db.add_recurring_appointment(client_id, future(2), "10:00", count=2)
+    other.close()
+
+    assert appointment_id and not conflicts
+    assert seen == [True, True]
+
+def test_events_are_dropped_on_rollback(db, client_id):
+    events = []
+    db.add_observer(lambda event, payload: events.append(event))
+
+    try:
+        with db.connection():
+            db.add_appointment(client_id, future(1), "10:00")
+            db.add_client("عميل آخر", "0511111111")
+            assert events == []
+            raise ValueError
+    except ValueError:
+        pass
+
+    assert events == []
+    assert db.get_appointments_by_date(future(1)) == []
+    db.add_client("عميل آخر", "0511111111")
+    assert events == ['client_added']
+
+def test_run_in_transaction_holds_the_write_lock(db, client_id):
+    import sqlite3
+
+    def check_and_write():
+        other = sqlite3.connect(db.db_path, timeout=0)
+        try:
+            other.execute('BEGIN IMMEDIATE')
+            locked = False
+        except sqlite3.OperationalError:
+            locked = True
+        finally:
+            other.close()
+        db.add_appointment(client_id, future(1), "10:00")
+        return locked
+
+    assert db.run_in_transaction(check_and_write) is True
+    assert len(db.get_appointments_by_date(future(1))) == 1
+
+def test_appointment_pages_follow_every_sort_key(db):
+    from database import APPOINTMENT_SORT_KEYS
+    clients = [db.add_client(name, f"05000000{index:02d}") for index, name in enumerate(["ب", "أ", "ب"])]
+    for index in range(12):
+        appointment_id = db.add_appointment(clients[index % 3], future(index % 4), f"{9 + index % 5:02d}:00",
+                                            service=["", "قص", "صبغ"][index % 3], notes=["", "x"][index % 2])
+        if index % 4 == 0:
+            db.update_appointment(appointment_id, future(index % 4), f"{9 + index % 5:02d}:00",
+                                  service=["", "قص", "صبغ"][index % 3], status='completed')
+
+    for sort_key, columns in APPOINTMENT_SORT_KEYS.items():
+        for descending in (True, False):
+            pages, after = [], None
+            while True:
+                page = db.get_appointments_page(sort_key, descending, after=after, limit=5)
+                if not page:
+                    break
+                pages.extend(page)
+                after = page[-1]
+
+            values = [tuple(apt[key] or '' for _, key in columns) for apt in pages]
+            assert values == sorted(values, reverse=descending), sort_key
+            assert len({apt['id'] for apt in pages}) == 12
+
+def test_appointment_pages_use_an_index_for_every_sort_key(db, client_id):
+    from database import APPOINTMENT_SORT_KEYS
+    db.add_appointment(client_id, future(1), "10:00")
+    plans = []
+    with db.connection() as conn:
+        conn.set_trace_callback(lambda query: plans.append(' '.join(
+            row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + query)
+        )) if 'LIMIT' in query and not query.startswith('EXPLAIN') else None)
+        for sort_key in APPOINTMENT_SORT_KEYS:
+            first = db.get_appointments_page(sort_key, limit=1)
+            db.get_appointments_page(sort_key, after=first[-1], limit=1)
+        conn.set_trace_callback(None)
+
+    assert len(plans) == 2 * len(APPOINTMENT_SORT_KEYS)
+    assert not [plan for plan in plans if 'TEMP B-TREE' in plan]
+
+def test_database_rejects_durations_longer_than_the_conflict_window(db, client_id):
+    from database import MAX_APPOINTMENT_MINUTES
+    for duration in (0, -30, MAX_APPOINTMENT_MINUTES + 1):
+        with pytest.raises(ValueError):
+            db.add_appointment(client_id, future(1), "09:00", duration=duration)
+        with pytest.raises(ValueError):
+            db.book_appointment(client_id, future(1), "09:00", duration=duration)
+    appointment_id = db.add_appointment(client_id, future(1), "09:00")
+    with pytest.raises(ValueError):
+        db.update_appointment(appointment_id, future(1), "09:00", duration=MAX_APPOINTMENT_MINUTES + 1)
+    assert db.bulk_add_appointments([(client_id, future(2), "09:00", "", "", MAX_APPOINTMENT_MINUTES + 1)]) == {
+        0: "مدة الموعد غير صالحة"
+    }
+
+def test_overlapping_bookings_are_rejected_unless_cancelled(db, client_id):
+    first, _ = db.book_appointment(client_id, future(1), "09:00", duration=60)
+    assert first is not None
+
+    appointment_id, conflicts = db.book_appointment(client_id, future(1), "09:15")
+    assert appointment_id is None and [apt['id'] for apt in conflicts] == [first]
+
+    db.update_appointment(first, future(1), "09:00", status='cancelled')
+    appointment_id, conflicts = db.book_appointment(client_id, future(1), "09:15")
+    assert appointment_id is not None and conflicts == []
+
+def test_each_thread_reuses_one_connection(db):
+    main = db.pool.acquire()
+    with db.connection() as conn:
+        assert conn is main
+    assert db.pool.acquire() is main
+
+    others = []
+    thread = threading.Thread(target=lambda: others.extend([db.pool.acquire(), db.pool.acquire()]))
+    thread.start()
+    thread.join()
+    assert others[0] is others[1] and others[0] is not main
+
+def test_nested_failure_rolls_back_the_outer_transaction(db):
+    with pytest.raises(Exception, match="العميل غير موجود"):
+        with db.connection():
+            db.add_client("عميل", "0500000001")
+            db.add_appointment(999, future(1), "10:00")
+
+    assert db.get_all_clients() == []
+    with db.connection() as conn:
+        assert not conn.in_transaction
+    db.add_client("عميل", "0500000001")
+    assert len(db.get_all_clients()) == 1
+
+def test_range_queries_include_both_bounds_only(db, client_id):
+    for offset in range(1, 6):
+        db.add_appointment(client_id, future(offset), "10:00")
+
+    assert [apt['appointment_date'] for apt in db.get_appointments_between(future(2), future(4))] == [
+        future(2), future(3), future(4)
+    ]
+    assert db.get_appointments_between(future(6), future(9)) == []
+    assert db.get_daily_counts(future(2), future(4)) == {future(2): 1, future(3): 1, future(4): 1}
+    assert [apt['appointment_date'] for apt in db.get_appointments_by_date(future(5))] == [future(5)]
+
+def test_statistics_counters_match_the_tables(db, client_id):
+    def assert_counters_match():
+        with db.connection() as conn:
+            counters = {row['key']: row['value'] for row in conn.execute('SELECT key, value FROM statistics')
+                        if row['value']}
+            actual = {'clients': conn.execute('SELECT COUNT(*) FROM clients').fetchone()[0],
+                      'appointments': conn.execute('SELECT COUNT(*) FROM appointments').fetchone()[0]}
+            actual.update((f"status:{row[0]}", row[1]) for row in conn.execute(
+                'SELECT status, COUNT(*) FROM appointments GROUP BY status'))
+        assert counters == {key: value for key, value in actual.items() if value}
+
+    other_id = db.add_client("عميل آخر", "0500000001")
+    first = db.add_appointment(client_id, future(1), "10:00")
+    second = db.add_appointment(other_id, future(1), "11:00")
+    db.bulk_add_appointments([(client_id, future(2), "10:00", "", "", 30)])
+    assert_counters_match()
+
+    db.update_appointment(first, future(1), "10:00", status='completed')
+    db.update_appointment(second, future(1), "11:00", status='cancelled')
+    assert_counters_match()
+
+    db.delete_appointment(first)
+    db.delete_client(other_id)
+    assert_counters_match()
+    assert db.get_statistics() == {'total_clients': 1, 'total_appointments': 1, 'scheduled': 1, 'completed': 0}
+
+def test_client_search_matches_word_and_phone_prefixes(db):
+    ahmed = db.add_client("أحمد علي", "0551234567", "ahmed@example.com")
+    ali = db.add_client("علي حسن", "0559876543")
+    db.add_client("سارة محمد", "0561111111")
+
+    def ids(text, limit=10):
+        return [client['id'] for client in db.search_clients(text, limit)]
+
+    assert ids("أحم") == [ahmed]
+    assert ids("عل") == [ahmed, ali]
+    assert ids("عل", 1) == [ahmed]
+    assert ids("ahm") == [ahmed]
+    assert ids("055 98") == [ali]
+    assert ids("\"*)(") == []
+
+def test_client_search_follows_updates_and_deletes(db):
+    client_id = db.add_client("أحمد علي", "0551234567")
+    db.update_client(client_id, "خالد يوسف", "0551234567")
+
+    assert db.search_clients("أحمد") == []
+    assert [client['id'] for client in db.search_clients("خال")] == [client_id]
+
+    db.delete_client(client_id)
+    assert db.search_clients("خال") == []
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM clients_fts WHERE clients_fts MATCH 'خالد'").fetchone()[0] == 0
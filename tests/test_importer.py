@@ -0,0 +1,79 @@
+import io
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from importer import read_json_array, run_import
+
+def write_json(path, records):
+    path.write_text(json.dumps(records, ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+def test_json_array_is_read_in_blocks():
+    records = [{'name': f"عميل {i}", 'phone': f"05{i:08d}", 'notes': "a, b ] {c}"} for i in range(200)]
+    text = json.dumps(records, ensure_ascii=False, indent=1)
+    assert list(read_json_array(io.StringIO(text), block_size=7)) == records
+    assert list(read_json_array(io.StringIO(' [ ] '), block_size=1)) == []
+
+@pytest.mark.parametrize('text', ['{"name": "x"}', '[{"name": "x"}', '[{"name": "x"} {"name": "y"}]'])
+def test_json_array_rejects_invalid_files(text):
+    with pytest.raises(Exception):
+        list(read_json_array(io.StringIO(text), block_size=4))
+
+def test_failed_chunk_keeps_committed_chunks(db, tmp_path):
+    path = write_json(tmp_path / "clients.json",
+                      [{'name': f"عميل {i}", 'phone': f"05{i:08d}"} for i in range(30)])
+    bulk_add_clients = db.bulk_add_clients
+    calls = []
+    def failing(clients):
+        calls.append(len(clients))
+        if len(calls) == 2:
+            raise Exception("خطأ: قاعدة البيانات مقفلة")
+        return bulk_add_clients(clients)
+    db.bulk_add_clients = failing
+
+    assert run_import(db, 'clients', path, 'json', 10) == 1
+    assert calls == [10, 10, 10]
+    assert len(db.get_all_clients()) == 20
+
+def test_imported_history_gets_no_pending_reminders(db, client_id, tmp_path):
+    past = (date.today() - timedelta(days=10)).isoformat()
+    future = (date.today() + timedelta(days=10)).isoformat()
+    path = tmp_path / "appointments.jsonl"
+    path.write_text('\n'.join(json.dumps({'client_id': client_id, 'appointment_date': day,
+                                          'appointment_time': "10:00"})
+                              for day in (past, past, future)), encoding='utf-8')
+
+    assert run_import(db, 'appointments', str(path), 'jsonl', 2) == 0
+    assert len(db.get_all_appointments()) == 3
+    assert [n['notification_time'] for n in db.get_next_notifications()] == [f"{future} 10:00"]
+    assert db.get_pending_notifications() == []
+
+def test_bulk_reminders_match_their_appointments(db, client_id):
+    future = (date.today() + timedelta(days=3)).isoformat()
+    db.bulk_add_appointments([(client_id, future, f"{hour:02d}:00", "", "", 30) for hour in (9, 10, 11)])
+    with db.connection() as conn:
+        rows = conn.execute('''
+            SELECT a.appointment_time, n.notification_time FROM notifications n
+            JOIN appointments a ON a.id = n.appointment_id
+        ''').fetchall()
+    assert sorted((row[0], row[1]) for row in rows) == [
+        (f"{hour:02d}:00", f"{future} {hour:02d}:00") for hour in (9, 10, 11)
+    ]
+
+def test_invalid_jsonl_lines_are_reported_and_skipped(db, tmp_path, capsys):
+    path = tmp_path / "clients.jsonl"
+    path.write_text('\n'.join([
+        json.dumps({'name': "عميل 1", 'phone': "0500000001"}),
+        '{"name": "عميل 2", "phone":',
+        '',
+        '["عميل 3", "0500000003"]',
+        json.dumps({'name': "عميل 4", 'phone': "0500000004"}),
+    ]), encoding='utf-8')
+
+    assert run_import(db, 'clients', str(path), 'jsonl', 10) == 1
+    assert sorted(client['phone'] for client in db.get_all_clients()) == ["0500000001", "0500000004"]
+    errors = capsys.readouterr().err
+    assert "السطر 2" in errors
+    assert "السجل 3" in errors
@@ -0,0 +1,122 @@
+import sqlite3
+
+import pytest
+
+from database import Database
+
+def complete(db, appointment_id, day, time):
+    db.update_appointment(appointment_id, day, time, status="completed")
+
+def test_new_databases_use_incremental_vacuum(db):
+    with db.connection() as conn:
+        assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+
+def test_connecting_does_not_wait_for_a_writer(tmp_path):
+    path = str(tmp_path / "appointments.db")
+    db = Database(path)
+    db.pool.profile = dict(db.pool.profile, busy_timeout=0)
+    db.pool.close_all()
+
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute('BEGIN IMMEDIATE')
+    try:
+        assert db.get_statistics()['total_clients'] == 0
+    finally:
+        blocker.rollback()
+        blocker.close()
+        db.close()
+
+def test_archive_moves_each_batch_in_one_transaction(db, client_id):
+    for day in ("2020-01-01", "2020-01-02", "2020-01-03"):
+        complete(db, db.add_appointment(client_id, day, "10:00"), day, "10:00")
+
+    commits = []
+    with db.connection() as conn:
+        conn.set_trace_callback(lambda statement: commits.append(statement) if statement == 'COMMIT' else None)
+    archived = db.archive_appointments("2021-01-01", batch_size=2)
+    with db.connection() as conn:
+        conn.set_trace_callback(None)
+
+    assert archived['appointments'] == 3
+    assert len(commits) == 2
+    assert db.get_statistics()['total_appointments'] == 3
+
+def test_deleting_a_client_purges_archived_rows(db, client_id):
+    other_id = db.add_client("عميل آخر", "0500000001")
+    for owner in (client_id, other_id):
+        time = "10:00" if owner == client_id else "11:00"
+        complete(db, db.add_appointment(owner, "2020-01-01", time), "2020-01-01", time)
+    db.archive_appointments("2021-01-01")
+
+    db.delete_client(client_id)
+
+    statistics = db.get_statistics()
+    assert statistics['total_appointments'] == 1
+    assert statistics['completed'] == 1
+    assert db.get_statistics() == db.rebuild_statistics()
+    assert len(db.get_all_appointments()) == 1
+
+def test_maintenance_purges_archive_orphans(db, client_id):
+    complete(db, db.add_appointment(client_id, "2020-01-01", "10:00"), "2020-01-01", "10:00")
+    db.archive_appointments("2021-01-01")
+    with db.connection() as conn:
+        conn.execute('PRAGMA foreign_keys = OFF')
+        conn.execute('DELETE FROM clients WHERE id = ?', (client_id,))
+    with db.connection() as conn:
+        conn.execute('PRAGMA foreign_keys = ON')
+
+    report = db.run_maintenance()
+
+    assert report['orphans'] == 1
+    assert report['bytes_reclaimed'] >= 0
+    assert db.get_statistics()['total_appointments'] == 0
+    assert db.get_all_appointments() == []
+
+def test_first_maintenance_pass_converts_old_databases(tmp_path):
+    path = str(tmp_path / "appointments.db")
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE filler (data TEXT)')
+    conn.executemany('INSERT INTO filler VALUES (?)', [("x" * 1000,)] * 200)
+    conn.commit()
+    conn.close()
+
+    db = Database(path)
+    try:
+        with db.connection() as conn:
+            assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 0
+            conn.execute('DELETE FROM filler')
+        report = db.run_maintenance()
+        with db.connection() as conn:
+            assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+        assert report['bytes_after'] < report['bytes_before']
+    finally:
+        db.close()
+
+def archive_one(db, client_id):
+    complete(db, db.add_appointment(client_id, "2020-01-01", "10:00"), "2020-01-01", "10:00")
+    db.archive_appointments("2021-01-01")
+
+def test_client_deleted_inside_a_transaction_purges_the_archive(db, client_id):
+    archive_one(db, client_id)
+    fresh = Database(db.db_path)
+    try:
+        with fresh.connection() as conn:
+            conn.execute("UPDATE clients SET email = 'x' WHERE id = ?", (client_id,))
+            fresh.delete_client(client_id)
+        assert fresh.get_statistics()['total_appointments'] == 0
+        assert fresh.get_all_appointments() == []
+    finally:
+        fresh.close()
+
+def test_client_delete_refuses_to_skip_an_unattached_archive(db, client_id):
+    db.get_statistics()
+    other = Database(db.db_path)
+    archive_one(other, client_id)
+    other.close()
+
+    with pytest.raises(Exception, match="الأرشيف"):
+        with db.connection() as conn:
+            conn.execute("UPDATE clients SET email = 'x' WHERE id = ?", (client_id,))
+            db.delete_client(client_id)
+    db.delete_client(client_id)
+    assert db.get_statistics()['total_appointments'] == 0
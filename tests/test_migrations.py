@@ -0,0 +1,41 @@
+import sqlite3
+
+from database import Database, to_epoch
+from migrations import MIGRATIONS
+
+def database_at_version(path, version):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    for number, description, statements in MIGRATIONS:
+        if number > version:
+            break
+        for statement in statements:
+            conn.execute(statement)
+        conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)', (number, description))
+    conn.commit()
+    return conn
+
+def test_starts_at_is_backfilled_from_date_and_time(tmp_path):
+    path = str(tmp_path / "appointments.db")
+    conn = database_at_version(path, 3)
+    conn.execute("INSERT INTO clients (name, phone) VALUES ('عميل', '0500000000')")
+    conn.executemany('INSERT INTO appointments (client_id, appointment_date, appointment_time) VALUES (1, ?, ?)',
+                     [("2024-02-29", "09:30"), ("2030-12-31", "23:45")])
+    conn.commit()
+    conn.close()
+
+    db = Database(path)
+    try:
+        with db.connection() as conn:
+            rows = conn.execute('SELECT appointment_date, appointment_time, starts_at FROM appointments').fetchall()
+        assert [row['starts_at'] for row in rows] == [
+            to_epoch(row['appointment_date'], row['appointment_time']) for row in rows
+        ]
+    finally:
+        db.close()
@@ -0,0 +1,103 @@
+import threading
+from datetime import date, timedelta
+
+from database import Database
+from models import OccupancyCache
+
+def day(offset: int) -> str:
+    return (date.today() + timedelta(days=offset)).isoformat()
+
+def cached_days(cache):
+    return sorted(cache._bitmaps)
+
+def test_change_feed_drops_only_the_changed_dates(db, client_id):
+    cache = OccupancyCache(db)
+    moved = db.add_appointment(client_id, day(1), "10:00")
+    db.add_appointment(client_id, day(2), "10:00")
+    cache.get_bitmaps(day(0), 5)
+    last_id = db.get_last_change_id()
+
+    other = Database(db.db_path)
+    other.update_appointment(moved, day(3), "11:00")
+    other.close()
+    db.publish_changes(db.get_changes(last_id))
+
+    assert cached_days(cache) == [day(0), day(2), day(4)]
+    assert cache.get_bitmaps(day(3), 1)[day(3)] != 0
+    assert cache.get_bitmaps(day(1), 1)[day(1)] == 0
+
+def test_update_drops_old_and_new_dates(db, client_id):
+    cache = OccupancyCache(db)
+    appointment_id = db.add_appointment(client_id, day(1), "10:00")
+    cache.get_bitmaps(day(0), 4)
+
+    db.update_appointment(appointment_id, day(2), "10:00")
+
+    assert cached_days(cache) == [day(0), day(3)]
+
+def test_deleted_rows_resolve_their_cached_date(db, client_id):
+    cache = OccupancyCache(db)
+    appointment_id = db.add_appointment(client_id, day(1), "10:00")
+    cache.get_bitmaps(day(0), 3)
+    last_id = db.get_last_change_id()
+
+    with db.connection() as conn:
+        conn.execute('DELETE FROM appointments WHERE id = ?', (appointment_id,))
+    db.publish_changes(db.get_changes(last_id))
+
+    assert cached_days(cache) == [day(0), day(2)]
+    assert cache.get_bitmaps(day(1), 1)[day(1)] == 0
+
+def test_client_only_changes_keep_the_cache(db, client_id):
+    cache = OccupancyCache(db)
+    cache.get_bitmaps(day(0), 3)
+    last_id = db.get_last_change_id()
+    db.update_client(client_id, "اسم جديد", "0500000000")
+    db.publish_changes(db.get_changes(last_id))
+
+    assert cached_days(cache) == [day(0), day(1), day(2)]
+
+def test_series_changes_clear_the_cache(db, client_id):
+    cache = OccupancyCache(db)
+    cache.get_bitmaps(day(0), 3)
+    last_id = db.get_last_change_id()
+    db.add_recurring_appointment(client_id, day(0), "09:00", frequency='daily', count=3)
+    db.publish_changes(db.get_changes(last_id))
+
+    assert cached_days(cache) == []
+    assert all(cache.get_bitmaps(day(0), 3).values())
+
+def test_invalidation_during_a_load_is_not_overwritten(db, client_id):
+    cache = OccupancyCache(db)
+    get_busy_intervals = db.get_busy_intervals
+    def invalidating(*args):
+        intervals = get_busy_intervals(*args)
+        thread = threading.Thread(target=db.add_appointment, args=(client_id, day(1), "10:00"))
+        thread.start()
+        thread.join()
+        return intervals
+    db.get_busy_intervals = invalidating
+
+    assert cache.get_bitmaps(day(1), 1)[day(1)] == 0
+    db.get_busy_intervals = get_busy_intervals
+    assert cache.get_bitmaps(day(1), 1)[day(1)] != 0
+
+def test_concurrent_loads_and_invalidations(db, client_id):
+    cache = OccupancyCache(db)
+    errors = []
+    def run(action):
+        try:
+            for offset in range(200):
+                action(offset % 20)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(lambda offset: cache.get_bitmaps(day(offset), 5),)),
+               threading.Thread(target=run, args=(lambda offset: cache.invalidate([day(offset)]),)),
+               threading.Thread(target=run, args=(lambda offset: cache.clear() if offset == 0 else None,))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
@@ -0,0 +1,85 @@
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import wait_for_worker
+from notifications import NotificationManager, ReminderScheduler
+
+def test_reminder_reload_runs_on_the_worker(qapp, db, worker, client_id):
+    day = (date.today() + timedelta(days=1)).isoformat()
+    db.add_appointment(client_id, day, "10:00")
+
+    threads = []
+    get_next_notifications = db.get_next_notifications
+    def recording(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return get_next_notifications(*args, **kwargs)
+    db.get_next_notifications = recording
+
+    scheduler = ReminderScheduler(db, NotificationManager(db), worker)
+    scheduler.reload()
+    wait_for_worker(qapp, worker)
+    scheduler.stop()
+
+    assert threads and threading.main_thread() not in threads
+    assert scheduler._heap == [f"{day} 10:00"]
+
+def test_reminder_added_during_reload_is_kept(qapp, db, worker, client_id):
+    day = (date.today() + timedelta(days=1)).isoformat()
+    scheduler = ReminderScheduler(db, NotificationManager(db), worker)
+    scheduler.reload()
+    db.add_appointment(client_id, day, "11:00")
+    wait_for_worker(qapp, worker)
+    scheduler.stop()
+
+    assert f"{day} 11:00" in scheduler._heap
+
+def test_due_reminders_are_read_and_marked_on_the_worker(qapp, db, worker, client_id):
+    day = (date.today() + timedelta(days=1)).isoformat()
+    appointment_id = db.add_appointment(client_id, day, "10:00")
+    with db.connection() as conn:
+        conn.execute("UPDATE notifications SET notification_time = '2000-01-01 09:00' WHERE appointment_id = ?",
+                     (appointment_id,))
+
+    threads = []
+    for name in ('get_pending_notifications', 'mark_notification_sent'):
+        def recording(*args, method=getattr(db, name), **kwargs):
+            threads.append(threading.current_thread())
+            return method(*args, **kwargs)
+        setattr(db, name, recording)
+
+    manager = NotificationManager(db)
+    shown = []
+    manager.show_popup_notification = lambda title, message: shown.append(title)
+    scheduler = ReminderScheduler(db, manager, worker)
+    scheduler.fire_due_reminders()
+    wait_for_worker(qapp, worker)
+    wait_for_worker(qapp, worker)
+    scheduler.stop()
+
+    assert shown == ["عميل الاختبار"]
+    assert len(threads) >= 2 and threading.main_thread() not in threads
+    with db.connection() as conn:
+        assert conn.execute('SELECT is_sent FROM notifications WHERE appointment_id = ?',
+                            (appointment_id,)).fetchone()[0] == 1
+
+def test_failed_reminder_rolls_back_the_appointment(db, client_id):
+    day = (date.today() + timedelta(days=1)).isoformat()
+    def failing(*args):
+        raise sqlite3.OperationalError("disk I/O error")
+    db._insert_notification = failing
+
+    with pytest.raises(sqlite3.OperationalError):
+        db.add_appointment(client_id, day, "10:00")
+
+    del db._insert_notification
+    with db.connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM appointments').fetchone()[0] == 0
+        assert conn.execute('SELECT COUNT(*) FROM notifications').fetchone()[0] == 0
+    assert db.get_statistics()['total_appointments'] == 0
+
+    appointment_id = db.add_appointment(client_id, day, "10:00")
+    with db.connection() as conn:
+        assert conn.execute('SELECT appointment_id FROM notifications').fetchall()[0][0] == appointment_id
@@ -0,0 +1,38 @@
+import time
+
+from database import Database
+from query_trace import QueryTracer, create_tracer
+
+def test_only_statements_over_the_threshold_are_logged(tmp_path):
+    log = tmp_path / "slow_queries.log"
+    tracer = QueryTracer(slow_query_ms=200, slow_query_log=str(log), report_path=None)
+    database = Database(str(tmp_path / "appointments.db"), tracer=tracer)
+    try:
+        database.add_client("عميل الاختبار", "0500000000")
+        database.search_clients("عميل")
+        assert not log.exists()
+
+        with database.connection() as conn:
+            conn.create_function('pause', 1, lambda ms: time.sleep(ms / 1000))
+        def slow_report():
+            with database.connection() as conn:
+                return conn.execute('SELECT pause(250), COUNT(*) FROM clients').fetchall()
+        tracer.wrap('Database.slow_report', slow_report)()
+
+        text = log.read_text(encoding='utf-8')
+        assert text.count(' | Database.slow_report | ') == 1
+        assert 'SELECT pause(250), COUNT(*) FROM clients' in text
+        assert 'QUERY PLAN:' in text
+        assert 'INSERT INTO clients' not in text
+        assert tracer.report()['methods']['Database.add_client']['count'] == 1
+    finally:
+        database.close()
+
+def test_environment_overrides_the_threshold(monkeypatch, tmp_path):
+    monkeypatch.setenv('APPOINTMENTS_TRACE', '1')
+    monkeypatch.setenv('APPOINTMENTS_SLOW_QUERY_MS', '5')
+    tracer = create_tracer(False, 100, str(tmp_path / "slow.log"), None)
+    assert tracer.slow_query_ms == 5.0
+
+    monkeypatch.setenv('APPOINTMENTS_TRACE', 'off')
+    assert create_tracer(True) is None